@@ -2,6 +2,7 @@
 Package containing logic concerning different applications on top of the dataflow graph.
 """
 import abc
+from contextlib import nullcontext
 
 from opendf.applications.multiwoz_2_2.domain import fill_multiwoz_db, MultiWOZContext
 from opendf.applications.multiwoz_2_2.multiwoz_db import fill_multiwoz_sql_db, MultiWozSqlDB
@@ -12,6 +13,45 @@ from opendf.graph.node_factory import NodeFactory
 
 
 class EnvironmentClass(abc.ABC):
+    # if `True`, the environment is kept warm between its uses: the first `__enter__` loads the node factory and the
+    # data, and takes a snapshot of the data which the dialogues may change; the `__exit__` keeps everything loaded, and
+    # the following `__enter__` only restore the snapshot (and load the node factory again only if its node types were
+    # replaced, see `ensure_node_factory`). Set it when running several dialogues in a row
+    keep_warm = False
+    # the snapshot of a warm environment, `None` while the environment is cold.
+    # These are class attributes since the environments may be loaded from yaml, without calling `__init__`
+    _warm_state = None
+    # the node types the environment loaded last in the node factory
+    _node_types = None
+
+    def is_warm(self):
+        return self.keep_warm and self._warm_state is not None
+
+    @abc.abstractmethod
+    def load_node_factory(self):
+        pass
+
+    def ensure_node_factory(self, reload=False):
+        """
+        Loads the node types of the environment in the node factory. Unless `reload`, the loading is skipped if the
+        node factory still holds the node types the environment loaded last: the node factory is shared, so another
+        environment may have replaced them in the meantime (e.g. while this environment was warm).
+
+        :param reload: if `True`, always loads the node types
+        :type reload: bool
+        """
+        if reload or self._node_types is None or NodeFactory.get_instance().node_types is not self._node_types:
+            self.load_node_factory()
+            self._node_types = NodeFactory.get_instance().node_types
+
+    def cool_down(self):
+        """
+        Tears down a warm environment, the next `__enter__` loads everything again.
+        """
+        warm = self.is_warm()
+        self._warm_state = None
+        if warm:
+            self.__exit__(None, None, None)
 
     @abc.abstractmethod
     def get_new_context(self) -> DialogContext:
@@ -25,6 +65,15 @@ class EnvironmentClass(abc.ABC):
     def __exit__(self):
         pass
 
+    def turn(self):
+        """
+        Gets the context of a dialog turn, which holds the resources used during the turn (e.g. a database connection).
+
+        :return: the turn context manager
+        :rtype: ContextManager
+        """
+        return nullcontext()
+
 
 class SMCalFlowEnvironment(EnvironmentClass):
     DEFAULT_NODES = [
@@ -54,21 +103,36 @@ class SMCalFlowEnvironment(EnvironmentClass):
     def __enter__(self):
         from opendf.applications.smcalflow.database import populate_stub_database, Database
         from opendf.applications.smcalflow.domain import fill_graph_db
-        self.load_node_factory()
+        if self.is_warm():
+            self.ensure_node_factory()
+            # discards the changes of the previous dialogue (e.g. created events), keeps the reference data
+            Database.get_instance().restore(self._warm_state)
+            return self
+
+        self.ensure_node_factory(reload=True)
         if use_database:
             populate_stub_database(self.stub_data_file)
+            if self.keep_warm:
+                self._warm_state = Database.get_instance().snapshot()
         else:
-            fill_graph_db(self.d_context)
+            # the graph DB belongs to the dialog context, so it is filled for each context
+            fill_graph_db(self.d_context, self.stub_data_file)
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         from opendf.applications.smcalflow.database import Database
-        if use_database:
+        if use_database and not self.is_warm():
             database = Database.get_instance()
             if database:
                 database.clear_database()
 
+    def turn(self):
+        from opendf.applications.smcalflow.database import Database
+        if use_database:
+            return Database.get_instance().turn()
+        return nullcontext()
+
 
 class MultiWOZEnvironment(EnvironmentClass):
     NODES = ["opendf.applications.multiwoz.simplication.multiwoz_nodes"]
@@ -127,11 +191,20 @@ class MultiWOZEnvironment_2_2(EnvironmentClass):
             fill_multiwoz_db(self.data_path, self.d_context, domains=self.domains)
 
     def __enter__(self):
-        self.load_node_factory()
+        if self.is_warm():
+            # the dialogues do not change the data, so there is nothing to restore; only loads the data of the new
+            # domains, if any (the loaded ones are skipped)
+            self.ensure_node_factory()
+            self.load_data()
+            return self
+
+        self.ensure_node_factory(reload=True)
         self.load_data()
+        if self.keep_warm:
+            self._warm_state = True
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if use_database and self.clean_database:
+        if use_database and self.clean_database and not self.is_warm():
             database = MultiWozSqlDB.get_instance()
             database.clear_database()
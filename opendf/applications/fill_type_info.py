@@ -8,6 +8,7 @@ import importlib
 
 # from opendf.applications.smcalflow.nodes.functions import *
 from opendf.graph.nodes.framework_functions import *
+from opendf.defs import type_info_cache_path
 from opendf.utils.utils import get_subclasses
 # from opendf.applications.sandbox.sandbox import *
 
@@ -31,13 +32,6 @@ def fill_type_info(node_factory, all_nodes=None, node_paths=()):
     node_types = {t.__name__: t for t in all_nodes}
     # node_types['Any'] = Node  # 'Any' is a synonym for 'Node'
     node_types['Node'] = Node
-    node_factory.node_types = node_types  # fill node_fact BEFORE making sample nodes
 
-    # sample nodes: dictionary name -> instance of a node of that type
-    sample_nodes = {t.__name__: t() for t in all_nodes}
-    # sample_nodes['Any'] = Node()
-    sample_nodes['Node'] = Node()
-    node_factory.sample_nodes = sample_nodes
-
-    node_factory.set_leaf_types()
-    node_factory.init_lists()
+    # also creates the sample nodes (dictionary name -> instance of a node of that type), on demand
+    node_factory.set_node_types(node_types, cache_path=type_info_cache_path)
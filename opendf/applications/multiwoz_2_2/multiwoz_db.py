@@ -9,13 +9,15 @@ from typing import Optional, Dict, Tuple
 
 import sqlalchemy
 from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, ForeignKey, DateTime, insert, \
-    Boolean, select, func, update, delete, text, and_, or_, not_, cast, Date, Float
+    Boolean, select, func, update, delete, text, and_, or_, not_, cast, Date, Float, Index
 
 from opendf.applications.multiwoz_2_2.domain import FILE_NAMES
 from opendf.defs import database_connection, database_log, database_future, EnvironmentDefinition
 from opendf.exceptions.python_exception import SingletonClassException
 from opendf.graph.dialog_context import DialogContext
+from opendf.graph.node_factory import NodeFactory
 from opendf.graph.nodes.node import Node
+from opendf.utils.database_utils import sql_fallbacks
 
 environment_definition = EnvironmentDefinition.get_instance()
 
@@ -132,6 +134,18 @@ class MultiWozSqlDB:
         'Restaurant',
     }
 
+    # columns which are shown to the user, but (almost) never searched for - these are not indexed
+    NOT_INDEXED_COLUMNS = {"id", "address", "introduction", "latitude", "longitude", "openhours", "phone", "postcode"}
+
+    # the train searches constrain several columns at once (e.g. departure, destination and day), and SQLite uses a
+    # single index per table - a single column index would still scan all the trains of its value
+    COMPOSITE_INDEXES = {
+        "Train": [("departure", "destination", "day")],
+    }
+
+    # { index name : index }, the indexes are attached to the tables, so they are created only once
+    _indexes: Dict[str, Index] = {}
+
     @staticmethod
     def get_instance():
         """
@@ -182,6 +196,7 @@ class MultiWozSqlDB:
             for table in reversed(self.metadata.sorted_tables):
                 connection.execute(table.delete())
             transaction.commit()
+        LOADED_DATA.clear()  # so the data is loaded again by `fill_multiwoz_sql_db`
         self.clear_cache()
 
     def _create_database(self):
@@ -195,6 +210,7 @@ class MultiWozSqlDB:
         values = []
         typename = operator.typename()
         custom_match = typename in self.CUSTOM_MATCH
+        reason = None  # the reason the constraint could not be translated into SQL, if any
         try:
             if operator is not None:
                 selection = operator.generate_sql(match_miss=match_miss)
@@ -217,22 +233,64 @@ class MultiWozSqlDB:
         except Exception as ex:
             if environment_definition.raise_db_optimization_exception:
                 raise ex
+            reason = ex
 
         table_name = MultiWozSqlDB.TABLE_BY_DOMAIN.get(typename)
         if table_name is None:
             return None
         selection = select(table_name)
-        with self.engine.connect() as connection:
+        with sql_fallbacks.fallback("find_elements_that_match", operator, reason) as fallback, \
+                self.engine.connect() as connection:
             for i, row in enumerate(connection.execute(selection)):
                 # unconstrained searches can return a very large number of objects, limit it to 20 by now
                 if maximum_number_of_elements and i >= maximum_number_of_elements:
                     break
+                fallback["rows"] += 1
                 value = operator.graph_from_row(row, d_context)
                 if operator is None or operator.match(value, match_miss=match_miss):
                     values.append(value)
 
         return values
 
+    @classmethod
+    def get_indexes(cls, node_factory):
+        """
+        Gets the indexes of the domain tables. A column is indexed if it is in the signature of the domain node (i.e.
+        it can be constrained by `generate_sql_where`), except for the columns in `NOT_INDEXED_COLUMNS`.
+
+        :param node_factory: the node factory, with the domain nodes
+        :type node_factory: NodeFactory
+        :return: the indexes
+        :rtype: List[Index]
+        """
+        indexes = []
+        for domain, table in cls.TABLE_BY_DOMAIN.items():
+            if domain not in node_factory.node_types:
+                continue
+            fields = node_factory.sample_nodes[domain].signature.keys()
+            columns = [(f,) for f in fields if f in table.columns and f not in cls.NOT_INDEXED_COLUMNS]
+            for names in columns + cls.COMPOSITE_INDEXES.get(domain, []):
+                name = f"ix_{table.name}_{'_'.join(names)}"
+                index = cls._indexes.get(name)
+                if index is None:
+                    index = Index(name, *[table.columns[n] for n in names])
+                    cls._indexes[name] = index
+                indexes.append(index)
+
+        return indexes
+
+    def create_indexes(self, connection, node_factory):
+        """
+        Creates the indexes of the domain tables (see `get_indexes`), if they do not exist yet.
+
+        :param connection: the connection
+        :type connection: sqlalchemy.engine.Connection
+        :param node_factory: the node factory, with the domain nodes
+        :type node_factory: NodeFactory
+        """
+        for index in self.get_indexes(node_factory):
+            index.create(connection, checkfirst=True)
+
     def _find_recipient_from_operator_query(self, operator, selection, d_context):
         values = []
         with self.engine.connect() as connection:
@@ -461,3 +519,7 @@ def fill_multiwoz_sql_db(data_directory, d_context: DialogContext, domains=None)
             load_taxis()
         if "train" in domains:
             load_trains(connection)
+
+        # creating the indexes after inserting the data is faster than updating them on each insertion
+        multiwoz_db.create_indexes(connection, NodeFactory.get_instance())
+        connection.commit()
@@ -40,16 +40,13 @@ class Hospital(MultiWOZDomain):
         return selection
 
     def graph_from_row(self, row, context):
-        params = []
+        params = {}
         for field in self.signature.keys():
             value = row[field]
             if value:
-                if isinstance(value, str):
-                    value = escape_string(value)
-                params.append(f"{field}={value}")
+                params[field] = value
 
-        node_str = f"Hospital({', '.join(params)})"
-        g, _ = Node.call_construct_eval(node_str, context, constr_tag=NODE_COLOR_DB)
+        g, _ = Node.call_construct_eval(node_fact.entity_ast('Hospital', params), context, constr_tag=NODE_COLOR_DB)
         g.tags[DB_NODE_TAG] = 0
         return g
 
@@ -354,7 +351,7 @@ def extract_find_hospital(utterance, slots, context, general=None):
             continue
 
         if context and value not in utterance:
-            references = get_refer_match(context, Node.collect_nodes(context.goals), context.goals,
+            references = get_refer_match(context, context.reachable_nodes(), context.goals,
                                          role=role, params={'fallback_type':'SearchCompleted', 'role': role})
             if references and references[0].dat == value:
                 extracted.append(f"{role}=refer(role={role})")
@@ -135,18 +135,15 @@ class Hotel(MultiWOZDomain):
         return selection
 
     def graph_from_row(self, row, context):
-        params = []
+        params = {}
         for field in self.signature.keys():
             if self.signature[field].custom:
                 continue
             value = row[field]
             if value:
-                if isinstance(value, str):
-                    value = escape_string(value)
-                params.append(f"{field}={value}")
+                params[field] = value
 
-        node_str = f"Hotel({', '.join(params)})"
-        g, _ = Node.call_construct_eval(node_str, context, constr_tag=NODE_COLOR_DB)
+        g, _ = Node.call_construct_eval(node_fact.entity_ast('Hotel', params), context, constr_tag=NODE_COLOR_DB)
         g.tags[DB_NODE_TAG] = 0
         return g
 
@@ -750,7 +747,7 @@ def extract_find_hotel(utterance, slots, context, general=None):
             continue
 
         if context and value not in utterance:
-            references = get_refer_match(context, Node.collect_nodes(context.goals), context.goals,
+            references = get_refer_match(context, context.reachable_nodes(), context.goals,
                                          role=role, params={'fallback_type':'SearchCompleted', 'role': role})
             if references and references[0].dat == value:
                 if role in {'bookstay', 'bookpeople', 'bookday'}:
@@ -592,7 +592,7 @@ def get_extract_exps(domain, context, general, extracted, extracted_book, extrac
     has_req = len(extracted_req) > 0
     domain = domain.lower()
     Domain = domain.capitalize()
-    exists = get_refer_match(context, Node.collect_nodes(context.goals), context.goals,
+    exists = get_refer_match(context, context.reachable_nodes(), context.goals,
                              type='Find%s' % Domain, no_fallback=True)  # do NOT create a new one!
     if extracted or (not extracted_book and not has_req and not OMIT_GET_INFO):
         inner_node_str = f"{Domain}?({', '.join(extracted)})"
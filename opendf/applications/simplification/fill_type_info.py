@@ -3,6 +3,7 @@ Collect Node type related information here and store in a format which can be pa
 have to directly know anything about the node types.
 """
 from opendf.graph.nodes.node import Node
+from opendf.defs import type_info_cache_path
 from opendf.utils.utils import get_subclasses
 
 
@@ -11,13 +12,6 @@ def fill_type_info(node_fact):
     node_types = {t.__name__: t for t in all_nodes}
     node_types['Any'] = Node  # 'Any' is a synonym for 'Node'
     node_types['Node'] = Node
-    node_fact.node_types = node_types  # fill node_fact BEFORE making sample nodes
 
-    # sample nodes: dictionary name -> instance of a node of that type
-    sample_nodes = {t.__name__: t() for t in all_nodes}
-    sample_nodes['Any'] = Node()
-    sample_nodes['Node'] = Node()
-    node_fact.sample_nodes = sample_nodes
-
-    node_fact.set_leaf_types()
-    node_fact.init_lists()
+    # also creates the sample nodes (dictionary name -> instance of a node of that type), on demand
+    node_fact.set_node_types(node_types, cache_path=type_info_cache_path)
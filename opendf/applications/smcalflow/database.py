@@ -1,6 +1,10 @@
 """
 Class to interact with a relational database specific for the application.
 """
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime, timedelta, time, date
 from typing import Sequence, Optional, Dict, List, Tuple
 
@@ -9,8 +13,8 @@ from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String,
     Boolean, select, func, update, delete, text, and_, or_, not_, cast, Date, Float
 
 from opendf.applications.core.nodes.time_nodes import Pdate_to_date_sexp
-from opendf.applications.smcalflow.domain import recipient_to_str_node, event_to_str_node, match_start, match_end, \
-    attendees_to_str_node, TIME_SUITABLE_FOR_SUBJECT, DBevent, DBPerson, WeatherPlace
+from opendf.applications.smcalflow.domain import recipient_to_ast, event_to_ast, match_start, match_end, \
+    attendees_to_ast, TIME_SUITABLE_FOR_SUBJECT, DBevent, DBPerson, WeatherPlace
 from opendf.applications.smcalflow.storage import Storage, RecipientEntry, AttendeeEntry, LocationEntry, EventEntry, \
     HolidayEntry
 
@@ -27,9 +31,12 @@ from opendf.defs import database_connection, database_log, database_future, NODE
 
 from opendf.applications.smcalflow.domain import get_stub_data_from_json
 
-from opendf.utils.database_utils import get_database_handler
+from opendf.utils.database_utils import get_database_handler, get_engine_pool_options, DatabaseStatistics, \
+    EntityCache, sql_fallbacks
 from opendf.utils.utils import to_list, str_to_datetime, id_sexp
 
+logger = logging.getLogger(__name__)
+
 database_handler = get_database_handler()
 
 
@@ -165,6 +172,30 @@ def select_event_with_overlap(start, end, selection):
     return selection
 
 
+def select_event_in_window(start, end, selection):
+    """
+    Adds a where clause to `selection`, in order to filter the events which may clash with a slot inside [`start`,
+    `end`]. The end is inclusive, since an event without duration clashes with the slots which end at it (see
+    `select_event_with_overlap`).
+
+    :param start: the start of the window
+    :type start: datetime
+    :param end: the end of the window
+    :type end: datetime
+    :param selection: the selection query
+    :type selection: Any
+    :return: the selection query with the appropriated where conditions
+    :rtype: Any
+    """
+    # the datetime values are bound with the type of the columns, so they are compared in the format the columns store
+    return selection.where(Database.EVENT_TABLE.columns.starts_at <= end,
+                           Database.EVENT_TABLE.columns.ends_at >= start)
+
+
+# the rows of the mutable tables, by table name, and the current recipient (see `Database.snapshot`)
+DatabaseSnapshot = namedtuple("DatabaseSnapshot", ["rows", "current_recipient_id", "current_recipient_location_id"])
+
+
 class Database(Storage):
     """
     Class to interact with the database.
@@ -250,6 +281,9 @@ class Database(Storage):
         Column("date", Date, nullable=False, primary_key=True),
     )
 
+    # the tables changed by the dialogues, the other tables hold reference data (see `snapshot`)
+    MUTABLE_TABLES = [RECIPIENT_TABLE, RECIPIENT_HAS_FRIEND_TABLE, LOCATION_TABLE, EVENT_TABLE, EVENT_HAS_ATTENDEE_TABLE]
+
     @staticmethod
     def get_instance():
         """
@@ -272,16 +306,61 @@ class Database(Storage):
             connection_string = database_connection
         Database.__instance = self
         self.engine: sqlalchemy.engine.base.Engine = \
-            create_engine(connection_string, echo=database_log, future=database_future)
+            create_engine(connection_string, echo=database_log, future=database_future,
+                          **get_engine_pool_options(connection_string))
+        self.statistics = DatabaseStatistics(self.engine)
+        # holds the connection of the current turn, per thread (see `turn`)
+        self._turn_state = threading.local()
         self._create_database()
         self._current_recipient_id: Optional[int] = None
         self._current_recipient_location_id: Optional[int] = None
 
         # cache for the node representation of the entities
-        self._recipient_graph: Dict[int, Node] = {}
-        self._attendee_graph: Dict[Tuple[int, int], Node] = {}
-        self._event_graph: Dict[int, Node] = {}
-        self._location_graph: Dict[int, Node] = {}
+        self._recipient_graph = EntityCache()  # { recipient id : graph }
+        self._attendee_graph = EntityCache()  # { (event id, recipient id) : graph }
+        self._event_graph = EntityCache()  # { event id : graph }
+        self._location_graph = EntityCache()  # { location id : graph }
+
+    @contextmanager
+    def connection(self):
+        """
+        Gets a connection to the database. Inside a turn (see `turn`), it is the connection of the turn; otherwise, it
+        is a new connection from the pool, which is returned to the pool at the end.
+
+        :return: the connection
+        :rtype: sqlalchemy.engine.Connection
+        """
+        connection = getattr(self._turn_state, "connection", None)
+        if connection is not None:
+            yield connection
+        else:
+            with self.engine.connect() as connection:
+                yield connection
+
+    @contextmanager
+    def turn(self):
+        """
+        Holds a single connection for all the queries of a dialog turn. The pending changes are committed at the end of
+        the turn, or rolled back, if the turn fails. Nested turns use the connection of the outermost one.
+
+        The number of queries of the turn is available at `statistics.turn_queries`.
+        """
+        if getattr(self._turn_state, "connection", None) is not None:
+            yield self
+            return
+        self.statistics.start_turn()
+        with self.engine.connect() as connection:
+            self._turn_state.connection = connection
+            try:
+                yield self
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                self._turn_state.connection = None
+                logger.debug("database turn: %d queries, pool: %s",
+                             self.statistics.turn_queries, self.engine.pool.status())
 
     def erase_database(self):
         """
@@ -292,21 +371,80 @@ class Database(Storage):
         self.metadata.clear()  # clear the tables known by the metadata
 
     def clear_cache(self):
-        self._recipient_graph: Dict[int, Node] = {}
-        self._attendee_graph: Dict[Tuple[int, int], Node] = {}
-        self._event_graph: Dict[int, Node] = {}
-        self._location_graph: Dict[int, Node] = {}
+        for cache in self._entity_caches().values():
+            cache.clear()
+
+    def _entity_caches(self):
+        return {"recipient": self._recipient_graph, "attendee": self._attendee_graph, "event": self._event_graph,
+                "location": self._location_graph}
+
+    def cache_stats(self):
+        """
+        Gets the statistics of the entity caches.
+
+        :return: the statistics of each cache, by entity name
+        :rtype: Dict[str, Dict[str, int]]
+        """
+        return {name: cache.stats() for name, cache in self._entity_caches().items()}
+
+    def invalidate_event(self, event_id):
+        """
+        Removes the cached graphs of the event, and of its attendees, after the event changed in the database.
+        """
+        self._event_graph.pop(event_id)
+        self._attendee_graph.invalidate(lambda key: key[0] == event_id)
+
+    def invalidate_recipient(self, recipient_id):
+        """
+        Removes the cached graphs of the recipient, and of the recipient as an attendee, after the recipient changed in
+        the database.
+        """
+        self._recipient_graph.pop(recipient_id)
+        self._attendee_graph.invalidate(lambda key: key[1] == recipient_id)
 
     def clear_database(self):
         """
         Erase all data from the database, but does not delete the scheme.
         This method only touches the tables created by this class.
         """
-        with self.engine.connect() as connection:
-            transaction = connection.begin()
+        with self.connection() as connection:
             for table in reversed(self.metadata.sorted_tables):
                 connection.execute(table.delete())
-            transaction.commit()
+            connection.commit()
+        self.clear_cache()
+
+    def snapshot(self):
+        """
+        Takes a snapshot of the data which changes during the dialogues (the tables in `MUTABLE_TABLES` and the current
+        recipient), to be restored by `restore`. The other tables hold reference data, which the dialogues do not
+        change, and are not part of the snapshot.
+
+        :return: the snapshot
+        :rtype: DatabaseSnapshot
+        """
+        with self.connection() as connection:
+            rows = {table.name: [dict(row._mapping) for row in connection.execute(select(table))]
+                    for table in self.MUTABLE_TABLES}
+        return DatabaseSnapshot(rows, self._current_recipient_id, self._current_recipient_location_id)
+
+    def restore(self, snapshot):
+        """
+        Restores the data of the snapshot, discarding the changes made after it was taken (e.g. created events).
+
+        :param snapshot: the snapshot
+        :type snapshot: DatabaseSnapshot
+        """
+        tables = [table for table in self.metadata.sorted_tables if table in self.MUTABLE_TABLES]
+        with self.connection() as connection:
+            for table in reversed(tables):
+                connection.execute(table.delete())
+            for table in tables:
+                rows = snapshot.rows[table.name]
+                if rows:
+                    connection.execute(insert(table), rows)
+            connection.commit()
+        self._current_recipient_id = snapshot.current_recipient_id
+        self._current_recipient_location_id = snapshot.current_recipient_location_id
         self.clear_cache()
 
     def _create_database(self):
@@ -332,7 +470,7 @@ class Database(Storage):
         return self.get_attendee_graph(None, self._current_recipient_id, d_context)
 
     def get_current_recipient_location(self):
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(self.LOCATION_TABLE).where(
                 self.LOCATION_TABLE.columns.id == self._current_recipient_location_id)
             for row in connection.execute(selection):
@@ -344,7 +482,7 @@ class Database(Storage):
         self._current_recipient_location_id = value
 
     def get_recipient_entry(self, identifier):
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(self.RECIPIENT_TABLE).where(self.RECIPIENT_TABLE.columns.id == identifier)
             for row in connection.execute(selection):
                 return create_recipient_from_row(row)
@@ -352,7 +490,7 @@ class Database(Storage):
         return None
 
     def get_location_entry(self, identifier) -> LocationEntry:
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(self.LOCATION_TABLE).where(self.LOCATION_TABLE.columns.id == identifier)
             for row in connection.execute(selection):
                 return LocationEntry(
@@ -365,8 +503,8 @@ class Database(Storage):
             recipient_entry = self.get_recipient_entry(identifier)
             if recipient_entry is None:
                 return None
-            string_entry = recipient_to_str_node(recipient_entry)
-            recipient_graph, _ = Node.call_construct_eval(string_entry, d_context, constr_tag=NODE_COLOR_DB)
+            recipient_graph, _ = Node.call_construct_eval(recipient_to_ast(recipient_entry), d_context,
+                                                          constr_tag=NODE_COLOR_DB)
             recipient_graph.tags[DB_NODE_TAG] = 0
             if update_cache:
                 self._recipient_graph[identifier] = recipient_graph
@@ -383,15 +521,15 @@ class Database(Storage):
             # TODO: replace string literals by default values for `show as status` and `response status`
             # noinspection PyTypeChecker
             attendee = AttendeeEntry(None, recipient_entry, "Busy", "NotResponded")
-            string_entry = attendees_to_str_node([attendee], [recipient_graph])
-            attendee_graph, _ = Node.call_construct_eval(string_entry, d_context, constr_tag=NODE_COLOR_DB)
+            attendee_graph, _ = Node.call_construct_eval(attendees_to_ast([attendee], [recipient_graph]), d_context,
+                                                         constr_tag=NODE_COLOR_DB)
             attendee_graph.tags[DB_NODE_TAG] = 0
             self._attendee_graph[(event_id, recipient_id)] = attendee_graph
 
         return attendee_graph
 
     def get_manager(self, recipient_id):
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             recipient = self.RECIPIENT_TABLE.alias("r")
             manager = self.RECIPIENT_TABLE.alias("m")
             selection = select(manager).join(recipient, recipient.c.manager_id == manager.c.id).where(
@@ -411,7 +549,7 @@ class Database(Storage):
         :rtype: List[int]
         """
         friends = []
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(self.RECIPIENT_HAS_FRIEND_TABLE.columns.friend_id).where(
                 self.RECIPIENT_HAS_FRIEND_TABLE.columns.recipient_id == recipient_id)
             for row in connection.execute(selection):
@@ -429,7 +567,7 @@ class Database(Storage):
         :rtype: List[Node]
         """
         recipients = []
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 recipient_graph = self.get_recipient_graph(row.id, d_context)
                 recipients.append(recipient_graph)
@@ -437,17 +575,20 @@ class Database(Storage):
         return recipients
 
     def find_recipients_that_match(self, operator, d_context):
+        reason = None  # the reason the constraint could not be translated into SQL, if any
         try:
             if operator is not None:
                 selection = operator.generate_sql()
                 if selection is not None:
                     return self._find_recipient_from_operator_query(selection, d_context)
-        except:
-            pass
+        except Exception as ex:
+            reason = ex
         recipients = []
-        with self.engine.connect() as connection:
+        with sql_fallbacks.fallback("find_recipients_that_match", operator, reason) as fallback, \
+                self.connection() as connection:
             selection = select(self.RECIPIENT_TABLE.columns.id)
             for row in connection.execute(selection):
+                fallback["rows"] += 1
                 recipient_graph = self.get_recipient_graph(row.id, d_context, update_cache=False)
                 if operator is None or operator.match(recipient_graph):
                     recipients.append(recipient_graph)
@@ -465,7 +606,7 @@ class Database(Storage):
         :rtype: List[Node]
         """
         attendees = []
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 attendee = self._attendee_graph.get((row.event_id, row.recipient_id))
                 if attendee is None:
@@ -479,17 +620,20 @@ class Database(Storage):
         return attendees
 
     def find_attendees_that_match(self, operator, d_context):
+        reason = None  # the reason the constraint could not be translated into SQL, if any
         try:
             if operator is not None:
                 selection = operator.generate_sql()
                 if selection is not None:
                     return self._find_attendees_from_operator_query(selection, d_context)
-        except:
-            pass
+        except Exception as ex:
+            reason = ex
         attendees = []
-        with self.engine.connect() as connection:
+        with sql_fallbacks.fallback("find_attendees_that_match", operator, reason) as fallback, \
+                self.connection() as connection:
             selection = select(self.EVENT_HAS_ATTENDEE_TABLE)
             for row in connection.execute(selection):
+                fallback["rows"] += 1
                 recipient_graph = self.get_recipient_graph(row.recipient_id, d_context, update_cache=False)
                 attendee, _ = Node.call_construct_eval(
                     f"Attendee(recipient={id_sexp(recipient_graph)}, response={row.response_status}, "
@@ -510,7 +654,7 @@ class Database(Storage):
         :rtype: List[Node]
         """
         events = []
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 event_graph = self.get_event_graph(row.id, d_context)
                 events.append(event_graph)
@@ -518,17 +662,20 @@ class Database(Storage):
         return events
 
     def find_events_that_match(self, operator, d_context):
+        reason = None  # the reason the constraint could not be translated into SQL, if any
         try:
             if operator is not None:
                 selection = operator.generate_sql()
                 if selection is not None:
                     return self._find_events_from_operator_query(selection, d_context)
-        except:
-            pass
+        except Exception as ex:
+            reason = ex
         events = []
-        with self.engine.connect() as connection:
+        with sql_fallbacks.fallback("find_events_that_match", operator, reason) as fallback, \
+                self.connection() as connection:
             selection = select(self.EVENT_TABLE.columns.id)
             for row in connection.execute(selection):
+                fallback["rows"] += 1
                 event_graph = self.get_event_graph(row.id, d_context, update_cache=False)
                 if operator is None or operator.match(event_graph):
                     events.append(event_graph)
@@ -546,7 +693,7 @@ class Database(Storage):
         :rtype: List[LocationEntry]
         """
         locations = []
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 locations.append(self._location_entry_from_row(row))
 
@@ -559,16 +706,18 @@ class Database(Storage):
                 return self._find_locations_from_operator_query(selection)
         locations = []
         location_name = operator.res.dat
-        with self.engine.connect() as connection:
+        with sql_fallbacks.fallback("find_locations_that_match", operator) as fallback, \
+                self.connection() as connection:
             selection = select(self.LOCATION_TABLE)
             for row in connection.execute(selection):
+                fallback["rows"] += 1
                 if location_name in row.name:
                     locations.append(self._location_entry_from_row(row))
 
         return locations
 
     def find_feature_for_place(self, place_id, feature=None):
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(self.PLACE_FEATURE_TABLE.columns.feature).join(
                 self.PLACE_HAS_FEATURE_TABLE).where(self.PLACE_HAS_FEATURE_TABLE.columns.location_id == place_id)
             if feature:
@@ -579,7 +728,7 @@ class Database(Storage):
 
     def _find_all_holidays_from_selection(self, selection):
         holidays = []
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 holidays.append(HolidayEntry(row.name, row.date))
         return holidays
@@ -602,7 +751,7 @@ class Database(Storage):
                     return self._find_all_holidays_from_selection(selection)
 
         holidays = []
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(self.HOLIDAY_TABLE)
             if name is not None:
                 selection = selection.where(self.HOLIDAY_TABLE.columns.name.like(f"%{name.get_dat(posname(1))}%"))
@@ -631,13 +780,26 @@ class Database(Storage):
         :return: the list of attendees from the event
         :rtype: List[AttendeeEntry]
         """
-        attendees = []
-        with self.engine.connect() as connection:
-            selection = select(self.EVENT_HAS_ATTENDEE_TABLE, self.RECIPIENT_TABLE).join(self.RECIPIENT_TABLE).where(
-                self.EVENT_HAS_ATTENDEE_TABLE.columns.event_id == event_id)
+        return self._get_attendees_from_events([event_id]).get(event_id, [])
+
+    def _get_attendees_from_events(self, event_ids):
+        """
+        Gets the attendees of all the events in `event_ids`, in a single query.
+
+        :param event_ids: the event ids, or 'all', for all the events
+        :type event_ids: List[int] or str
+        :return: the list of attendees of each event
+        :rtype: Dict[int, List[AttendeeEntry]]
+        """
+        attendees = {}
+        with self.connection() as connection:
+            selection = select(self.EVENT_HAS_ATTENDEE_TABLE, self.RECIPIENT_TABLE).join(self.RECIPIENT_TABLE)
+            if event_ids != 'all':
+                selection = selection.where(self.EVENT_HAS_ATTENDEE_TABLE.columns.event_id.in_(event_ids))
             for row in connection.execute(selection):
                 recipient_entry = create_recipient_from_row(row)
-                attendees.append(AttendeeEntry(event_id, recipient_entry, row.show_as_status, row.response_status))
+                attendees.setdefault(row.event_id, []).append(
+                    AttendeeEntry(row.event_id, recipient_entry, row.show_as_status, row.response_status))
 
         return attendees
 
@@ -645,6 +807,9 @@ class Database(Storage):
         """
         Gets a list of event entries with the given `identifiers`.
 
+        The events (with their location and organizer) are fetched in one query, and their attendees in another one,
+        regardless of the number of events.
+
         :param identifiers: the identifiers
         :type identifiers: List[int]
         :return: the event entries
@@ -652,22 +817,23 @@ class Database(Storage):
         """
         if not identifiers:
             return []
-        with self.engine.connect() as connection:
-            if identifiers=='all':
-                selection = select(self.EVENT_TABLE, self.LOCATION_TABLE, self.RECIPIENT_TABLE).join(
-                    self.LOCATION_TABLE, self.EVENT_TABLE.columns.location_id == Database.LOCATION_TABLE.columns.id,
-                    isouter=True).join(self.RECIPIENT_TABLE)
-            else:
-                selection = select(self.EVENT_TABLE, self.LOCATION_TABLE, self.RECIPIENT_TABLE).join(
-                    self.LOCATION_TABLE, self.EVENT_TABLE.columns.location_id == Database.LOCATION_TABLE.columns.id,
-                    isouter=True).join(self.RECIPIENT_TABLE).where(self.EVENT_TABLE.columns.id.in_(identifiers))
+        with self.connection() as connection:
+            selection = select(self.EVENT_TABLE, self.LOCATION_TABLE, self.RECIPIENT_TABLE).join(
+                self.LOCATION_TABLE, self.EVENT_TABLE.columns.location_id == Database.LOCATION_TABLE.columns.id,
+                isouter=True).join(self.RECIPIENT_TABLE)
+            if identifiers != 'all':
+                selection = selection.where(self.EVENT_TABLE.columns.id.in_(identifiers))
+            rows = connection.execute(selection).all()
+            if not rows:
+                return []
+            attendees = self._get_attendees_from_events('all' if identifiers == 'all' else [row.id for row in rows])
             events = []
-            for row in connection.execute(selection):
-                attendees = self._get_attendees_from_event(row.id)
+            for row in rows:
                 organizer = RecipientEntry(row.id_2, row.full_name, row.first_name, row.last_name,
                                            row.phone_number, row.email_address, row.manager_id)
                 location = self._location_entry_from_row(row)
-                event = EventEntry(row.id, row.subject, row.starts_at, row.ends_at, location, organizer, attendees)
+                event = EventEntry(row.id, row.subject, row.starts_at, row.ends_at, location, organizer,
+                                   attendees.get(row.id, []))
                 events.append(event)
 
         return events
@@ -708,8 +874,8 @@ class Database(Storage):
             recipient_nodes = \
                 [self.get_recipient_graph(attendee.recipient.identifier, d_context) for attendee in
                  event_entry.attendees]
-            string_entry = event_to_str_node(event_entry, recipient_nodes)
-            event_graph, _ = Node.call_construct_eval(string_entry, d_context, constr_tag=NODE_COLOR_DB)
+            event_graph, _ = Node.call_construct_eval(event_to_ast(event_entry, recipient_nodes), d_context,
+                                                      constr_tag=NODE_COLOR_DB)
             event_graph.tags[DB_NODE_TAG] = 0
             if update_cache:
                 self._event_graph[identifier] = event_graph
@@ -723,7 +889,7 @@ class Database(Storage):
         :return: the maximum event identifier
         :rtype: int
         """
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(func.max(self.EVENT_TABLE.columns.id).label("max"))
             for row in connection.execute(selection):
                 return row.max
@@ -735,7 +901,7 @@ class Database(Storage):
         :return: the maximum person identifier
         :rtype: int
         """
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(func.max(self.RECIPIENT_TABLE.columns.id).label("max"))
             for row in connection.execute(selection):
                 return row.max
@@ -747,7 +913,7 @@ class Database(Storage):
         :return: the maximum location identifier
         :rtype: int
         """
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(func.max(self.LOCATION_TABLE.columns.id).label("max"))
             for row in connection.execute(selection):
                 return row.max
@@ -761,7 +927,7 @@ class Database(Storage):
         :return: the identifier of the location, if exists; otherwise, `None`
         :rtype: Optional[int]
         """
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             selection = select(self.LOCATION_TABLE.columns.id).where(self.LOCATION_TABLE.columns.name == location)
             for row in connection.execute(selection):
                 return row.id
@@ -794,7 +960,7 @@ class Database(Storage):
         organizer_id = self._current_recipient_id
         identifier = self._get_maximum_event_id() + 1
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             if location_id is None:
                 location_id = self._get_maximum_location_id() + 1
                 connection.execute(insert(self.LOCATION_TABLE),
@@ -833,7 +999,7 @@ class Database(Storage):
 
         location_id = self._get_location_if_exist(location)
         organizer_id = self._current_recipient_id
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             if location_id is None:
                 location_id = self._get_maximum_location_id() + 1
                 connection.execute(insert(self.LOCATION_TABLE),
@@ -856,7 +1022,7 @@ class Database(Storage):
 
             connection.commit()
 
-        self._event_graph.pop(identifier, None)  # invalidate cached value
+        self.invalidate_event(identifier)
         return self.get_event_entry(identifier)
 
     def delete_event(self, identifier, subject, start, end, location, attendees):
@@ -864,7 +1030,7 @@ class Database(Storage):
         if len(ev) != 1:
             return None
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             event_id = ev[0].identifier
             connection.execute(delete(self.EVENT_TABLE).where(self.EVENT_TABLE.columns.id == event_id))
             connection.execute(
@@ -872,7 +1038,7 @@ class Database(Storage):
                     self.EVENT_HAS_ATTENDEE_TABLE.columns.event_id == event_id))
             connection.commit()
 
-        self._event_graph.pop(identifier, None)  # invalidate cached value
+        self.invalidate_event(event_id)
         return ev
 
     def _select_attendees(self, attendees, threshold, selection):
@@ -932,7 +1098,7 @@ class Database(Storage):
         if pre_filter is not None:
             selection = selection.where(self.EVENT_TABLE.columns.id.in_(set(map(lambda x: x.identifier, pre_filter))))
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             identifiers = []
             for row in connection.execute(selection):
                 if match_start(row, start) and match_end(row, end):
@@ -956,7 +1122,7 @@ class Database(Storage):
         if pre_filter is not None:
             selection = selection.where(self.EVENT_TABLE.columns.id.in_(set(map(lambda x: x.identifier, pre_filter))))
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             identifiers = []
             for row in connection.execute(selection):
                 identifiers.append(row.id)
@@ -979,7 +1145,7 @@ class Database(Storage):
         if pre_filter is not None:
             selection = selection.where(self.EVENT_TABLE.columns.id.in_(set(map(lambda x: x.identifier, pre_filter))))
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             identifiers = []
             for row in connection.execute(selection):
                 identifiers.append(row.id)
@@ -997,10 +1163,60 @@ class Database(Storage):
         if avoid_id is not None:
             selection = selection.where(self.EVENT_TABLE.columns.id != avoid_id)
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 return row.count == 0
 
+    def get_attendees_busy_intervals(self, attendees_ids, window_start, window_end, ignore_event_id=None):
+        """
+        Gets the (attendee id, start, end) of the events of the attendees which may clash with a slot inside the window.
+
+        :param attendees_ids: the attendees
+        :type attendees_ids: List[int]
+        :param window_start: the start of the window (e.g. the earliest start of the candidate slots)
+        :type window_start: datetime
+        :param window_end: the end of the window (e.g. the latest end of the candidate slots)
+        :type window_end: datetime
+        :param ignore_event_id: an event to ignore (e.g. the event being updated)
+        :type ignore_event_id: Optional[int]
+        :return: the busy intervals
+        :rtype: List[Tuple[int, datetime, datetime]]
+        """
+        selection = select(self.EVENT_HAS_ATTENDEE_TABLE.columns.recipient_id, self.EVENT_TABLE.columns.starts_at,
+                           self.EVENT_TABLE.columns.ends_at).join(self.EVENT_TABLE).where(
+            self.EVENT_HAS_ATTENDEE_TABLE.columns.recipient_id.in_(attendees_ids))
+        selection = select_event_in_window(window_start, window_end, selection)
+        if ignore_event_id:
+            selection = selection.where(self.EVENT_TABLE.columns.id != ignore_event_id)
+        with self.connection() as connection:
+            return [tuple(row) for row in connection.execute(selection)]
+
+    def get_locations_busy_intervals(self, locations_ids, window_start, window_end, ignore_event_id=None):
+        """
+        Gets the (location id, start, end) of the events in the locations (among `locations_ids`) which are not always
+        free, and which may clash with a slot inside the window.
+
+        :param locations_ids: the locations (e.g. the locations of the candidate slots)
+        :type locations_ids: List[int]
+        :param window_start: the start of the window (e.g. the earliest start of the candidate slots)
+        :type window_start: datetime
+        :param window_end: the end of the window (e.g. the latest end of the candidate slots)
+        :type window_end: datetime
+        :param ignore_event_id: an event to ignore (e.g. the event being updated)
+        :type ignore_event_id: Optional[int]
+        :return: the busy intervals
+        :rtype: List[Tuple[int, datetime, datetime]]
+        """
+        selection = select(self.LOCATION_TABLE.columns.id, self.EVENT_TABLE.columns.starts_at,
+                           self.EVENT_TABLE.columns.ends_at).select_from(self.EVENT_TABLE).join(
+            self.LOCATION_TABLE).where(self.LOCATION_TABLE.columns.always_free == False,
+                                       self.LOCATION_TABLE.columns.id.in_(locations_ids))
+        selection = select_event_in_window(window_start, window_end, selection)
+        if ignore_event_id:
+            selection = selection.where(self.EVENT_TABLE.columns.id != ignore_event_id)
+        with self.connection() as connection:
+            return [tuple(row) for row in connection.execute(selection)]
+
     def has_location(self, operator):
         """
         Checks if there is at least one location that complies with `operator`.
@@ -1013,7 +1229,7 @@ class Database(Storage):
         selection = select(func.count(self.LOCATION_TABLE.columns.id).label("count"))
         selection = operator.generate_sql_where(selection, None)
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 return row.count != 0
 
@@ -1029,7 +1245,7 @@ class Database(Storage):
         if avoid_id is not None:
             selection = selection.where(self.EVENT_TABLE.columns.id != avoid_id)
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             for row in connection.execute(selection):
                 return row.count == 0
 
@@ -1052,7 +1268,7 @@ class Database(Storage):
         organizer_id = self._current_recipient_id
         identifier = self._get_maximum_event_id() + 1
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             if location_id is None:
                 location_id = self._get_maximum_location_id() + 1
                 connection.execute(
@@ -1093,13 +1309,14 @@ class Database(Storage):
         """
         event_entry = self.get_event_entry(event_id)
         if event_entry is not None:
-            with self.engine.connect() as connection:
+            with self.connection() as connection:
                 connection.execute(
                     delete(self.EVENT_TABLE).where(self.EVENT_TABLE.columns.id == event_id))
                 connection.execute(
                     delete(self.EVENT_HAS_ATTENDEE_TABLE).where(
                         self.EVENT_HAS_ATTENDEE_TABLE.columns.event_id == event_id))
                 connection.commit()
+            self.invalidate_event(event_id)
 
         return DBevent(
             event_entry.identifier, event_entry.subject, event_entry.starts_at, event_entry.ends_at,
@@ -1132,7 +1349,7 @@ class Database(Storage):
         else:
             person_has_friend_data.append({"recipient_id": identifier, "friend_id": db_person.friends})
 
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             connection.execute(insert(self.RECIPIENT_TABLE), person_data)
             if person_has_friend_data:
                 connection.execute(insert(self.RECIPIENT_HAS_FRIEND_TABLE), person_has_friend_data)
@@ -1154,7 +1371,7 @@ class Database(Storage):
         person_entry = self.get_recipient_entry(person_id)
         friends = self.get_friends(person_id)
         if person_entry is not None:
-            with self.engine.connect() as connection:
+            with self.connection() as connection:
                 connection.execute(
                     delete(self.RECIPIENT_TABLE).where(self.RECIPIENT_TABLE.columns.id == person_id))
                 connection.execute(
@@ -1162,6 +1379,7 @@ class Database(Storage):
                         self.RECIPIENT_HAS_FRIEND_TABLE.columns.recipient_id == person_id))
                 # TODO: should we delete all the events organised by this person?
                 connection.commit()
+            self.invalidate_recipient(person_id)
 
         return DBPerson(
             person_entry.full_name, person_entry.first_name, person_entry.last_name, person_entry.identifier,
@@ -1184,7 +1402,7 @@ class Database(Storage):
             'radius': db_place.radius, 'always_free': db_place.always_free,
             'is_virtual': db_place.is_virtual
         }]
-        with self.engine.connect() as connection:
+        with self.connection() as connection:
             connection.execute(insert(self.LOCATION_TABLE), location_data)
             connection.commit()
 
@@ -1204,11 +1422,12 @@ class Database(Storage):
         """
         place_entry = self.get_location_entry(place_id)
         if place_entry is not None:
-            with self.engine.connect() as connection:
+            with self.connection() as connection:
                 connection.execute(
                     delete(self.LOCATION_TABLE).where(self.LOCATION_TABLE.columns.id == place_id))
                 # TODO: should we delete all the events in this location?
                 connection.commit()
+            self._location_graph.pop(place_id)
 
         return WeatherPlace(
             place_entry.identifier, place_entry.name, place_entry.address,
@@ -1230,7 +1449,7 @@ def populate_stub_database(stub_data_file, people=None, events=None, places=None
     events = events if events else db_events
     places = places if places else weather_places
     database.clear_database()
-    with database.engine.connect() as connection:
+    with database.connection() as connection:
         recipient_data = []
         recipient_has_friend_data = []
         for person in people:
@@ -13,14 +13,17 @@ from opendf.applications.smcalflow.storage import RecipientEntry, EventEntry, Lo
 #     place_has_features, CURRENT_RECIPIENT_LOCATION_ID, HOLIDAYS
 from opendf.applications.core.nodes.time_nodes import datetime_to_str, HOLIDAYS
 from opendf.defs import *
+from opendf.graph.node_factory import NodeFactory
 from opendf.graph.nodes.node import Node
-from opendf.parser.pexp_parser import escape_string
+from opendf.parser.pexp_parser import escape_string, reference_ast
 from opendf.utils.utils import to_list, id_sexp, str_to_datetime
 
 from datetime import time, datetime, date
 
 logger = logging.getLogger(__name__)
 
+node_fact = NodeFactory.get_instance()
+
 TIME_SUITABLE_FOR_SUBJECT = {
     "breakfast": [time(7), time(9)],
     "lunch": [time(12), time(14)],
@@ -150,6 +153,85 @@ def event_to_str_node(event_entry: EventEntry, att_nodes=None):
     return sexp
 
 
+# the functions below create the ASTs of the same nodes as the `..._to_str_node` functions above. The ASTs are
+# given directly to the graph construction - this avoids building (and then parsing) the P-expression strings
+
+def recipient_to_ast(recipient: RecipientEntry):
+    return node_fact.entity_ast('Recipient', [
+        ('name', node_fact.entity_ast('PersonName', [(None, recipient.full_name)])),
+        ('firstName', recipient.first_name), ('lastName', recipient.last_name), ('id', recipient.identifier),
+        ('phoneNum', recipient.phone_number), ('email', recipient.email_address)])
+
+
+def attendee_to_ast(attendee, recipient, event_id=None):
+    """
+    Create the AST of the attendee node.
+
+    :param attendee: the attendee
+    :type attendee: AttendeeEntry
+    :param recipient: the AST of the recipient (may be a reference to an existing recipient node)
+    :type recipient: ASTNode
+    :param event_id: the id of the event, if given
+    :type event_id: Optional[int]
+    :return: the AST of the attendee
+    :rtype: ASTNode
+    """
+    return node_fact.entity_ast('Attendee', [('recipient', recipient), ('response', attendee.response_status),
+                                             ('show', attendee.show_as_status), ('eventid', event_id)])
+
+
+def attendees_to_ast(att, nodes=None):
+    """
+    Same as `attendees_to_str_node`, but returns the AST.
+    """
+    if nodes:
+        asts = [attendee_to_ast(attendee, reference_ast(node.id)) for attendee, node in zip(att, to_list(nodes))]
+    else:
+        asts = [attendee_to_ast(attendee, recipient_to_ast(attendee.recipient)) for attendee in att]
+    if len(asts) == 1:
+        return asts[0]
+    elif asts:
+        return node_fact.entity_ast('SET', [(None, a) for a in asts])
+
+    return None
+
+
+def datetime_to_ast(s: datetime):
+    return node_fact.entity_ast('DateTime', [
+        ('date', node_fact.entity_ast('Date', [('year', s.year), ('month', s.month), ('day', s.day)])),
+        ('time', node_fact.entity_ast('Time', [('hour', s.hour), ('minute', s.minute)]))])
+
+
+def period_ast(yr=None, mn=None, wk=None, dy=None, hr=None, mt=None):
+    values = [('year', yr), ('month', mn), ('week', wk), ('day', dy), ('hour', hr), ('minute', mt)]
+    return node_fact.entity_ast('Period', [(n, v) for n, v in values if v is not None and v >= 0])
+
+
+def event_to_time_slot_ast(event_entry: EventEntry):
+    params = []
+    if event_entry.starts_at is not None:
+        params.append(('start', datetime_to_ast(event_entry.starts_at)))
+    if event_entry.ends_at is not None:
+        params.append(('end', datetime_to_ast(event_entry.ends_at)))
+    if len(params) > 1:
+        params.append(('duration', period_ast(*Ptimedelta_to_period_values(event_entry.ends_at -
+                                                                           event_entry.starts_at))))
+
+    if params:
+        return node_fact.entity_ast('TimeSlot', params)
+
+    return None
+
+
+def event_to_ast(event_entry: EventEntry, att_nodes=None):
+    location = None
+    if event_entry.location.name is not None:
+        location = node_fact.entity_ast('LocationKeyphrase', [(None, event_entry.location.name)])
+    return node_fact.entity_ast('Event', [
+        ('subject', event_entry.subject), ('slot', event_to_time_slot_ast(event_entry)), ('location', location),
+        ('attendees', attendees_to_ast(event_entry.attendees, att_nodes)), ('id', event_entry.identifier)])
+
+
 def match_subject(ev: EventEntry, filt):
     return True if filt is None or filt in ev.subject else False
 
@@ -281,8 +363,8 @@ class GraphDB(Storage):
         recipient_entry = self.get_recipient_entry(self._current_recipient_id)
         recipient_graph = self.get_recipient_graph(self._current_recipient_id, d_context)
         attendee = AttendeeEntry(None, recipient_entry, "Busy", "NotResponded")
-        string_entry = attendees_to_str_node([attendee], [recipient_graph])
-        attendee_graph, _ = Node.call_construct_eval(string_entry, d_context, constr_tag=NODE_COLOR_DB)
+        attendee_graph, _ = Node.call_construct_eval(attendees_to_ast([attendee], [recipient_graph]), d_context,
+                                                     constr_tag=NODE_COLOR_DB)
         attendee_graph.tags[DB_NODE_TAG] = 0
 
         return attendee_graph
@@ -545,8 +627,8 @@ def fill_graph_db(d_context, stub_data_file, people=None, events=None):
                                              p.email_address, p.manager_id)
 
             # create recipient graph
-            s = recipient_to_str_node(recipient_entry)
-            recipient_graph, _ = Node.call_construct_eval(s, d_context, constr_tag=NODE_COLOR_DB)
+            recipient_graph, _ = Node.call_construct_eval(recipient_to_ast(recipient_entry), d_context,
+                                                          constr_tag=NODE_COLOR_DB)
             recipient_graph.tags[DB_NODE_TAG] = 0
             db_recipient[recipient_entry.identifier] = recipient_entry
             gr_recipient[recipient_entry.identifier] = recipient_graph
@@ -587,8 +669,7 @@ def fill_graph_db(d_context, stub_data_file, people=None, events=None):
             for a in attendees:
                 aid = a.recipient.identifier
                 rcp = graph_db.get_recipient_graph(aid, d_context)
-                d, _ = Node.call_construct_eval('Attendee(recipient=%s, response=%s, show=%s, eventid=%d)' %
-                                                (id_sexp(rcp), a.response_status, a.show_as_status, e.id), d_context,
+                d, _ = Node.call_construct_eval(attendee_to_ast(a, reference_ast(rcp.id), e.id), d_context,
                                                 constr_tag=NODE_COLOR_DB)
                 d.tags[DB_NODE_TAG] = 0
                 db_attendee[(e.id, aid)] = a
@@ -598,8 +679,7 @@ def fill_graph_db(d_context, stub_data_file, people=None, events=None):
             event_entry = EventEntry(e.id, e.subject, str_to_datetime(e.start), str_to_datetime(e.end), location,
                                      organizer, attendees)
 
-            s = event_to_str_node(event_entry, pnodes)
-            d, _ = Node.call_construct_eval(s, d_context, constr_tag=NODE_COLOR_DB)
+            d, _ = Node.call_construct_eval(event_to_ast(event_entry, pnodes), d_context, constr_tag=NODE_COLOR_DB)
             d.tags[DB_NODE_TAG] = 0
             db_event[event_entry.identifier] = event_entry
             gr_event[event_entry.identifier] = d
@@ -19,14 +19,17 @@ from opendf.applications.smcalflow.exceptions.df_exception import BadEventConstr
     MultipleEventSuggestionsException
 from opendf.parser.pexp_parser import escape_string
 from opendf.utils.database_utils import get_database_handler
+from opendf.applications.smcalflow.slot_search import SlotSearch, group_busy_intervals, to_datetime
 from opendf.applications.smcalflow.storage_factory import StorageFactory
-from opendf.applications.smcalflow.time_utils import has_out_time, get_event_times_str, DateTimeIterator, skip_minutes
+from opendf.applications.smcalflow.time_utils import has_out_time, get_event_times_str, DateTimeIterator, skip_minutes, \
+    get_datetime_bounds
 from opendf.graph.nodes.node import Node, create_node_from_dict
 from opendf.utils.utils import id_sexp, comma_id_sexp
-from opendf.defs import get_system_datetime
+from opendf.defs import get_system_datetime, EnvironmentDefinition
 
 logger = logging.getLogger(__name__)
 storage = StorageFactory.get_instance()
+environment_definitions = EnvironmentDefinition.get_instance()
 
 
 class EventFactory(ABC):
@@ -563,15 +566,15 @@ class IteratorEventFactory(SimpleEventFactory):
             earliest = get_system_datetime()
 
         # Creates a start and an end iterator to run over all possible dates starting on earliest
-        # It might be optimized to avoid periods not allowed by the constraints, might be tricky for complex constraints
-        # If a specific time is given, iterate only over the specif time, otherwise, iterate over all possible dates
+        # If a specific time is given, iterate only over the specif time, otherwise, iterate over the dates allowed by
+        # the bounds of the constraint. The bounds are a superset of the matching dates, so they are still checked
+        # with `match` below; they just skip the ranges (e.g. other days or hours) that can not match
         latest = earliest + timedelta(days=365)  # to avoid an infinite loop, only look for event within 1 year range
 
-        # TODO: A big performance improvement can be done here, by constraining the DateTimeIterator to iterate only
-        #  over suitable values
-        start_iterator = DateTimeIterator(earliest=earliest, latest=latest) if spec_start is None else iter([
-            spec_start])
-        end_iterator = DateTimeIterator(earliest=earliest, latest=latest) if spec_end is None else iter([spec_end])
+        start_iterator = DateTimeIterator(earliest=earliest, latest=latest, bounds=get_datetime_bounds(cstart)) \
+            if spec_start is None else iter([spec_start])
+        end_iterator = DateTimeIterator(earliest=earliest, latest=latest, bounds=get_datetime_bounds(cend)) \
+            if spec_end is None else iter([spec_end])
         completed_solutions = []
         clashed_solutions = []
         try:
@@ -858,16 +861,24 @@ class DatabaseEventFactory(EventFactory):
         suggestions that clash into other events, respectively
         :rtype: Tuple[List[Any], List[Any], List[Any]]
         """
-        selection = self.create_database_selection(root, d_context, subject, attendees_ids, ignore_event_id)
+        if environment_definitions.slot_search_by_intervals:
+            selection, columns = self.create_candidate_selection(root, d_context, subject)
+            slot_search = self.create_slot_search(selection, columns, attendees_ids, ignore_event_id)
+        else:
+            selection = self.create_database_selection(root, d_context, subject, attendees_ids, ignore_event_id)
+            slot_search = None
 
         completed_suggestions = []
         clashed_suggestions = []
         all_suggestions = []
-        with self.database.engine.connect() as connection:
+        with self.database.connection() as connection:
             minimum_interval = timedelta(minutes=30 - 1)
             last_complete_start = None
             last_clashed_start = None
-            for row in connection.execute(selection):
+            rows = connection.execute(selection)
+            if slot_search is not None:
+                rows = slot_search.suggestions(rows)
+            for row in rows:
                 # filtering in order to reduce the number of suggestions, for instance,
                 #  remove suggestions that are close in time e.g. starts at 13:00, 13:05, 13:10...
                 #  maybe we should consider close (in time) suggestions if they are on different locations
@@ -920,6 +931,88 @@ class DatabaseEventFactory(EventFactory):
         :return: the selection SQL query
         :rtype: Any
         """
+        selection, columns = self.create_candidate_selection(root, d_context, subject)
+        suggested_starts_at, suggested_ends_at, suggested_location_id, has_location = columns
+
+        # 2 - Location
+        if has_location:
+            location_subquery = select(Database.LOCATION_TABLE.columns.id).select_from(
+                Database.EVENT_TABLE).join(Database.LOCATION_TABLE)
+            location_subquery = select_event_with_overlap(suggested_starts_at, suggested_ends_at, location_subquery)
+            location_subquery = location_subquery.where(Database.LOCATION_TABLE.columns.always_free == False)
+            location_subquery = location_subquery.where(Database.LOCATION_TABLE.columns.id == suggested_location_id)
+            if ignore_event_id:
+                location_subquery = location_subquery.where(Database.EVENT_TABLE.columns.id != ignore_event_id)
+            location_subquery = location_subquery.exists()
+
+            # this might make the query very expensive, if there are only few conditions
+            selection = selection.where(not_(location_subquery))
+
+        # 3 - Attendees
+        attendees_subquery = select(
+            func.count(distinct(Database.EVENT_HAS_ATTENDEE_TABLE.columns.recipient_id)).label("count")
+        ).join(Database.EVENT_TABLE).where(
+            Database.EVENT_HAS_ATTENDEE_TABLE.columns.recipient_id.in_(attendees_ids))
+
+        attendees_subquery = select_event_with_overlap(suggested_starts_at, suggested_ends_at, attendees_subquery)
+        if ignore_event_id:
+            attendees_subquery = attendees_subquery.where(Database.EVENT_TABLE.columns.id != ignore_event_id)
+        attendees_subquery = attendees_subquery.scalar_subquery()
+        selection = selection.add_columns(attendees_subquery.label("attendees_clashes"))
+
+        return selection
+
+    def create_slot_search(self, selection, columns, attendees_ids, ignore_event_id):
+        """
+        Creates the slot search of the candidate slots, with the busy intervals of the attendees and of the locations
+        inside the window of the candidates (from the earliest start to the latest end of the candidate slots).
+
+        :param selection: the selection of the candidate slots
+        :type selection: Any
+        :param columns: the start, end and location id columns of the candidates, and whether the location is in the
+        database (see `create_candidate_selection`)
+        :type columns: Tuple[Any, Any, Any, bool]
+        :param attendees_ids: the list of attendees ids
+        :type attendees_ids: List[int]
+        :param ignore_event_id: an event id to ignore
+        :type ignore_event_id: int
+        :return: the slot search
+        :rtype: SlotSearch
+        """
+        starts_at, ends_at, location_id, has_location = columns
+        # the window of each candidate location, in a single pass over the candidates
+        candidates = selection.order_by(None).subquery()
+        window_selection = select(
+            candidates.columns[location_id.name], func.min(candidates.columns[starts_at.name]),
+            func.max(candidates.columns[ends_at.name])).group_by(candidates.columns[location_id.name])
+        with self.database.connection() as connection:
+            windows = [tuple(row) for row in connection.execute(window_selection)]
+        if not windows:
+            return SlotSearch({}, {} if has_location else None)
+
+        window_start = min(to_datetime(row[1]) for row in windows)
+        window_end = max(to_datetime(row[2]) for row in windows)
+        attendees_busy = group_busy_intervals(self.database.get_attendees_busy_intervals(
+            attendees_ids, window_start, window_end, ignore_event_id))
+        locations_busy = None
+        if has_location:
+            locations_busy = group_busy_intervals(self.database.get_locations_busy_intervals(
+                [row[0] for row in windows], window_start, window_end, ignore_event_id))
+        return SlotSearch(attendees_busy, locations_busy)
+
+    def create_candidate_selection(self, root, d_context, subject):
+        """
+        Creates the selection of the candidate slots of the event suggestions: all the columns of
+        `create_database_selection`, except for `attendees_clashes`, and without checking if the location is free.
+
+        :param root: the root containing the constraints for the time and location
+        :type root: Node
+        :param subject: the subject of the event
+        :type subject: str
+        :return: the selection SQL query; and the start, end and location id columns, and whether the location is in
+        the database
+        :rtype: Tuple[Any, Tuple[Any, Any, Any, bool]]
+        """
         # Graph part
         ttree = Node.get_truncated_constraint_tree(root, 'Event', 'TimeSlot', 'slot')
         cstart, cend, dur, bound, inter = None, None, None, None, None
@@ -1004,34 +1097,10 @@ class DatabaseEventFactory(EventFactory):
 
         selection = selection.add_columns(in_holiday, in_off_hours, bad_for_subject)
 
-        # 2 - Location
+        # 2 - Location (whether the location is free is checked by the caller)
         selection = location_node.generate_sql_where(selection, None, name_field=suggested_location_name)
-        if has_location:
-            location_subquery = select(Database.LOCATION_TABLE.columns.id).select_from(
-                Database.EVENT_TABLE).join(Database.LOCATION_TABLE)
-            location_subquery = select_event_with_overlap(suggested_starts_at, suggested_ends_at, location_subquery)
-            location_subquery = location_subquery.where(Database.LOCATION_TABLE.columns.always_free == False)
-            location_subquery = location_subquery.where(Database.LOCATION_TABLE.columns.id == suggested_location_id)
-            if ignore_event_id:
-                location_subquery = location_subquery.where(Database.EVENT_TABLE.columns.id != ignore_event_id)
-            location_subquery = location_subquery.exists()
 
-            # this might make the query very expensive, if there are only few conditions
-            selection = selection.where(not_(location_subquery))
-
-        # 3 - Attendees
-        attendees_subquery = select(
-            func.count(distinct(Database.EVENT_HAS_ATTENDEE_TABLE.columns.recipient_id)).label("count")
-        ).join(Database.EVENT_TABLE).where(
-            Database.EVENT_HAS_ATTENDEE_TABLE.columns.recipient_id.in_(attendees_ids))
-
-        attendees_subquery = select_event_with_overlap(suggested_starts_at, suggested_ends_at, attendees_subquery)
-        if ignore_event_id:
-            attendees_subquery = attendees_subquery.where(Database.EVENT_TABLE.columns.id != ignore_event_id)
-        attendees_subquery = attendees_subquery.scalar_subquery()
-        selection = selection.add_columns(attendees_subquery.label("attendees_clashes"))
-
-        # 4 - Time
+        # 3 - Time
         time_slot, _ = Node.call_construct_eval(create_node_from_dict(
             "TimeSlot", start=cstart, end=cend, duration=dur, bound=bound, inter=inter), d_context)
 
@@ -1041,7 +1110,7 @@ class DatabaseEventFactory(EventFactory):
         # Sorting
         selection = selection.order_by(in_holiday, in_off_hours, bad_for_subject, suggested_starts_at)
 
-        return selection
+        return selection, (suggested_starts_at, suggested_ends_at, suggested_location_id, has_location)
 
     def select_duration_and_end(self, suggested_starts_at, join_tables,
                                 duration_label="suggested_duration", end_label="suggested_ends_at"):
@@ -756,7 +756,7 @@ class FindManager(Node):
         p = storage.get_manager(idx)
         if not p:
             raise InvalidResultException("Error - Could not find manager of #%d" % idx, self)
-        d, e = self.call_construct_eval(recipient_to_str_node(p), self.context, constr_tag=NODE_COLOR_DB)
+        d, e = self.call_construct_eval(recipient_to_ast(p), self.context, constr_tag=NODE_COLOR_DB)
         self.set_result(d)
 
     def transform_graph(self, top):
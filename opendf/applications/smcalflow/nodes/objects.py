@@ -733,7 +733,7 @@ class Event(Node):
                 if allow_clash:
                     clash = True
                 else:
-                    e, ex = self.call_construct_eval(event_to_str_node(evs[0]), self.context, register=False)
+                    e, ex = self.call_construct_eval(event_to_ast(evs[0]), self.context, register=False)
                     m = 'You already have' if cuid in evs[0].get_attendee_ids_set() else \
                         storage.get_recipient_entry(a).full_name + ' already has'
                     raise ClashEventSuggestionsException(
@@ -745,7 +745,7 @@ class Event(Node):
                 if allow_clash:
                     clash = True
                 else:
-                    e, ex = self.call_construct_eval(event_to_str_node(evs[0]), self.context, register=False)
+                    e, ex = self.call_construct_eval(event_to_ast(evs[0]), self.context, register=False)
                     raise ClashEventSuggestionsException(
                         'Another event is using this location: NL %s' % e.describe().text, self)
         return clash
@@ -842,7 +842,7 @@ class Event(Node):
                 selection = self.input_view('subject').generate_sql_where(
                     selection, Database.EVENT_TABLE.columns.subject, **new_kwargs)
         if 'id' in self.inputs:
-            selection = self.input_view('id').generate_sql_where(selection, Database.EVENT_TABLE.columns.id, kwargs)
+            selection = self.input_view('id').generate_sql_where(selection, Database.EVENT_TABLE.columns.id, **kwargs)
 
         return selection
 
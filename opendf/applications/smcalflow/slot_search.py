@@ -0,0 +1,146 @@
+"""
+Finds the clashes of event suggestions with interval arithmetic, instead of checking each candidate slot against the
+event table with SQL sub-queries.
+
+The busy time of each resource (an attendee or a location) is kept as a sorted list of disjoint intervals, so checking
+a candidate slot is a binary search.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+DATABASE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def to_datetime(value):
+    """
+    Converts a datetime value from the database, which can be a string (e.g. when computed by a SQLite function), to
+    datetime.
+
+    :param value: the value
+    :type value: str or datetime
+    :return: the datetime
+    :rtype: datetime
+    """
+    if isinstance(value, str):
+        return datetime.strptime(value[:19], DATABASE_DATETIME_FORMAT)
+    return value
+
+
+class BusyIntervals:
+    """
+    The busy intervals of a single resource.
+
+    An event [start, end) clashes with a slot [s, e) if their intersection is not empty; an event without duration,
+    at point p, clashes with the slot if s <= p <= e (as in `database.select_event_with_overlap`).
+    """
+
+    def __init__(self, intervals=()):
+        """
+        Creates the busy intervals.
+
+        :param intervals: the (start, end) of the events
+        :type intervals: Iterable[Tuple[datetime, datetime]]
+        """
+        merged: List[List[datetime]] = []
+        points = []
+        for start, end in sorted(intervals):
+            if start == end:
+                points.append(start)
+            elif merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [i[0] for i in merged]
+        self.ends = [i[1] for i in merged]  # the intervals are disjoint, so the ends are sorted too
+        self.points = points
+
+    def __len__(self):
+        return len(self.starts) + len(self.points)
+
+    def is_busy(self, start, end):
+        """
+        Checks if the resource is busy at some point of [start, end).
+
+        :param start: the start of the slot
+        :type start: datetime
+        :param end: the end of the slot
+        :type end: datetime
+        :return: `True`, if the slot clashes with a busy interval; otherwise, `False`
+        :rtype: bool
+        """
+        # the last interval starting before the end of the slot is the only one which may reach the slot
+        i = bisect_left(self.starts, end) - 1
+        if i >= 0 and self.ends[i] > start:
+            return True
+        if self.points:
+            return bisect_right(self.points, end) > bisect_left(self.points, start)
+        return False
+
+
+def group_busy_intervals(rows):
+    """
+    Groups the (resource id, start, end) rows by resource.
+
+    :param rows: the rows
+    :type rows: Iterable[Tuple[int, datetime, datetime]]
+    :return: the busy intervals of each resource
+    :rtype: Dict[int, BusyIntervals]
+    """
+    intervals: Dict[int, List[Tuple[datetime, datetime]]] = {}
+    for identifier, start, end in rows:
+        intervals.setdefault(identifier, []).append((start, end))
+    return {identifier: BusyIntervals(values) for identifier, values in intervals.items()}
+
+
+class SlotSearch:
+    """
+    Computes the clashes of the candidate slots of an event suggestion with the events of the attendees and of the
+    location.
+
+    The candidates are the rows of the suggestion query without the clash columns (see
+    `DatabaseEventFactory.create_candidate_selection`). They are turned into suggestions with the same fields as the
+    SQL ones: the candidates whose location is busy are dropped, and the number of busy attendees is added as
+    `attendees_clashes`.
+    """
+
+    def __init__(self, attendees_busy, locations_busy=None):
+        """
+        Creates the slot search.
+
+        :param attendees_busy: the busy intervals of each (involved) attendee
+        :type attendees_busy: Dict[int, BusyIntervals]
+        :param locations_busy: the busy intervals of each location, or `None` if the location should not be checked
+        :type locations_busy: Optional[Dict[int, BusyIntervals]]
+        """
+        self.attendees_busy = attendees_busy
+        self.locations_busy = locations_busy
+        self._suggestion_type = None
+
+    def attendees_clashes(self, start, end):
+        return sum(1 for busy in self.attendees_busy.values() if busy.is_busy(start, end))
+
+    def location_is_busy(self, location_id, start, end):
+        if self.locations_busy is None:
+            return False
+        busy = self.locations_busy.get(location_id)
+        return busy is not None and busy.is_busy(start, end)
+
+    def suggestions(self, candidates):
+        """
+        Yields the suggestions from the candidates, in the same order.
+
+        :param candidates: the candidate rows
+        :type candidates: Iterable[Any]
+        :return: the suggestions
+        :rtype: Iterator[Any]
+        """
+        for row in candidates:
+            start = to_datetime(row.suggested_starts_at)
+            end = to_datetime(row.suggested_ends_at)
+            if self.location_is_busy(row.suggested_location_id, start, end):
+                continue
+            if self._suggestion_type is None:
+                self._suggestion_type = namedtuple("Suggestion", list(row._fields) + ["attendees_clashes"])
+            yield self._suggestion_type(*row, self.attendees_clashes(start, end))
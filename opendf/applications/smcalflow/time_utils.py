@@ -4,10 +4,13 @@ File to hold time related class/functions.
 
 import calendar
 from abc import ABC
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, time
+from functools import reduce
+from math import gcd
 from typing import Iterable, Iterator, List
 
 from opendf.applications.core.nodes.time_nodes import Pdatetime_to_datetime_sexp
+from opendf.defs import posname
 from opendf.applications.smcalflow.domain import Ptimedelta_to_period_sexp
 
 # TODO: replace hard-coded values by defined constants
@@ -97,6 +100,235 @@ class DayOfTheWeekPossibility:
         return step
 
 
+class DateTimeBounds:
+    """
+    Class to hold the bounds of the date times allowed by a constraint.
+
+    The bounds are a superset of the date times matching the constraint: a date time out of the bounds never matches
+    the constraint, but a date time inside the bounds might not match it. They are used as a skip plan for the
+    `DateTimeIterator`, so it does not visit ranges of date times which can not match the constraint.
+    """
+
+    FIELD_NAMES = ["year", "month", "day", "hour", "minute"]
+
+    def __init__(self, earliest=None, latest=None, days_of_the_week=None, **fields):
+        """
+        Creates the bounds. A `None` value means that there is no bound.
+
+        :param earliest: the earliest allowed date time
+        :type earliest: Optional[datetime]
+        :param latest: the latest allowed date time
+        :type latest: Optional[datetime]
+        :param days_of_the_week: the allowed days of the week, from 0 (monday) to 6 (sunday)
+        :type days_of_the_week: Optional[Iterable[int]]
+        :param fields: the allowed values of the fields, by name (see `FIELD_NAMES`)
+        :type fields: Optional[Iterable[int]]
+        """
+        for name in fields:
+            if name not in self.FIELD_NAMES:
+                raise BadConstructionException(f"Unknown date time field: {name}")
+        self.earliest = earliest
+        self.latest = latest
+        self.days_of_the_week = frozenset(days_of_the_week) if days_of_the_week is not None else None
+        self.fields = {name: frozenset(values) for name, values in fields.items() if values is not None}
+
+    def __repr__(self):
+        values = [f"{name}={sorted(values)}" for name, values in self.fields.items()]
+        if self.days_of_the_week is not None:
+            values.append(f"days_of_the_week={sorted(self.days_of_the_week)}")
+        if self.earliest is not None:
+            values.append(f"earliest={self.earliest}")
+        if self.latest is not None:
+            values.append(f"latest={self.latest}")
+        return f"{type(self).__name__}({', '.join(values)})"
+
+    @property
+    def is_empty(self):
+        """
+        Checks if the bounds do not allow any date time.
+
+        :return: `True`, if no date time is allowed; otherwise, `False`
+        :rtype: bool
+        """
+        if any(not values for values in self.fields.values()):
+            return True
+        if self.days_of_the_week is not None and not self.days_of_the_week:
+            return True
+        return self.earliest is not None and self.latest is not None and self.earliest > self.latest
+
+    def intersection(self, other):
+        """
+        Gets the bounds which allow the date times allowed by both `self` and `other`, e.g. for an AND of constraints.
+
+        :param other: the other bounds
+        :type other: DateTimeBounds
+        :return: the intersection of the bounds
+        :rtype: DateTimeBounds
+        """
+        earliest = [i for i in (self.earliest, other.earliest) if i is not None]
+        latest = [i for i in (self.latest, other.latest) if i is not None]
+        days_of_the_week = [i for i in (self.days_of_the_week, other.days_of_the_week) if i is not None]
+        fields = dict(self.fields)
+        for name, values in other.fields.items():
+            fields[name] = fields[name] & values if name in fields else values
+        return DateTimeBounds(earliest=max(earliest, default=None), latest=min(latest, default=None),
+                              days_of_the_week=frozenset.intersection(*days_of_the_week) if days_of_the_week else None,
+                              **fields)
+
+    def union(self, other):
+        """
+        Gets the bounds which allow the date times allowed by either `self` or `other`, e.g. for an OR of constraints.
+
+        :param other: the other bounds
+        :type other: DateTimeBounds
+        :return: the union of the bounds
+        :rtype: DateTimeBounds
+        """
+        earliest = min(self.earliest, other.earliest) \
+            if self.earliest is not None and other.earliest is not None else None
+        latest = max(self.latest, other.latest) if self.latest is not None and other.latest is not None else None
+        days_of_the_week = self.days_of_the_week | other.days_of_the_week \
+            if self.days_of_the_week is not None and other.days_of_the_week is not None else None
+        fields = {name: values | other.fields[name] for name, values in self.fields.items() if name in other.fields}
+        return DateTimeBounds(earliest=earliest, latest=latest, days_of_the_week=days_of_the_week, **fields)
+
+    def field_range(self, name, minimum, maximum):
+        """
+        Gets the range (begin, end and step) of a field iterator which visits all the allowed values of the field.
+
+        :param name: the name of the field
+        :type name: str
+        :param minimum: the minimum value of the field
+        :type minimum: int
+        :param maximum: the maximum value of the field
+        :type maximum: int
+        :return: the begin, the end and the step of the range
+        :rtype: Tuple[int, int, int]
+        """
+        values = sorted(i for i in self.fields.get(name, ()) if minimum <= i <= maximum)
+        if not values:
+            return minimum, maximum, 1
+        step = reduce(gcd, (j - i for i, j in zip(values, values[1:])), 0)
+        return values[0], values[-1], max(step, 1)
+
+    def get_days_of_the_week(self):
+        """
+        Gets the allowed days of the week, as expected by the `DayFieldIterator`.
+
+        :return: the allowed days of the week, if they are bounded; otherwise, `None`
+        :rtype: Optional[DayOfTheWeekPossibility]
+        """
+        if self.days_of_the_week is None:
+            return None
+        return DayOfTheWeekPossibility(*(i in self.days_of_the_week for i in range(7)))
+
+    def clip(self, earliest=None, latest=None):
+        """
+        Clips the window [`earliest`, `latest`] to the bounds on the date times and on the years.
+
+        :param earliest: the earliest date time of the window
+        :type earliest: Optional[datetime]
+        :param latest: the latest date time of the window
+        :type latest: Optional[datetime]
+        :return: the clipped earliest and latest date times
+        :rtype: Tuple[Optional[datetime], Optional[datetime]]
+        """
+        earliests = [i for i in (earliest, self.earliest) if i is not None]
+        latests = [i for i in (latest, self.latest) if i is not None]
+        years = self.fields.get("year")
+        if years:
+            earliests.append(datetime(min(years), 1, 1))
+            latests.append(datetime(max(years), 12, 31, 23, 59, 59))
+        return max(earliests, default=None), min(latests, default=None)
+
+
+def _get_field_value(node, name):
+    """
+    Gets the value of a field of a Date or Time node, if it is a plain Int (e.g. not a qualifier).
+    """
+    if name not in node.inputs:
+        return None
+    value = node.input_view(name)
+    return value.dat if value.typename() == 'Int' else None
+
+
+def _get_object_bounds(node):
+    """
+    Gets the bounds of a DateTime object, used as an (implicit EQ) constraint.
+    """
+    fields = {}
+    days_of_the_week = None
+    date_node = node.input_view('date') if 'date' in node.inputs else None
+    if date_node is not None and date_node.typename() == 'Date':
+        for name in ['year', 'month', 'day']:
+            value = _get_field_value(date_node, name)
+            if value is not None:
+                fields[name] = [value]
+        dow = date_node.input_view('dow') if 'dow' in date_node.inputs else None
+        if dow is not None and dow.typename() == 'DayOfWeek':
+            days_of_the_week = [dow.to_dow() - 1]
+    time_node = node.input_view('time') if 'time' in node.inputs else None
+    if time_node is not None and time_node.typename() == 'Time':
+        for name in ['hour', 'minute']:
+            value = _get_field_value(time_node, name)
+            if value is not None:
+                fields[name] = [value]
+    return DateTimeBounds(days_of_the_week=days_of_the_week, **fields)
+
+
+def _get_qualifier_bounds(qualifier, node):
+    """
+    Gets the bounds of a LT/LE/GT/GE qualifier over a DateTime object.
+
+    Only two cases are bounded, since the comparison of partial date times is fuzzy: a complete date time bounds the
+    earliest/latest date time; and a time (without date) bounds the hour.
+    """
+    if node.typename() != 'DateTime':
+        return DateTimeBounds()
+    for name, typ in [('date', 'Date'), ('time', 'Time')]:
+        if name in node.inputs and node.input_view(name).typename() != typ:
+            return DateTimeBounds()
+    after = qualifier in ['GT', 'GE']
+    value = node.to_partialDateTime()
+    if value.is_complete():
+        value = value.to_pdatetime()
+        return DateTimeBounds(earliest=value) if after else DateTimeBounds(latest=value)
+    if value.has_only_time() and value.hour is not None:
+        hours = range(value.hour, HourFieldIterator.MAXIMUM_VALUE + 1) if after else range(value.hour + 1)
+        return DateTimeBounds(hour=hours)
+    return DateTimeBounds()
+
+
+def get_datetime_bounds(constraint):
+    """
+    Compiles a DateTime constraint tree into the bounds of the date times which might match it.
+
+    Only the simple parts of the tree are compiled: AND/OR of DateTime objects whose fields hold plain values, and
+    LT/LE/GT/GE of those objects. Anything else (e.g. a negation) is left unbounded, so the bounds are always a
+    superset of the matching date times, and the candidates must still be checked with `match`.
+
+    :param constraint: the DateTime constraint tree
+    :type constraint: Optional[Node]
+    :return: the bounds of the date times which might match the constraint
+    :rtype: DateTimeBounds
+    """
+    if constraint is None:
+        return DateTimeBounds()
+    typ = constraint.typename()
+    if typ == 'DateTime':
+        return _get_object_bounds(constraint)
+    if typ == 'AND':
+        return reduce(DateTimeBounds.intersection,
+                      (get_datetime_bounds(constraint.input_view(i)) for i in constraint.inputs), DateTimeBounds())
+    if typ == 'OR' and constraint.inputs:
+        return reduce(DateTimeBounds.union, (get_datetime_bounds(constraint.input_view(i)) for i in constraint.inputs))
+    if typ == 'EQ':
+        return get_datetime_bounds(constraint.input_view(posname(1)))
+    if typ in ['LT', 'LE', 'GT', 'GE']:
+        return _get_qualifier_bounds(typ, constraint.input_view(posname(1)))
+    return DateTimeBounds()
+
+
 class DateTimeFieldIterator(ABC, Iterator[int], Iterable[int]):
     """
     Class to define an iterator for date and time fields.
@@ -183,6 +415,23 @@ class DateTimeFieldIterator(ABC, Iterator[int], Iterable[int]):
                 f"Earliest value must be greater than or equal to begin, value: {value}, begin: {self.begin}")
         self._earliest = value
 
+    def next_valid_value(self, value):
+        """
+        Finds the first value, greater than or equal to `value`, that can be visited by this iterator, regardless of
+        the values of the previous fields.
+
+        :param value: the value
+        :type value: int
+        :return: the first value that can be visited, if exists; otherwise, `None`
+        :rtype: Optional[int]
+        """
+        if value <= self.begin:
+            return self.begin
+        value = self.begin + -(-(value - self.begin) // self.step) * self.step
+        if self.end is not None and value > self.end:
+            return None
+        return value
+
 
 class YearIterator(DateTimeFieldIterator):
     """
@@ -272,7 +521,7 @@ class DayFieldIterator(DateTimeFieldIterator):
             raise BadRangeException(begin, end)
 
         super().__init__(begin, end, step=step)
-        self._original_end = end
+        self.original_end = end
         self.days_of_the_week = days_of_the_week if days_of_the_week is not None else DayOfTheWeekPossibility.all_days()
         self._current_month = None
         self._current_year = None
@@ -286,7 +535,7 @@ class DayFieldIterator(DateTimeFieldIterator):
         _, month_end = calendar.monthrange(previous_fields.year, previous_fields.month)
         # If there is a constraint on the last day of the month, keep the minimum between the constraint and the
         # number of days in the month
-        self.end = min(self._original_end, month_end)
+        self.end = min(self.original_end, month_end)
         self._current = None
         self._started = True
 
@@ -412,22 +661,86 @@ class DateTimeIterator(Iterator[datetime], Iterable[datetime]):
 
     FIELD_NAMES = ["year", "month", "day", "hour", "minute"]
 
-    def __init__(self, earliest=None, latest=None):
+    # without a latest date time, the search for the first valid date time covers the 28 years cycle of the calendar
+    MAXIMUM_SKIP = timedelta(days=28 * 366)
+
+    def __init__(self, earliest=None, latest=None, bounds=None):
+        """
+        Creates the iterator.
+
+        :param earliest: the earliest date time
+        :type earliest: Optional[datetime]
+        :param latest: the latest date time
+        :type latest: Optional[datetime]
+        :param bounds: the bounds of the date times, used as a skip plan: the field iterators only visit the values
+        allowed by the bounds (see `get_datetime_bounds`)
+        :type bounds: Optional[DateTimeBounds]
+        """
+        bounds = bounds if bounds is not None else DateTimeBounds()
+        self._empty = bounds.is_empty
+        if self._empty:
+            bounds = DateTimeBounds()
         self.iterators: List[DateTimeFieldIterator] = [
             YearIterator(),
-            MonthFieldIterator(),
-            DayFieldIterator(),
-            HourFieldIterator(),
-            MinuteFieldIterator()
+            MonthFieldIterator(*bounds.field_range(
+                "month", MonthFieldIterator.MINIMUM_VALUE, MonthFieldIterator.MAXIMUM_VALUE)[:2]),
+            DayFieldIterator(*bounds.field_range(
+                "day", DayFieldIterator.MINIMUM_VALUE, DayFieldIterator.MAXIMUM_VALUE)[:2],
+                             days_of_the_week=bounds.get_days_of_the_week()),
+            HourFieldIterator(*bounds.field_range(
+                "hour", HourFieldIterator.MINIMUM_VALUE, HourFieldIterator.MAXIMUM_VALUE)),
+            MinuteFieldIterator(*bounds.field_range(
+                "minute", MinuteFieldIterator.MINIMUM_VALUE, MinuteFieldIterator.MAXIMUM_VALUE))
         ]
         self.iterators_length = len(self.iterators)
         self.field_index = self.iterators_length - 1
         self._latest = None
+        earliest, latest = bounds.clip(earliest, latest)
         if earliest:
-            self.set_earliest_datetime(earliest)
+            # the field iterators only start from their earliest values for the first date, so it must be a valid one
+            earliest = self.first_valid_datetime(earliest, latest)
+            if earliest is None:
+                self._empty = True
+            else:
+                self.set_earliest_datetime(earliest)
         if latest:
             self.set_latest_datetime(latest)
 
+    def first_valid_datetime(self, value, latest=None):
+        """
+        Finds the first date time, from `value` (inclusive), whose fields can be visited by the field iterators.
+
+        :param value: the date time
+        :type value: datetime
+        :param latest: the latest date time to look for
+        :type latest: Optional[datetime]
+        :return: the first valid date time, if exists; otherwise, `None`
+        :rtype: Optional[datetime]
+        """
+        month_iterator, day_iterator, hour_iterator, minute_iterator = self.iterators[self.MONTH_ITERATOR:]
+        limit = latest if latest is not None else value + self.MAXIMUM_SKIP
+        value = value.replace(second=0, microsecond=0)
+        while value <= limit:
+            day = value.date()
+            if not (month_iterator.begin <= day.month <= month_iterator.end and
+                    day_iterator.begin <= day.day <= day_iterator.original_end and
+                    day in day_iterator.days_of_the_week):
+                value = datetime.combine(day + timedelta(days=1), time())
+                continue
+            hour = hour_iterator.next_valid_value(value.hour)
+            if hour is None:
+                value = datetime.combine(day + timedelta(days=1), time())
+                continue
+            if hour != value.hour:
+                value = value.replace(hour=hour, minute=0)
+            minute = minute_iterator.next_valid_value(value.minute)
+            if minute is None:
+                value = value.replace(minute=0) + timedelta(hours=1)
+                continue
+            return value.replace(minute=minute)
+
+        return None
+
     def generate_date(self, until_iterator=None):
         values = {
             "year": None,
@@ -469,6 +782,8 @@ class DateTimeIterator(Iterator[datetime], Iterable[datetime]):
         return None
 
     def __next__(self) -> datetime:
+        if self._empty:
+            raise StopIteration()
         value = self.get_next_value()
         if value is None or (self._latest is not None and value > self._latest):
             raise StopIteration()
@@ -16,7 +16,7 @@ from opendf.graph.node_factory import NodeFactory
 from opendf.defs import *
 from opendf.graph.dialog_context import DialogContext
 from opendf.utils.arg_utils import add_environment_option
-from opendf.utils.io import load_jsonl_file
+from opendf.utils.io import JsonlSource
 from opendf.utils.utils import to_list
 from opendf.graph.transform_graph import do_transform_graph
 from opendf.graph.draw_graph import draw_all_graphs
@@ -188,7 +188,12 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
     conv_dir = os.path.join(working_dir, 'conv')
     in_file = os.path.join(working_dir, "conv", f"conv.{inp_name}.jsonl")
 
-    dialogs = load_jsonl_file(in_file, unit=" dialogues")
+    # the index of the dialogues is kept next to the file, to find the requested dialogue without reading the others
+    source = JsonlSource(in_file, key="dialogue_id", index_file=in_file + ".index")
+    dialogs, first_dialog = source, 0
+    if dialog_id:
+        first_dialog, first_key = source.find_suffix(dialog_id)
+        dialogs = source.iterate_from(first_key)
 
     l = open(os.path.join(conv_dir, f"{inp_name}_hyps.txt"), 'r').readlines()
     hyps = {}
@@ -201,7 +206,7 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
     n_diff_pexp = 0
     n_turns, n_cmp_turns = 0, 0
     n_match = 0
-    for idia, dia in enumerate(dialogs):
+    for idia, dia in enumerate(dialogs, first_dialog):
         d_id = dia['dialogue_id']
         if d_id not in added_objects:
             continue
@@ -239,7 +244,7 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
                 #agent_txt = dia['turns'][it]['agent_utterance']['original_text']
                 print('U: ' + user_txt)
                 ok = exec_turn(pexp, d_context)  #, user_txt, agent_txt)
-                turn_contexts.append(d_context.make_copy_with_pack())  # save d_context after each turn
+                turn_contexts.append(d_context.snapshot())  # save d_context after each turn (copied when compared)
                 turn_evs.append(get_all_db_events())  # save all events in db after each turn
 
         # phase 2. execute hypothesized Pexps and compare resulting graphs
@@ -270,7 +275,7 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
                         evs = get_all_db_events()
                     # compare context and saved turn contexts
                     n_turns += 1 if ok and cmp else 0
-                    cmp = cmp and ok and compare_graph_exec(d_context, turn_contexts[it], evs, turn_evs[it])
+                    cmp = cmp and ok and compare_graph_exec(d_context, turn_contexts[it].make_copy(), evs, turn_evs[it])
                     n_cmp_turns += 1 if cmp else 0
             if cmp:
                 print('!!Dialog matched!!')
@@ -152,6 +152,9 @@ class EnvironmentDefinition:
         # name of a class that inherits from EventFactory,
         # e.g. SimpleEventFactory, IteratorEventFactory, DatabaseEventFactory, DatabaseStartDurationEventFactory
         self.event_factory_name = "DatabaseStartDurationEventFactory"
+        # if True, the database event factories check the clashes of the suggestions with the events of the attendees
+        # and of the location in memory (see smcalflow/slot_search.py), instead of with SQL sub-queries
+        self.slot_search_by_intervals = True
 
         # summarize these types - show the result of their 'describe' instead of drawing their input graphs
         # noinspection SpellCheckingInspection
@@ -226,6 +229,16 @@ database_connection = os.getenv('DF_DB_PATH', "sqlite+pysqlite:///:memory:")
 
 database_log = False
 database_future = True
+# the size of the connection pool (and the number of connections allowed above it), for databases other than the
+# in memory SQLite, which always uses a single connection per thread
+database_pool_size = int(os.getenv('DF_DB_POOL_SIZE', 5))
+database_max_overflow = int(os.getenv('DF_DB_MAX_OVERFLOW', 10))
+# the maximum number of graphs kept by each of the entity caches of the database (recipients, attendees, events...)
+entity_cache_size = int(os.getenv('DF_ENTITY_CACHE_SIZE', 10000))
+
+# the cache of the type information derived from the node types (see NodeFactory.set_node_types). The cache is opt-in:
+# it is only used when DF_TYPE_INFO_CACHE is set to the path of the cache file (e.g. ~/.cache/opendf/type_info.json)
+type_info_cache_path = os.path.expanduser(os.getenv('DF_TYPE_INFO_CACHE', ""))
 
 simplify_MultiWoz = True  # normally false. set to true ONLY when running simplification of Multiwoz
 
@@ -18,7 +18,7 @@ from opendf.graph.draw_graph import draw_all_graphs, draw_graphs
 from opendf.defs import *
 from opendf.graph.dialog_context import DialogContext
 from opendf.utils.arg_utils import add_environment_option
-from opendf.utils.io import load_jsonl_file
+from opendf.utils.io import JsonlSource
 from opendf.utils.simplify_exp import indent_sexp, tokenize_pexp, sexp_to_tree, print_tree
 from opendf.exceptions import parse_node_exception, re_raise_exc
 from opendf.graph.simplify_graph import simplify_graph, pre_simplify_graph, clean_operators
@@ -131,7 +131,7 @@ def dialog(working_dir, environment_class, input_file=None, dialog_id=0, draw_gr
         end_of_dialog = False
         d_context.reset_turn_num()
 
-        dialogs = load_jsonl_file(from_jsonl, unit=" dialogues") if from_jsonl else [dialog_id]
+        dialogs = JsonlSource(from_jsonl) if from_jsonl else [dialog_id]
         if from_jsonl:
             # d_context.set_print(False)
             fname = from_jsonl.split('/')[-1].split('.')[0]
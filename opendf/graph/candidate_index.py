@@ -0,0 +1,83 @@
+"""
+Index of the nodes of a dialog, used to narrow down the candidates of searches (refer / revise).
+"""
+
+# Intentionally does not formally depend on Node - only the node's class, tags and outputs are used
+
+
+class CandidateIndex:
+    """
+    Maps search keys to the (indexed) nodes which have them:
+        - ('type', cls) : nodes of (python) class `cls`
+        - ('tag', name) : nodes which have the tag `name`
+        - ('role', name) : nodes which are used as input `name` (or as one of its aliases) by some other node
+
+    Keys of a node are added when the node changes (see `update()`), but they are not removed - a selection may
+    return nodes which no longer have the key. Searches still verify each candidate - the index is used only to
+    skip nodes which can not match.
+    Nodes which are not in the index are always kept by the selections (nothing is known about them).
+    """
+
+    def __init__(self):
+        self.keys = {}  # { key : set of nodes }
+        self.node_keys = {}  # { node : set of keys }
+
+    @staticmethod
+    def search_keys(node):
+        keys = {('type', type(node))}
+        for t in node.tags:
+            keys.add(('tag', t))
+        for nm, o in node.outputs:
+            keys.add(('role', nm))
+            for a, r in o.signature.aliases.items():
+                if r == nm:  # allow searching for the role by its alias
+                    keys.add(('role', a))
+        return keys
+
+    def __contains__(self, node):
+        return node in self.node_keys
+
+    def __len__(self):
+        return len(self.node_keys)
+
+    def add(self, nodes):
+        for nd in nodes:
+            if nd not in self.node_keys:
+                self.node_keys[nd] = set()
+                self.update(nd)
+
+    def remove(self, nodes):
+        for nd in nodes:
+            for k in self.node_keys.pop(nd, ()):
+                s = self.keys[k]
+                s.discard(nd)
+                if not s:
+                    del self.keys[k]
+
+    def update(self, node):
+        """
+        Adds to the index the current keys of `node` (if it is indexed).
+        """
+        keys = self.node_keys.get(node)
+        if keys is not None:
+            for k in self.search_keys(node) - keys:
+                keys.add(k)
+                self.keys.setdefault(k, set()).add(node)
+
+    def select(self, nodes, keys):
+        """
+        Filters `nodes`, keeping nodes which may have one of the `keys` (order is kept).
+        """
+        hit = set()
+        for k in keys:
+            hit.update(self.keys.get(k, ()))
+        node_keys = self.node_keys
+        return [n for n in nodes if n in hit or n not in node_keys]
+
+    def select_types(self, nodes, accept):
+        """
+        Filters `nodes`, keeping nodes whose class is accepted by `accept` (order is kept).
+
+        :param accept: a predicate on node classes
+        """
+        return self.select(nodes, [k for k in self.keys if k[0] == 'type' and accept(k[1])])
@@ -59,8 +59,9 @@ def construct_graph(sexp, d_context, register=True, top_only=False, constr_tag=R
 
     Note: we do not add goals to dialog context here, for now.
 
-    :param sexp: the S-expression
-    :type sexp: str
+    :param sexp: the S-expression, or an already built AST (e.g. from `NodeFactory.entity_ast()`) - which is then
+        used (and modified) directly, without parsing
+    :type sexp: str or ASTNode
     :type register: bool  # TODO - do we really need register=False???
     :type top_only: bool
     :param no_post_check: if `True`, don't perform post construction test
@@ -71,7 +72,10 @@ def construct_graph(sexp, d_context, register=True, top_only=False, constr_tag=R
     if d_context and d_context.supress_exceptions:
         no_exit = True
 
-    root = None
+    if isinstance(sexp, ASTNode):  # already built - no need to parse
+        d_context = d_context if d_context or register == False else DialogContext()
+        return construct_from_ast([sexp], d_context, register, top_only, constr_tag, no_post_check, no_exit)
+
     if sexp.startswith('$#'):  # if sexp is a link to an existing node, just return it, don't construct
         # todo - same for '$name'
         ss = re.sub('[)(]', '', sexp[2:])
@@ -92,6 +96,14 @@ def construct_graph(sexp, d_context, register=True, top_only=False, constr_tag=R
                   (sexp.count('(')!=sexp.count(')')) + indent_sexp(sexp, sep_brack=True) + '\n')
         re_raise_exc(ex)
 
+    return construct_from_ast(prs, d_context, register, top_only, constr_tag, no_post_check, no_exit)
+
+
+def construct_from_ast(prs, d_context, register, top_only, constr_tag, no_post_check, no_exit):
+    """
+    Constructs the graph of the first parsed expression in `prs` (see `construct_graph`).
+    """
+    root = None
     try:
         root = ast_top_down_construct(prs[0], None, d_context, register=register, top_only=top_only,
                                       constr_tag=constr_tag)
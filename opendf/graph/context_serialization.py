@@ -0,0 +1,377 @@
+"""
+Binary, structural serialization of the dialog context.
+
+Unlike `DialogContext.pack_context`, which writes each goal as a P-expression and rebuilds the graph by parsing them
+(see `unpack_context`), the nodes are written as records (id, type, inputs, result, tags, flags, ...), and the graph
+is rebuilt by creating the nodes and linking them directly - the parser is not used.
+
+The class of the context is saved too, with the fields its subclass adds (e.g. the dialogue state of
+`MultiWOZContext`), so the context is loaded as an instance of the same class.
+
+`ContextSnapshot` uses it to copy a context: the state is saved once, and any number of independent copies of the
+context can be made from it (e.g. to execute several hypotheses from the same point of the dialogue).
+"""
+import importlib
+import io
+import pickle
+import zlib
+from collections import namedtuple
+
+from opendf.defs import VIEW, Message
+from opendf.exceptions.df_exception import DFException
+from opendf.graph import traversal
+from opendf.graph.dialog_context import DialogContext
+from opendf.graph.node_factory import NodeFactory
+from opendf.graph.nodes.node import Node
+
+FORMAT_VERSION = 1
+# the first byte of the pickled data (the PROTO opcode), which tells the uncompressed data from the compressed one
+PICKLE_START = pickle.PROTO
+
+# the boolean fields of the nodes, saved as the bits of one int
+NODE_FLAGS = ("evaluated", "eval_res", "res_block", "mutable", "no_revise", "stop_eval_on_exception")
+
+# a node in the fields of the exceptions and messages (e.g. `objects`) is saved as a reference to its id
+NodeRef = namedtuple("NodeRef", ["id"])
+
+# the fields of a node: `inputs` is a tuple of (name, node id, view), `result` is the id of the result node (`None` if
+#   the node is its own result), and `out_type` is the name of the output type.
+# `outputs` and `res_out` follow from the inputs and the results of the other nodes, so they are saved (as tuples of
+#   (name, node id) and of node ids) only if their order is not the one in which the nodes are linked - otherwise, they
+#   are `None`
+NodeRecord = namedtuple("NodeRecord", ["id", "type", "constraint_level", "created_turn", "data", "flags", "extra",
+                                       "tags", "inputs", "outputs", "result", "res_out", "out_type"])
+
+
+def _get_flags(node):
+    flags = 0
+    for i, name in enumerate(NODE_FLAGS):
+        if getattr(node, name):
+            flags |= 1 << i
+    return flags
+
+
+def _set_flags(node, flags):
+    for i, name in enumerate(NODE_FLAGS):
+        setattr(node, name, bool(flags & (1 << i)))
+
+
+def _link_nodes(nodes):
+    """
+    Gets the outputs and the res_out of the nodes, in the order in which `load_context` links them.
+
+    :return: the outputs and the res_out, of each node which has them
+    :rtype: Tuple[Dict[Node, List[Tuple[str, Node]]], Dict[Node, List[Node]]]
+    """
+    outputs, res_out = {}, {}
+    for node in nodes:
+        for name, child in node.inputs.items():
+            outputs.setdefault(child, []).append((name, node))
+        if node.result is not node:
+            res_out.setdefault(node.result, []).append(node)
+    return outputs, res_out
+
+
+def _dump_node(node, ids, linked_outputs, linked_res_out):
+    inputs = tuple((name, child.id, node.view_mode.get(name, VIEW.EXT).value) for name, child in node.inputs.items())
+    outputs = [(name, parent) for name, parent in node.outputs if parent in ids]
+    outputs = None if outputs == linked_outputs.get(node, []) else tuple((name, p.id) for name, p in outputs)
+    res_out = [n for n in node.res_out if n in ids]
+    res_out = None if res_out == linked_res_out.get(node, []) else tuple(n.id for n in res_out)
+    result = node.result.id if node.result is not node else None
+    return NodeRecord(node.id, node.typename(), node.constraint_level, node.created_turn, node.data, _get_flags(node),
+                      node.get_extra_attr_str(), dict(node.tags) if node.tags else None, inputs, outputs, result,
+                      res_out, node.out_type.__name__)
+
+
+# the globals (other than the `DFException` subclasses of opendf) a serialized context may refer to - see
+#   `ContextUnpickler`
+SAFE_GLOBALS = {
+    ("builtins", name) for name in ("bool", "int", "float", "complex", "str", "bytes", "bytearray", "list", "tuple",
+                                    "dict", "set", "frozenset", "range", "slice")
+} | {
+    ("datetime", name) for name in ("date", "time", "datetime", "timedelta", "timezone")
+} | {
+    ("collections", "OrderedDict"), (__name__, "NodeRef"), (__name__, "ExceptionRef"),
+}
+
+
+class ContextUnpickler(pickle.Unpickler):
+    """
+    Unpickler restricted to the globals a serialized context refers to: the safe builtins and library types in
+    `SAFE_GLOBALS`, and the classes of the exceptions (subclasses of `DFException`, from the opendf modules). Any
+    other global (e.g. a function, which the pickled data could call) is refused.
+
+    This prevents the execution of arbitrary code by crafted data, but the data should still come from a trusted
+    source: the exceptions are rebuilt field by field, and their methods run on the loaded values.
+    """
+
+    def find_class(self, module, name):
+        if (module, name) in SAFE_GLOBALS:
+            return super().find_class(module, name)
+        if module.startswith("opendf."):
+            cls = super().find_class(module, name)
+            if isinstance(cls, type) and issubclass(cls, DFException):
+                return cls
+        raise pickle.UnpicklingError(f"Forbidden global in a serialized dialog context: {module}.{name}")
+
+
+# an exception is saved as its class and fields, in the table of exceptions of the context, and referred to by its
+#   position in the table (the exceptions may refer to each other, through `orig` and `chain`). The exceptions are not
+#   pickled directly, since they hold nodes, and the subclasses of `DFException` can not always be rebuilt by
+#   `DFException.__reduce__`
+ExceptionRef = namedtuple("ExceptionRef", ["index"])
+ExceptionRecord = namedtuple("ExceptionRecord", ["cls", "args", "fields"])
+
+
+class ValueDumper:
+    """
+    Replaces the nodes and the exceptions in the values (e.g. the `objects` of a message) by references.
+    """
+
+    def __init__(self, ids):
+        """
+        :param ids: the saved nodes
+        :type ids: Set[Node]
+        """
+        self.ids = ids
+        self.exceptions = []  # the exception records
+        self.exception_index = {}  # { id(exception) : index in `exceptions` }
+
+    def dump(self, value):
+        if isinstance(value, Node):
+            return NodeRef(value.id) if value in self.ids else None
+        if type(value) in (list, tuple):
+            return type(value)(self.dump(v) for v in value)
+        if type(value) is dict:
+            return {k: self.dump(v) for k, v in value.items()}
+        if isinstance(value, DFException):
+            index = self.exception_index.get(id(value))
+            if index is None:
+                index = len(self.exceptions)
+                self.exception_index[id(value)] = index
+                self.exceptions.append(None)
+                fields = {name: self.dump(v) for name, v in vars(value).items()}
+                self.exceptions[index] = ExceptionRecord(type(value), value.args, fields)
+            return ExceptionRef(index)
+        return value
+
+
+class ValueLoader:
+    """
+    Replaces the references of `ValueDumper` by the nodes and the exceptions.
+    """
+
+    def __init__(self, d_context, exception_records):
+        self.d_context = d_context
+        self.exceptions = []
+        for record in exception_records:
+            exception = record.cls.__new__(record.cls)
+            exception.args = record.args
+            self.exceptions.append(exception)
+        for exception, record in zip(self.exceptions, exception_records):
+            for name, v in record.fields.items():
+                setattr(exception, name, self.load(v))
+
+    def load(self, value):
+        if isinstance(value, NodeRef):
+            return self.d_context.idx_to_node.get(value.id)
+        if isinstance(value, ExceptionRef):
+            return self.exceptions[value.index]
+        if type(value) in (list, tuple):
+            return type(value)(self.load(v) for v in value)
+        if type(value) is dict:
+            return {k: self.load(v) for k, v in value.items()}
+        return value
+
+
+# the fields of the base `DialogContext` - the other fields of a context are added by its subclass
+_base_fields = None
+
+
+def _get_subclass_fields(d_context):
+    global _base_fields
+    if _base_fields is None:
+        _base_fields = frozenset(vars(DialogContext()))
+    return [name for name in vars(d_context) if name not in _base_fields]
+
+
+def _find_context_class(module, name):
+    """
+    Finds the class of a serialized context - `DialogContext` or one of its subclasses, from the opendf modules.
+    """
+    if module.startswith("opendf."):
+        cls = getattr(importlib.import_module(module), name, None)
+        if isinstance(cls, type) and issubclass(cls, DialogContext):
+            return cls
+    raise ValueError(f"Not a dialog context class: {module}.{name}")
+
+
+def dump_context(d_context, compress=True):
+    """
+    Serializes the dialog context. The same nodes as in `DialogContext.pack_context` are saved: the ones reachable
+    from the goals (and the other goals).
+
+    :param d_context: the dialog context
+    :type d_context: DialogContext
+    :param compress: if `True`, the result is compressed (with zlib, at its fastest level)
+    :type compress: bool
+    :return: the serialized context
+    :rtype: bytes
+    """
+    goals = d_context.get_packed_goals()
+    nodes = traversal.topological_order(goals + d_context.other_goals)
+    ids = set(nodes)
+    dumper = ValueDumper(ids)
+    linked_outputs, linked_res_out = _link_nodes(nodes)
+
+    state = {
+        "version": FORMAT_VERSION,
+        "nodes": [tuple(_dump_node(node, ids, linked_outputs, linked_res_out)) for node in nodes],
+        "goals": [g.id for g in goals],
+        "other_goals": [g.id for g in d_context.other_goals],
+        "assign": {name: node.id for name, node in d_context.assign.items() if node in ids},
+        "exceptions": [dumper.dump(e) for e in d_context.exceptions if e.node in ids],
+        "exception_nodes": [n.id for n in d_context.exception_nodes if n in ids],
+        "copied_exceptions": [n.id for n in d_context.copied_exceptions if n in ids],
+        "messages": [(m.text, m.node.id, dumper.dump(m.objects), m.turn) for m in d_context.messages
+                     if m.node in ids],
+        "prev_agent_hints": dumper.dump(d_context.prev_agent_hints),
+        "prev_sugg_act": dumper.dump(d_context.prev_sugg_act),
+        "turn_num": d_context.turn_num,
+        # the unreachable nodes are not saved, but the ids of the new nodes should not change
+        "next_node_id": d_context.get_next_node_id(),
+        "restore_points": [n.id for n in d_context.restore_points if n in ids],
+        "context_class": (type(d_context).__module__, type(d_context).__name__),
+        "fields": {name: dumper.dump(getattr(d_context, name)) for name in _get_subclass_fields(d_context)},
+    }
+    state["exception_records"] = [tuple(record) for record in dumper.exceptions]
+    data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    return zlib.compress(data, 1) if compress else data
+
+
+def load_context(data, d_context=None, restricted=True):
+    """
+    Deserializes a dialog context serialized by `dump_context`.
+
+    The data is unpickled by `ContextUnpickler`, which only allows the globals of a serialized context; still, the data
+    should come from a trusted source.
+
+    :param data: the serialized context
+    :type data: bytes
+    :param d_context: the (empty) dialog context to fill; if `None`, a new context of the saved class is created
+    :type d_context: Optional[DialogContext]
+    :param restricted: if `False`, the data is unpickled without restrictions, so the fields of the context subclass
+    may hold values of any type. Only for data from this process (see `ContextSnapshot`)
+    :type restricted: bool
+    :return: the dialog context
+    :rtype: DialogContext
+    """
+    if not data.startswith(PICKLE_START):
+        data = zlib.decompress(data)
+    state = ContextUnpickler(io.BytesIO(data)).load() if restricted else pickle.loads(data)
+    if state["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dialog context format version: {state['version']}")
+    if d_context is None:
+        context_class = state.get("context_class")
+        d_context = _find_context_class(*context_class)() if context_class else DialogContext()
+    node_factory = NodeFactory.get_instance()
+    node_types = node_factory.node_types
+    idx_to_node = d_context.idx_to_node
+
+    # 1. creates the nodes
+    records = [NodeRecord(*record) for record in state["nodes"]]
+    for record in records:
+        node = node_factory.create_node_from_type_name(d_context, record.type, False)
+        d_context.register_node(node, renumber=record.id)
+        node.constraint_level = record.constraint_level
+        node.created_turn = record.created_turn
+        node.data = record.data
+        _set_flags(node, record.flags)
+        node.set_extra_attr(record.extra)
+        if record.tags:
+            node.tags = dict(record.tags)
+        if record.out_type == Node.__name__:
+            node.out_type = Node
+        elif record.out_type in node_types:
+            node.out_type = node_types[record.out_type]
+
+    # 2. links the nodes - in the same order as `_link_nodes`, unless the order was saved
+    for record in records:
+        node = idx_to_node[record.id]
+        for name, child, view in record.inputs:
+            child = idx_to_node[child]
+            node.inputs[name] = child
+            node.view_mode[name] = VIEW(view)
+            child.outputs.append((name, node))
+        if record.result is not None:
+            result = idx_to_node[record.result]
+            node.result = result
+            if not result.res_out:  # replaces the shared empty value
+                result.res_out = []
+            result.res_out.append(node)
+    for record in records:
+        node = idx_to_node[record.id]
+        if record.outputs is not None:
+            node.outputs = [(name, idx_to_node[parent]) for name, parent in record.outputs]
+        if record.res_out is not None:
+            node.res_out = [idx_to_node[i] for i in record.res_out]
+
+    # 3. the context
+    loader = ValueLoader(d_context, [ExceptionRecord(*record) for record in state["exception_records"]])
+    d_context.goals = [idx_to_node[i] for i in state["goals"]]
+    d_context.other_goals = [idx_to_node[i] for i in state["other_goals"]]
+    for name, i in state["assign"].items():
+        d_context.assign[name] = idx_to_node[i]
+    d_context.exceptions = [loader.load(e) for e in state["exceptions"]]
+    d_context.exception_nodes = [idx_to_node[i] for i in state["exception_nodes"]]
+    d_context.copied_exceptions = [idx_to_node[i] for i in state["copied_exceptions"]]
+    d_context.messages = [Message(text, idx_to_node[i], loader.load(objects), turn)
+                          for text, i, objects, turn in state["messages"]]
+    d_context.prev_agent_hints = loader.load(state["prev_agent_hints"])
+    d_context.prev_sugg_act = loader.load(state["prev_sugg_act"])
+    d_context.restore_points = [idx_to_node[i] for i in state.get("restore_points", [])]
+    for name, value in state.get("fields", {}).items():
+        setattr(d_context, name, loader.load(value))
+    d_context.turn_num = state["turn_num"]
+    d_context.set_next_node_id(state["next_node_id"])
+    d_context.clear_reachable_view()
+
+    return d_context
+
+
+# the settings of the context which are not part of its state, but are kept by the copies
+CONTEXT_SETTINGS = ("supress_exceptions", "continued_turn", "init_stub_file")
+
+
+class ContextSnapshot:
+    """
+    A frozen state of a dialog context, from which independent copies of the context are made.
+
+    The context is serialized (uncompressed) once, when the snapshot is taken, and each copy rebuilds the graph from
+    it - the copies share no node with the context, nor with each other. A copy is an instance of the class of the
+    context, with the fields of its subclass. The snapshot is not affected by later changes to the context.
+    """
+
+    def __init__(self, d_context):
+        """
+        :param d_context: the dialog context
+        :type d_context: DialogContext
+        """
+        self.data = dump_context(d_context, compress=False)
+        self.context_class = type(d_context)
+        self.settings = {name: getattr(d_context, name) for name in CONTEXT_SETTINGS}
+
+    def make_copy(self):
+        """
+        Makes a copy of the context, as it was when the snapshot was taken.
+
+        :return: the copy of the dialog context
+        :rtype: DialogContext
+        """
+        # the data was serialized by this process, so it is not restricted - the fields of the subclass may hold any
+        #   value. The class is kept as is, since it may not be importable (e.g. defined in a script)
+        d_context = load_context(self.data, self.context_class(), restricted=False)
+        for name, value in self.settings.items():
+            setattr(d_context, name, value)
+        return d_context
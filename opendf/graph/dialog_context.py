@@ -6,6 +6,9 @@ Singleton class to hold goals and exceptions, and to assign unique node ids.
 from opendf.defs import *
 from opendf.exceptions.df_exception import DFException
 from opendf.exceptions import parse_node_exception
+from opendf.graph import traversal
+from opendf.graph.candidate_index import CandidateIndex
+from opendf.graph.item_index import ItemIndex
 from copy import copy
 
 # Intentionally does not formally depend on Node
@@ -32,6 +35,8 @@ class DialogContext:
         self.exception_nodes = []  # only the nodes (without msg and hints).
         self.copied_exceptions = []  # duplicated nodes, whose original nodes had an exception.
         # they are used to prioritize nodes in searches (refer/revise)
+        self.exception_index = None  # exceptions by node - see `get_exception_index()`
+        self.message_index = None  # messages by node id - see `get_message_index()`
         self.assign = {}  # bound variables: name -> node
         self.res_assign = {}  # bound variables: name -> node.result. Temporary storage until result is evaluated
         self.turn_num = 0
@@ -41,13 +46,19 @@ class DialogContext:
         # list of sexps. by default, the first one is the action to take on rejection
         # SUGG_IMPL_AGR marks a suggested sexp as implicit accept - to be executed if no explicit
         # accept/reject is given
-        self.register_offset = 0  # hack - allow to "hide" a bunch of nodes - e.g. external DB
+        # node id allocation - see `register_node`. `set_next_node_id` allows to "hide" a bunch of nodes (e.g.
+        #   external DB) by moving the next id
+        self.next_id = 0  # the next id to give to a new node (if free)
+        self.max_id = -1  # the highest registered id, or `None` if it has to be recomputed
         self.supress_exceptions = True  # <<<  hack, useful when running batch conversion - should this be HERE?
         self.prev_nodes = None  # used for simplify - NOT automatically cleared
         self.res = None  # temp field used for packing/unpacking
         self.res_pnt = None  # temp field used for packing/unpacking
         self.restore_points = []  # restore previous state
 
+        # incrementally maintained view of the nodes reachable from the goals - see `reachable_nodes()`
+        self.clear_reachable_view()
+
         self.init_stub_file = "opendf/applications/smcalflow/data_stub.json"
         # self.link_res = []
 
@@ -64,13 +75,89 @@ class DialogContext:
         self.continued_turn = False
         self.prev_agent_hints = None
         self.prev_sugg_act = None
-        self.register_offset = 0
+        self.next_id = 0
+        self.max_id = -1
         self.restore_points = []
-
+        self.clear_reachable_view()
+
+    # the reachable view holds the result of `Node.collect_nodes(self.goals)`, split by the goal whose walk first
+    # reached each node. The walk of goal k depends only on the links of the nodes it added, so:
+    #   - appending a goal only walks the new goal
+    #   - changing the inputs/result of a node which was added by goal k invalidates only goals k, k+1, ...
+    #   - changes to nodes which are not in the view (e.g. nodes of the graph being constructed) do not matter
+    # registering a node by itself does not change reachability (only linking it into a goal's graph does).
+    # lists returned by `reachable_nodes()` are never modified - the view is replaced (not updated in place)
+    def clear_reachable_view(self):
+        self.view_nodes = []  # nodes, in the order of `Node.collect_nodes(goals)`
+        self.view_goals = []  # the goals which were walked for `view_nodes`
+        self.view_starts = []  # per walked goal - the index in `view_nodes` where its nodes start
+        self.view_goal_of = {}  # { node : index of the goal whose walk added this node }
+        self.view_index = CandidateIndex()  # search index of the nodes in the view - used by refer / revise
+
+    def reachable_nodes(self):
+        """
+        Gets all the nodes reachable from the goals (following inputs and results), in topological order - same as
+        `Node.collect_nodes(self.goals)`, but only the goals which were added or changed since the last call are
+        walked. The returned list should not be modified.
+        """
+        goals, walked = self.goals, self.view_goals
+        k, n = 0, min(len(goals), len(walked))
+        while k < n and goals[k] is walked[k]:
+            k += 1
+        if k < len(walked):  # goals were removed / reordered / replaced
+            self.truncate_reachable_view(k)
+        if k < len(goals):
+            nodes = list(self.view_nodes)
+            done = set(self.view_goal_of)
+            for i in range(k, len(goals)):
+                self.view_goals.append(goals[i])
+                self.view_starts.append(len(nodes))
+                new = traversal.topological_order([goals[i]], done=done)
+                for nd in new:
+                    self.view_goal_of[nd] = i
+                self.view_index.add(new)
+                nodes.extend(new)
+            self.view_nodes = nodes
+        return self.view_nodes
+
+    def truncate_reachable_view(self, k):
+        """
+        Drops from the reachable view the nodes added by goals k, k+1, ... (they will be re-collected on demand).
+        """
+        start = self.view_starts[k]
+        for nd in self.view_nodes[start:]:
+            del self.view_goal_of[nd]
+        self.view_index.remove(self.view_nodes[start:])
+        self.view_nodes = self.view_nodes[:start]
+        del self.view_goals[k:]
+        del self.view_starts[k:]
+
+    def node_changed(self, node):
+        """
+        Called when the inputs or result of `node` were changed.
+        """
+        k = self.view_goal_of.get(node)
+        if k is not None:
+            self.truncate_reachable_view(k)
+
+    def node_keys_changed(self, node):
+        """
+        Called when the tags or outputs of `node` were changed.
+        """
+        self.view_index.update(node)
+
+    def candidate_index(self):
+        """
+        Gets the search index of the reachable nodes (see `CandidateIndex`).
+        """
+        self.reachable_nodes()
+        return self.view_index
 
     # register a node - give it an id and add it to dict of nodes.
+    # new ids are taken from a counter, which moves past the ids already in use - so allocating an id does not depend
+    #   on the number of registered nodes, nor on the holes left by renumbered nodes.
     # if renumber is given, force the given id. if that id already exists (should not happen!) - warn and get a new id
-    # note - renumber is LOCAL only - it will not change any references to the old id
+    # note - renumber is LOCAL only - it will not change any references to the old id (nor the counter)
     def register_node(self, node, renumber=None):
         if node.id is None or (renumber is not None and renumber!=node.id):
             if renumber is not None:
@@ -79,10 +166,17 @@ class DialogContext:
                     raise Exception("bad renumber %s" % renumber)
                 if node.id is not None:
                     del self.idx_to_node[node.id]
-            i = renumber if renumber is not None else len(self.idx_to_node) + self.register_offset
-            while i in self.idx_to_node:  # avoid overwriting existing node id
-                i += 1
+                    if node.id == self.max_id:
+                        self.max_id = None
+                i = renumber
+            else:
+                i = self.next_id
+                while i in self.idx_to_node:  # avoid overwriting existing node id
+                    i += 1
+                self.next_id = i + 1
             self.idx_to_node[i] = node
+            if self.max_id is not None and i > self.max_id:
+                self.max_id = i
             node.id = i
             node.context = self
 
@@ -121,22 +215,39 @@ class DialogContext:
     #   - generally, this means we keep only the LAST exception of the evaluation.
     #   - we can disable overwriting the exception by using keep_old - if True/not None, it will not be overwritten
     #     - note that keep_old has to be external - it depends on the computation being done.
+    # exception_nodes are the nodes of the exceptions at the time of the last add_exception - they are kept when the
+    #   exceptions are cleared (at the start of a turn), until a new exception is added
     def add_exception(self, ex, keep_old=False):
         # TODO: update old exceptions' "age"?
+        index = self.get_exception_index()
         if only_one_exception:
             if not self.exceptions or not keep_old:
                 self.exceptions = [ex]
+                index = self.get_exception_index()
         else:
-            if ex not in self.exceptions or not unique_exception:
-                self.exceptions.append(ex)
-        self.exception_nodes = [parse_node_exception(e)[1] for e in self.exceptions]
+            if ex not in index or not unique_exception:
+                index.append(ex)
+        self.exception_nodes = list(index.keys)  # copied - the list may be changed outside of the index
         return self.exceptions[-1]  # returns last exception
 
     def clear_exceptions(self):
         self.exceptions = []
 
+    def get_exception_index(self):
+        """
+        Gets the index of the exceptions by node (see `ItemIndex`), rebuilding it if the exceptions were replaced.
+        """
+        if self.exception_index is None or not self.exception_index.is_valid_for(self.exceptions):
+            self.exception_index = ItemIndex(self.exceptions, lambda e: parse_node_exception(e)[1])
+        return self.exception_index
+
     def get_node_exceptions(self, nd):
-        return [e for e in self.exceptions if e.node==nd]
+        return self.get_exception_index().get(nd)
+
+    # change the node of an exception which was already added
+    def set_exception_node(self, ex, nd):
+        ex.node = nd
+        self.exception_index = None
 
     def set_prev_agent_turn(self, ex):
         if not self.continued_turn:
@@ -208,6 +319,14 @@ class DialogContext:
     def reset_messages(self):
         self.messages = []
 
+    def get_message_index(self):
+        """
+        Gets the index of the messages by node id (see `ItemIndex`), rebuilding it if the messages were replaced.
+        """
+        if self.message_index is None or not self.message_index.is_valid_for(self.messages):
+            self.message_index = ItemIndex(self.messages, lambda m: m.node.id)
+        return self.message_index
+
     # old signature was add_message(node, msg)  (where msg was originally just text, but sometimes tuple (txt, objs)
     # new one is add_message(msg), where msg is a Message
     # in the old case, we create a Message
@@ -231,13 +350,13 @@ class DialogContext:
             raise Exception('Bad message - no node!')
         msg.turn = self.turn_num if msg.turn is None else msg.turn
         # self.messages.append((nd, msg))
-        self.messages.append(msg)
+        self.get_message_index().append(msg)
 
     # def get_node_messages(self, nd):
     #     return [m for (n, m) in self.messages if n.id == nd.id]
 
     def get_node_messages(self, nd):
-        return [m for m in self.messages if m.node and m.node.id == nd.id]
+        return self.get_message_index().get(nd.id)
 
     # move messages from source node to destination node
     # def move_messages(self, src, dst):
@@ -249,11 +368,10 @@ class DialogContext:
     #     self.messages = msgs
 
     def move_messages(self, src, dst):
-        msgs = []
-        for m in self.messages:
-            m.node = dst if m.node==src else m.node
-            msgs.append(m)
-        self.messages = msgs
+        for m in self.get_message_index().get(src.id):
+            if m.node==src:
+                m.node = dst
+        self.message_index = None
 
     def most_recent_goal(self, nds):
         gls = [i for i, g in enumerate(self.goals) if g in nds]
@@ -266,15 +384,17 @@ class DialogContext:
 
     # these functions are needed for controlling node id's (does not affect any behavior, exclusively cosmetic value)
     def get_next_node_id(self):
-        return len(self.idx_to_node) + self.register_offset
+        return self.next_id
 
     def set_next_node_id(self, v=0):
-        self.register_offset = v - len(self.idx_to_node)
+        self.next_id = v
 
     def get_highest_node_id(self):
         if len(self.idx_to_node) == 0:
             return 0
-        return sorted(list(self.idx_to_node.keys()))[-1]
+        if self.max_id is None:  # only after the highest node was renumbered
+            self.max_id = max(self.idx_to_node)
+        return self.max_id
 
     def is_assigned(self, n):
         return n in self.assign.values()
@@ -290,12 +410,19 @@ class DialogContext:
     #   - add counters  (as tags?, special_feat syntax?)
     #   - possibly add base function which takes a string and fills note attr's
     #     - and inverse func which dumps attrs to a string (and then added to the node string in compr_tree)
-    def pack_context(self, pack):
+    def get_packed_goals(self):
+        """
+        Gets the goals which are packed - for the unique goal types, only the last goal of the type.
+        """
         goals = []
         goal_types = [i.typename() for i in self.goals]
         for i, g in enumerate(goal_types):
             if g not in unique_goal_types or g not in goal_types[i + 1:]:
                 goals.append(self.goals[i])
+        return goals
+
+    def pack_context(self, pack):
+        goals = self.get_packed_goals()
 
         # all the nodes we want to save - reachable from the goals (possibly through .result link)
         nodes = []
@@ -413,6 +540,30 @@ class DialogContext:
 
         return unpack
 
+    # binary serialization of the context, which does not go through the P-expression parser (unlike
+    #   pack_context / unpack_context) - see `context_serialization`
+    def dumps(self, compress=True):
+        from opendf.graph.context_serialization import dump_context
+        return dump_context(self, compress)
+
+    # the data must come from a trusted source (e.g. `dumps` of this program): it is unpickled, restricted to the
+    #   globals a serialized context may refer to (see `context_serialization.ContextUnpickler`)
+    @staticmethod
+    def loads(data, d_context=None):
+        from opendf.graph.context_serialization import load_context
+        return load_context(data, d_context)
+
+    # snapshot of the context, from which copies of the context (as it is now) can be made - see `ContextSnapshot`.
+    #   to make several copies of the same state, take one snapshot and copy it several times
+    def snapshot(self):
+        from opendf.graph.context_serialization import ContextSnapshot
+        return ContextSnapshot(self)
+
+    # make an independent copy of this context, of the same class (the nodes which are not reachable from the goals are
+    #   not copied)
+    def make_copy(self):
+        return self.snapshot().make_copy()
+
     # make a copy of this context, through packing and unpacking (some info is not preserved!)
     def make_copy_with_pack(self):
         nd = self.get_node(0)  # needs a dummy node as input, to access Node functions
@@ -7,7 +7,6 @@ import traceback
 from opendf.defs import *
 from opendf.exceptions import DFException
 from opendf.exceptions.python_exception import EvaluationError
-from opendf.graph.nodes.node import Node
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +22,7 @@ def evaluate_graph(goal, add_goal=True):
         logger.debug('graph has no goals!')
     else:
         goals = d_context.goals if d_context else []
-        prev_nodes = Node.collect_nodes(goals)
+        prev_nodes = d_context.reachable_nodes() if d_context else []
         if add_goal:
             goal.context.add_goal(goal)  # construction succeeded, so we add the new goal
         # TODO: revise nodes (any others?) should not really be added to the graph (should not be candidates for
@@ -71,6 +70,7 @@ def recursive_eval(node, prev_nodes, prev_goals):
     logger.debug(node)
     ok = True
     exs = []
+    seen = set()  # the exceptions in exs - exceptions are compared by identity
     if not node.evaluated:  # TODO: verify not needed!
         keys = list(node.inputs.keys())
         for i in keys:
@@ -82,7 +82,8 @@ def recursive_eval(node, prev_nodes, prev_goals):
                 o, e = recursive_eval(node.inputs[i], prev_nodes, prev_goals)
                 ok = ok and o
                 for ee in e:
-                    if ee not in exs:
+                    if ee not in seen:
+                        seen.add(ee)
                         exs.append(ee)
     if not ok:  # exception(s) in inputs
         ok, exs = node.allows_exception(exs)  # decide: evaluate node despite exception? / raise follow-up exception?
@@ -101,8 +102,10 @@ def recursive_eval(node, prev_nodes, prev_goals):
             # e = d_context.add_exception(ex)
     if ok and node.result != node and node.eval_res:
         o, e = recursive_eval(node.res, prev_nodes, prev_goals)
+        seen = set(exs)  # exs may have been replaced / extended since
         for ee in e:
-            if ee not in exs:
+            if ee not in seen:
+                seen.add(ee)
                 exs.append(ee)
         if node.res_block:  # block further computation if error in result evaluation
             ok = o
@@ -122,7 +125,7 @@ def check_dangling_nodes(d_context):
     """
     Checks that outputs match inputs.
     """
-    nodes = Node.collect_nodes(d_context.goals)
+    nodes = d_context.reachable_nodes()
     for n in nodes:
         for (nm, nd) in n.outputs:
             if nm not in nd.inputs or nd.inputs[nm] != n:
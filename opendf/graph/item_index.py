@@ -0,0 +1,53 @@
+"""
+Index of the exceptions and the messages of a dialog, by node.
+"""
+
+# Intentionally does not formally depend on Node - only the key of each item is used
+
+
+class ItemIndex:
+    """
+    Indexes the items of a list of the dialog context (exceptions / messages) by a key (e.g. the node of the item),
+    and keeps the set of the items, for constant time membership tests (the items are compared by identity, as
+    exceptions and messages do not define equality).
+
+    The list is only appended to through `append()`. The index belongs to one list object, at one length: if the list
+    was replaced (e.g. cleared) or changed elsewhere, `is_valid_for()` is False, and the index should be rebuilt.
+    """
+
+    def __init__(self, items, key):
+        """
+        :param items: the list to index
+        :type items: List[Any]
+        :param key: gets the key of an item
+        :type key: Callable[[Any], Any]
+        """
+        self.items = items
+        self.key = key
+        self.keys = []  # the key of each item, when it was indexed
+        self.by_key = {}  # { key : list of items }
+        self.members = set()
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return item in self.members
+
+    def is_valid_for(self, items):
+        return items is self.items and len(items) == len(self.keys)
+
+    def add(self, item):
+        key = self.key(item)
+        self.keys.append(key)
+        self.by_key.setdefault(key, []).append(item)
+        self.members.add(item)
+
+    def append(self, item):
+        self.items.append(item)
+        self.add(item)
+
+    def get(self, key):
+        """
+        Gets the items with the key, in the order of the list.
+        """
+        return list(self.by_key.get(key, ()))
@@ -1,17 +1,54 @@
 """
 Factory to create the nodes. It does not depend on Node.
 """
+from collections.abc import Mapping
+
 from opendf.exceptions.python_exception import UnknownNodeTypeException
+import hashlib
+import json
+import os
 import re
+import sys
 from opendf.defs import *
 from opendf.utils.utils import get_type_and_clevel, to_list, get_subclasses
 from opendf.defs import posname
 from opendf.exceptions.python_exception import SemanticException
+from opendf.parser.pexp_parser import ASTNode, terminal_ast
 
 # Intentionally does not formally depend on Node
 
 logger = logging.getLogger(__name__)
 
+TYPE_INFO_CACHE_VERSION = 1  # increase when the format (or the computation) of the cached type information changes
+TYPE_INFO_CACHE_ENTRIES = 8  # maximal number of type sets (e.g. applications) kept in the cache file
+
+
+class SampleNodes(Mapping):
+    """
+    { node name : instantiated node of this type }.
+    The sample node of a type is created the first time it is used - not all the types are used in a run.
+    """
+
+    def __init__(self, node_types):
+        self.node_types = node_types
+        self.nodes = {}
+
+    def __getitem__(self, name):
+        nd = self.nodes.get(name)
+        if nd is None:
+            nd = self.node_types[name]()
+            self.nodes[name] = nd
+        return nd
+
+    def __contains__(self, name):
+        return name in self.node_types
+
+    def __iter__(self):
+        return iter(self.node_types)
+
+    def __len__(self):
+        return len(self.node_types)
+
 
 # This class is more than just a factory
 # it also holds general information about all node types, and some useful functions related to node types and names
@@ -52,10 +89,11 @@ class NodeFactory:
         self.leaf_in_type = None
         # { leaf typename : [param name, param type name }  e.g. { 'Year' : (posname(10, 'Int')}
 
-        self.operators = []
-        self.modifiers = []
-        self.aggregators = []
-        self.qualifiers = []
+        # type categories - sets of node type names. They are also set on the node classes, see set_type_categories()
+        self.operators = frozenset()
+        self.modifiers = frozenset()
+        self.aggregators = frozenset()
+        self.qualifiers = frozenset()
 
     def create_node_from_type_name(self, d_context, name, register, tags=None):
         name, clevel = get_type_and_clevel(name)
@@ -116,6 +154,29 @@ class NodeFactory:
         else:
             raise UnknownNodeTypeException(name)
 
+    def entity_ast(self, name, values):
+        """
+        Creates the AST of a node of type `name`, with the given input values. The AST can be given directly to
+        `construct_graph()` (or `Node.call_construct_eval()`) instead of a P-expression string - this avoids
+        formatting and escaping the values into a string, and parsing it back.
+
+        :param name: the node type name (e.g. 'Hotel', 'Recipient?')
+        :type name: str
+        :param values: the inputs - a dict or a list of (input name, value) pairs. The input name may be `None`
+            (positional input). Values which are `None` are skipped, ASTNodes are used as they are (sub-nodes,
+            see `entity_ast()` and `reference_ast()`), any other value is a terminal (see `terminal_ast()`)
+        :type values: Dict[str, Any] or List[Tuple[Optional[str], Any]]
+        :return: the AST
+        :rtype: ASTNode
+        """
+        if isinstance(values, dict):
+            values = values.items()
+        inputs = []
+        for nm, v in values:
+            if v is not None:
+                inputs.append((nm, v if isinstance(v, ASTNode) else terminal_ast(v)))
+        return ASTNode(name, inputs=inputs)
+
     def is_dynamic_out_type(self, tp):
         if tp in self.sample_nodes and self.sample_nodes[tp].out_type == self.node_types['Node']:
             return True
@@ -153,10 +214,109 @@ class NodeFactory:
 
     # initializations after filled with types
     def init_lists(self):
-        self.operators = [i.__name__ for i in list(get_subclasses(self.node_types['Operator']))]
-        self.modifiers = [i.__name__ for i in list(get_subclasses(self.node_types['Modifier']))]
-        self.aggregators = [i.__name__ for i in list(get_subclasses(self.node_types['Aggregator']))]
-        self.qualifiers = [i.__name__ for i in list(get_subclasses(self.node_types['Qualifier']))]
+        self.operators = frozenset(i.__name__ for i in get_subclasses(self.node_types['Operator']))
+        self.modifiers = frozenset(i.__name__ for i in get_subclasses(self.node_types['Modifier']))
+        self.aggregators = frozenset(i.__name__ for i in get_subclasses(self.node_types['Aggregator']))
+        self.qualifiers = frozenset(i.__name__ for i in get_subclasses(self.node_types['Qualifier']))
+
+    def set_type_categories(self):
+        """
+        Sets the type categories on the node classes (`is_operator_type`, ...), so checking the category of a node is
+        a class attribute lookup, instead of looking up the type name.
+        The categories are by type name, like the sets above.
+        """
+        categories = {'is_operator_type': self.operators, 'is_modifier_type': self.modifiers,
+                      'is_aggregator_type': self.aggregators, 'is_qualifier_type': self.qualifiers}
+        classes = set(self.node_types.values())
+        for nm in ['Operator', 'Modifier', 'Aggregator', 'Qualifier']:
+            classes.update(get_subclasses(self.node_types[nm]))  # including classes which are not in node_types
+        for t in classes:
+            for attr, names in categories.items():
+                setattr(t, attr, t.__name__ in names)
+
+    def set_node_types(self, node_types, cache_path=None):
+        """
+        Fills the node types, and the type information derived from them (leaf types, type lists).
+
+        The derived information needs the signatures of all the types (i.e. a sample node of each type). It is kept in
+        a cache file, and reused as long as the types, and the source files of their modules, do not change.
+
+        :param node_types: the node types { node name : node type }
+        :type node_types: Dict[str, type]
+        :param cache_path: the path of the cache file, if `None` or empty, the cache is not used
+        :type cache_path: str or None
+        """
+        self.node_types = node_types
+        self.sample_nodes = SampleNodes(node_types)
+        key = self.type_info_key() if cache_path else None
+        if not key or not self.load_type_info(cache_path, key):
+            self.set_leaf_types()
+            self.init_lists()
+            if key:
+                self.save_type_info(cache_path, key)
+        self.set_type_categories()
+
+    def type_info_key(self):
+        """
+        Computes the key of the current node types in the type information cache - based on the type names, and on the
+        size and modification time of the source files of their modules.
+
+        :return: the key, or `None` if the sources of the types are unknown
+        :rtype: str or None
+        """
+        types = sorted((nm, t.__module__, t.__qualname__) for nm, t in self.node_types.items())
+        sources = []
+        for module in sorted({m for _, m, _ in types}):
+            path = getattr(sys.modules.get(module), '__file__', None)
+            if not path:
+                return None
+            st = os.stat(path)
+            sources.append((path, st.st_mtime_ns, st.st_size))
+        data = json.dumps([TYPE_INFO_CACHE_VERSION, types, sources])
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def read_type_info_cache(cache_path):
+        try:
+            with open(cache_path, 'r') as f:
+                cache = json.load(f)
+            if cache.get('version') == TYPE_INFO_CACHE_VERSION:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return {'version': TYPE_INFO_CACHE_VERSION, 'entries': {}}
+
+    def load_type_info(self, cache_path, key):
+        info = self.read_type_info_cache(cache_path)['entries'].get(key)
+        if info is None:
+            logger.debug('type info cache miss - %s', cache_path)
+            return False
+        self.leaf_types = info['leaf_types']
+        self.leaf_in_type = {nm: tuple(v) for nm, v in info['leaf_in_type'].items()}
+        self.operators = frozenset(info['operators'])
+        self.modifiers = frozenset(info['modifiers'])
+        self.aggregators = frozenset(info['aggregators'])
+        self.qualifiers = frozenset(info['qualifiers'])
+        return True
+
+    def save_type_info(self, cache_path, key):
+        cache = self.read_type_info_cache(cache_path)
+        entries = cache['entries']
+        entries.pop(key, None)
+        while len(entries) >= TYPE_INFO_CACHE_ENTRIES:  # drop the oldest entries
+            del entries[next(iter(entries))]
+        entries[key] = {'leaf_types': self.leaf_types, 'leaf_in_type': self.leaf_in_type,
+                        'operators': sorted(self.operators), 'modifiers': sorted(self.modifiers),
+                        'aggregators': sorted(self.aggregators), 'qualifiers': sorted(self.qualifiers)}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            # write to a temporary file, and replace - concurrent processes never see a partial file
+            tmp_path = '%s.%d' % (cache_path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as ex:
+            logger.debug('could not write type info cache %s: %s', cache_path, ex)
 
     # dump all nodes' signatures to a file
     def dump_node_types(self, pname, bname):
@@ -12,6 +12,7 @@ from opendf.exceptions.df_exception import DFException, MissingValueException, \
     InvalidResultException
 from opendf.exceptions.python_exception import SemanticException
 from opendf.graph.node_factory import NodeFactory
+from opendf.graph import traversal
 from opendf.graph.nodes.framework_objects import Str, Bool, Int
 from opendf.graph.nodes.framework_operators import Operator
 from opendf.graph.nodes.node import Node
@@ -55,9 +56,12 @@ def get_refer_match(d_context, all_nodes0, goals0, is_ref_goal=False, parent=Non
     nodes = all_nodes
     if isinstance(pos1, str):
         pos1, _ = Node.call_construct(pos1, d_context)
+    index = d_context.candidate_index()  # used to skip nodes which can not match, before doing the full match
     if not force_fallback:
         if pos1:  # type constraint - could be an aggregated constraint (AND/OR/...)
-            candidates = [n for n in nodes if
+            accept = pos1.match_class_filter(pos1view)
+            candidates = index.select_types(nodes, accept) if accept else nodes
+            candidates = [n for n in candidates if
                           pos1.match(n, iview=pos1view, oview=VIEW.INT, check_level=True, match_miss=match_miss)]
             matches = Node.rank_by_order(candidates, goals, follow_res=True)
             nodes = matches  # allow further filtering
@@ -67,6 +71,8 @@ def get_refer_match(d_context, all_nodes0, goals0, is_ref_goal=False, parent=Non
             targ_type = re.sub(' ', '_', re.sub('\?', '', tp))
             # TODO: should we complain if this is not a known type name?
             matches = []
+            if targ_type != 'Node':
+                nodes = index.select_types(nodes, lambda c: c.__name__ == targ_type)
             for n in nodes:
                 if (targ_type == 'Node' or n.typename() == targ_type) and n.constraint_level == clevel:
                     matches.append(n)
@@ -101,7 +107,7 @@ def get_refer_match(d_context, all_nodes0, goals0, is_ref_goal=False, parent=Non
             targ_type = re.sub(' ', '_', re.sub('\?', '', tp))
             matches = []
             for n in nodes:
-                ch = n.topological_order()[:-1]  # children. allow res?
+                ch = traversal.descendants(n)  # children. allow res?
                 found = False
                 for c in ch:
                     if not found:
@@ -116,7 +122,7 @@ def get_refer_match(d_context, all_nodes0, goals0, is_ref_goal=False, parent=Non
             #   N.inputs['aa'].inputs['bb'].inputs['cc'] == candidate
             #   should allow alias! (tricky when "going up"). maybe do this as filtering one step at a time
             matches = {}
-            for n in nodes:
+            for n in index.select(nodes, [('role', role)]):
                 for nm, o in n.outputs:
                     if (nm == role or nm == o.signature.real_name(
                             role)) and n not in matches:  # add each node only once
@@ -337,6 +343,7 @@ def auto_reorder_inputs(nd, raise_nodes):
                 if inps[i] not in rs and inps[j] in rs and (i, j) not in nd.signature.inp_dep:
                     inps[i], inps[j] = inps[j], inps[i]
         nd.inputs = nd.inputs.duplicate(inps)
+        nd.links_changed()
 
 
 # rev, mid, below - needed only for custom new_beg
@@ -578,9 +585,13 @@ def add_scored_matches(g, ig, m, matches, d_context, old=None, oiview=None, ocle
     candidates0 = []
     ml = oclevel  # self.get_dat('oclevel')
     # d_context = self.context
+    index = d_context.candidate_index()  # used to skip nodes which can not match, before doing the full match
     match_level = 'strict' if not ml or ml not in ['strict', 'prefer', 'any'] else ml
     if old:  # 'old' in self.inputs:
         # old, iview = self.get_inp_view_and_mode('old')
+        accept = old.match_class_filter(oiview)
+        if accept:
+            candidates = index.select_types(candidates, accept)
         if match_level != 'strict':
             candidates0 = [n for n in candidates if old.match(n, iview=oiview, oview=VIEW.INT, check_level=False)]
             if match_level == 'any':
@@ -598,6 +609,7 @@ def add_scored_matches(g, ig, m, matches, d_context, old=None, oiview=None, ocle
         tp = to_list(oldType)
         clevel = max([get_type_and_clevel(i)[1] for i in tp])
         told = [re.sub(' ', '_', re.sub('\?', '', i)) for i in tp]
+        candidates = index.select_types(candidates, lambda c: c.__name__ in told)
         if match_level != 'strict':
             candidates0 = [n for n in candidates if (told == 'Node' or n.typename() in told)]
             if match_level == 'any':
@@ -620,10 +632,10 @@ def add_scored_matches(g, ig, m, matches, d_context, old=None, oiview=None, ocle
         # TODO: allow period separated role string to specify multi-step path to candidate nodes
         # role = re.sub(' ', '_', self.get_dat('role'))
         # role = self.get_dat('role')
-        candidates = [n for n in candidates for m, o in n.outputs if
+        candidates = [n for n in index.select(candidates, [('role', role)]) for m, o in n.outputs if
                       m == role or m == o.signature.real_name(role)]  # nodes which serve as role
         if not candidates:
-            candidates = [n for n in candidates0 for m, o in n.outputs if
+            candidates = [n for n in index.select(candidates0, [('role', role)]) for m, o in n.outputs if
                           m == role or m == o.signature.real_name(role)]
     if hasParam:  # 'hasParam' in self.inputs:
         param = hasParam  # self.get_dat('hasParam')
@@ -639,21 +651,23 @@ def add_scored_matches(g, ig, m, matches, d_context, old=None, oiview=None, ocle
                           n.signature.real_name(param) in n.inputs]  # nodes which allow param
     if hasTag:  # 'hasTag' in self.inputs:
         tg = hasTag  # self.get_dat('hasTag')
-        candidates = [n for n in candidates if tg in n.tags]  # nodes which have this tag
+        candidates = [n for n in index.select(candidates, [('tag', tg)]) if tg in n.tags]  # nodes which have this tag
         if not candidates:
-            candidates = [n for n in candidates0 if tg in n.tags]
+            candidates = [n for n in index.select(candidates0, [('tag', tg)]) if tg in n.tags]
 
     # score matches and add to match list    TODO: more elaborate score function - take 'mid' into account?
     below = hasBelow  # 'hasBelow' in self.inputs
+    order = {n: i for i, n in enumerate(nodes)}
+    ex_nodes = set(d_context.exception_nodes + d_context.copied_exceptions)
     for o in candidates:
         if below:
             oo = [i for i in o.topological_order([], follow_res=True) if below.match(i)]  #  self.inputs['hasBelow'].match(i)]
         if not below or oo:
-            score = ig * 100 + len(nodes) - nodes.index(o)  # nodes.index(o) - topological order of candidate
-            if o in d_context.exception_nodes + d_context.copied_exceptions:
+            score = ig * 100 + len(nodes) - order[o]  # order[o] - topological order of candidate
+            if o in ex_nodes:
                 # increase priority of node corresponding to exception. Higher priority if immediate exception
                 score = score - 50 if o in d_context.exception_nodes else score - 25
-            elif o.res in d_context.exception_nodes + d_context.copied_exceptions:
+            elif o.res in ex_nodes:
                 # same if exception happened for its result
                 score = score - 50 if o.res in d_context.exception_nodes else score - 25
             # add order_score_offset (for SWITCH)
@@ -1757,7 +1771,7 @@ class side_task(Node):
             exs = self.context.get_node_exceptions(self)
             if exs:
                 e = self.context.add_exception(exs[0])
-                e.node = main_task
+                self.context.set_exception_node(e, main_task)
             if not self.inp_equals('persist', True):
                 self.context.remove_goal(self)
             else:
@@ -688,6 +688,7 @@ class TEE(Aggregator):
     def exec(self, all_nodes=None, goals=None):
         inp = self.inputs[posname(1)]
         self.result = inp
+        self.links_changed()
 
         name = self.get_dat('name')
         if name:
@@ -1,4 +1,5 @@
 import re
+import sys
 from typing import Tuple, Any, Optional, List
 
 from opendf.exceptions.debug_exception import DebugDFException
@@ -6,6 +7,7 @@ from opendf.exceptions.df_exception import ElementNotFoundException
 from opendf.graph.dialog_context import DialogContext
 from opendf.graph.nlu_framework import NLU_TYPE
 from opendf.graph.node_factory import NodeFactory
+from opendf.graph import traversal
 from opendf.utils.utils import compatible_clevel, parse_hint, to_list, id_sexp, \
     is_assign_name, strings_similar, flatten_list
 from opendf.exceptions import re_raise_exc
@@ -21,6 +23,15 @@ environment_definitions = EnvironmentDefinition.get_instance()
 
 logger = logging.getLogger(__name__)
 
+# shared (read only) initial values of rarely filled node fields. A node which needs to modify such a field first
+#   replaces it by its own container (there can be millions of nodes - most of them never fill these fields)
+NO_TAGS = ()
+NO_NODES = ()
+NO_REASONS = ReadOnlyDict()
+DEFAULT_COUNTERS = ReadOnlyDict({'dup': 1})
+
+NEGATIVE_OPERATORS = frozenset(['NOT', 'NEQ', 'NONE', 'negate'])
+
 
 class Node:
     """
@@ -29,9 +40,26 @@ class Node:
     features which control the way the nodes behave and use other others.
     """
 
+    # the fields of the base node are kept in slots (compact). Subclasses (which do not define __slots__) still keep
+    #   their own additional fields in a __dict__
+    __slots__ = ('id', 'signature', 'inputs', 'view_mode', 'out_type', 'copy_in_type', 'evaluated', 'result',
+                 'outputs', 'tags', 'type_tags', 'res_out', 'check_node', 'data', 'constraint_level',
+                 'constr_obj_view', 'eval_res', 'res_block', 'mutable', 'hide', 'no_revise', 'add_goal',
+                 'stop_eval_on_exception', 'detach', 'detached_nodes', 'just_dup', 'dup_of', 'inited', 'created_turn',
+                 'inp_reason', 'reason', 'context', 'counters', 'obj_name_singular', 'obj_name_plural',
+                 'pack_counters', '__dict__', '__weakref__')
+
+    type_signatures = {}  # { node type : Signature } - the signature shared by all the nodes of the type
+
+    # the type categories - set for each node class by the node factory (see `NodeFactory.set_type_categories()`)
+    is_operator_type = False
+    is_aggregator_type = False
+    is_qualifier_type = False
+    is_modifier_type = False
+
     def __init__(self, out_type=None):
         self.id = None
-        self.signature = Signature()  # definitions of input parameters - {name : InputParam}
+        self.signature = self.type_signature()  # definitions of input parameters - {name : InputParam}
         self.inputs = AliasODict()  # inputs PRESENT in the graph - {name : node}
         # using OrderedDict - so that evaluation goes in left-to-right order (relative to construction order)
         # inputs (also outputs, view_mode) use the "real" name - not aliases
@@ -56,9 +84,10 @@ class Node:
         # tags with '*' are required, tags with TAG_NO_COPY are not copied, tags with TAG_NO_SHOW are not displayed,
         # tags with TAG_NO_MATCH are not matched
 
-        self.type_tags = []  # names of tags which are created per type (in __init__) (i.e. not added per node instance)
+        self.type_tags = NO_TAGS  # names of tags which are created per type (in __init__) (i.e. not added per node
+        #                           instance)
 
-        self.res_out = []  # pointers to nodes this node is a direct result of
+        self.res_out = NO_NODES  # pointers to nodes this node is a direct result of
         self.check_node = True  # allows turning off formal (general) tests for nodes with variable inputs.
         # TODO: still needed?
 
@@ -77,7 +106,7 @@ class Node:
         self.add_goal = None  # add this node to goals - as either int/ext
         self.stop_eval_on_exception = False  # do not evaluate further sibling inputs if failed on an input
         self.detach = False  # this node will be detached from input and replaced by its result, once result created
-        self.detached_nodes = []  # not used anymore
+        self.detached_nodes = NO_NODES  # not used anymore
         # list of (nm, nd) - nodes which used to be inputs, but got detached. Used only for drawing
 
         self.just_dup = False
@@ -89,7 +118,8 @@ class Node:
         self.created_turn = None
         # remember which turn the node was created - may be useful for scoring by age. Just finding ancestor goal_id
         #   may not be enough
-        self.inp_reason = {}  # (text, optional) explain to user why this input is needed (keys - same as for 'input')
+        self.inp_reason = NO_REASONS  # (text, optional) explain to user why this input is needed (keys - same as for
+        #                               'input')
         self.reason = ''
         # (text, optional) explain to user why this node is needed. This explanation is independent of where the
         # node is used
@@ -97,11 +127,29 @@ class Node:
         self.context: Optional[DialogContext] = None
         # link to the dialog context this node is part of (avoid need to pass d_context everywhere)
 
-        self.counters = {'dup': 1}
+        self.counters = DEFAULT_COUNTERS  # replaced by a dict of this node when changed - see `own_counters()`
         self.obj_name_singular = self.typename()
-        self.obj_name_plural = self.typename() + 's'
+        self.obj_name_plural = sys.intern(self.typename() + 's')  # shared by all the nodes of the type
         self.pack_counters = None  # a list of counters to pack (when packing context)
 
+    # the signature is static per node type, so all the nodes of a type share one signature.
+    # The signature is filled by the __init__ of the first node of the type (which adds the entries). When the second
+    #   node of the type is created, the first one is complete, so the signature is frozen (see `Signature`)
+    @classmethod
+    def type_signature(cls):
+        sig = Node.type_signatures.get(cls)
+        if sig is None:
+            sig = Node.type_signatures[cls] = Signature()
+        else:
+            sig.frozen = True
+        return sig
+
+    # counters are shared (read only) until a node changes them
+    def own_counters(self):
+        if isinstance(self.counters, ReadOnlyDict):
+            self.counters = dict(self.counters)
+        return self.counters
+
     # #############################################################################################
     # ##################### some simple functions with self explanatory names #####################
 
@@ -112,20 +160,20 @@ class Node:
         return self.typename() in base_types
 
     def is_operator(self):
-        return self.typename() in node_fact.operators
+        return self.is_operator_type
 
     def not_operator(self):
         # too lazy to write `not self.is_operator()`
-        return self.typename() not in node_fact.operators
+        return not self.is_operator_type
 
     def is_aggregator(self):
-        return self.typename() in node_fact.aggregators
+        return self.is_aggregator_type
 
     def is_qualifier(self):
-        return self.typename() in node_fact.qualifiers
+        return self.is_qualifier_type
 
     def is_modifier(self):
-        return self.typename() in node_fact.modifiers
+        return self.is_modifier_type
 
     # #############################################################################################
 
@@ -427,6 +475,7 @@ class Node:
         self.inputs[nm] = nd
         self.view_mode[nm] = view
         nd.add_output(nm, self)
+        self.links_changed()
 
     # add input and output links needed to add self as input[name] of parent
     def connect_in_out(self, name, parent, view=None, force=False):
@@ -441,6 +490,7 @@ class Node:
         if view is None:
             view = VIEW.EXT if parent.is_operator() or name not in parent.signature else parent.signature[name].view
         parent.view_mode[name] = view
+        parent.links_changed()
 
     def replace_input(self, nm, new_node, view=None):
         nm = self.real_name(nm)
@@ -454,10 +504,22 @@ class Node:
             self.inputs.pop(nm)
         new_node.connect_in_out(nm, self, view)
 
+    # called whenever the inputs or the result of this node were changed - lets the context update what it keeps
+    #   about the graph (e.g. the reachable nodes view)
+    def links_changed(self):
+        if self.context:
+            self.context.node_changed(self)
+
+    # called whenever the tags or the outputs of this node were changed - lets the context update its search index
+    def search_keys_changed(self):
+        if self.context:
+            self.context.node_keys_changed(self)
+
     def add_output(self, nm, parent):
         nm = parent.real_name(nm)
         if (nm, parent) not in self.outputs:
             self.outputs.append((nm, parent))
+            self.search_keys_changed()
 
     def set_result(self, n):
         """
@@ -472,7 +534,10 @@ class Node:
                 res.res_out = [r for r in res.res_out if r != self]
             self.result = n
             if n != self:  # add self to n's list of out_res links (unless n==self)
+                if not n.res_out:  # replace the shared empty value
+                    n.res_out = []
                 n.res_out.append(self)
+            self.links_changed()
         self.out_type = self.res.get_op_type(no=Node)  # TODO: check no bad effects!
 
     # ast flag - use AST stype features
@@ -501,6 +566,7 @@ class Node:
                 elif f=='*':
                     self.evaluated = True
                     self.result = self
+                    self.links_changed()
 
     # used e.g. in compr_tree, when we want to make a string representation of the graph
     #  this should include all node fields which are NOT set by default (assignment in base Node, or in the derived
@@ -542,7 +608,7 @@ class Node:
             vs = s.split(':')
             cnts = cnts if cnts else self.pack_counters
             for c, v in zip(cnts, vs):
-                self.counters[c] = int(v)
+                self.own_counters()[c] = int(v)
 
     # base class - do nothing
     def get_extra_attr_str(self):
@@ -567,7 +633,8 @@ class Node:
             for (nm, nd) in self.outputs:
                 nd.inputs[nm] = res  # what about nd.view_mode?
                 res.add_output(nm, nd)
-                nd.detached_nodes.append((nm, self))
+                nd.detached_nodes = nd.detached_nodes + ((nm, self),)
+                nd.links_changed()
             self.outputs = []  # this node is not used as input anymore
 
     def disconnect_node_from_parents(self):
@@ -604,7 +671,8 @@ class Node:
     def add_type_tags(self, key, val=''):
         self.tags[key] = val
         if key not in self.type_tags:
-            self.type_tags.append(key)
+            self.type_tags = self.type_tags + (key,)
+        self.search_keys_changed()
 
     def add_tags(self, tags):
         if tags:
@@ -620,6 +688,7 @@ class Node:
                             self.tags[v] = ''
                     else:
                         self.tags[t] = ''
+            self.search_keys_changed()
 
     def get_tags_str(self, no_deco=True):
         tags = []
@@ -709,6 +778,7 @@ class Node:
     def del_input(self, nm):
         if nm in self.inputs:
             del self.inputs[nm]
+            self.links_changed()
         if nm in self.view_mode:
             del self.view_mode[nm]
         # TODO: handle output nodes as well?
@@ -724,6 +794,7 @@ class Node:
             if nm in self.view_mode:
                 del self.view_mode[nm]
             nd.outputs = [(m, n) for (m, n) in nd.outputs if m != nm or n != self]
+            self.links_changed()
 
     def disconnect_input_nodes(self, nds):
         """
@@ -849,6 +920,18 @@ class Node:
     def custom_match(self, nm, obj, iview=VIEW.INT, oview=None, check_level=False, match_miss=False):
         return True
 
+    # when searching for objects which match this constraint (refer / revise), objects whose class is rejected by this
+    #   filter can be skipped without calling `match()` - this is the type check done at the beginning of `Node.match`.
+    # valid for matching with oview=VIEW.INT (as refer/revise do). Returns None if any object may match (incl. when
+    #   `match` is overridden)
+    def match_class_filter(self, iview=VIEW.INT):
+        if iview == VIEW.EXT and self.res != self:
+            return self.res.match_class_filter()
+        if type(self).match is not Node.match or self.typename() == 'Node':
+            return None
+        tp = type(self)
+        return lambda c: issubclass(c, tp) or c.is_operator_type
+
     # perform tree match between a constraint tree (self) and an object (obj)
     # the constraint may have operators, but the object should be a simple structure - no operators
     # takes care of intension/extension for both ref (self) and obj
@@ -878,29 +961,30 @@ class Node:
         if oview == VIEW.EXT:
             obj = obj.res
 
-        if check_level and obj.not_operator():
+        if check_level and not obj.is_operator_type:
             if not compatible_clevel(self.constraint_level, obj.constraint_level):
                 return False
 
-        if self.typename() == 'Empty':
+        typename = type(self).__name__
+        if typename == 'Empty':
             return False
 
-        if self.typename() != 'Node':
+        if typename != 'Node':
             tp = type(obj)  #
-            if tp.__name__ in node_fact.operators:  # in principle, obj should be a simple object without operators
+            if tp.is_operator_type:  # in principle, obj should be a simple object without operators
                 tp = obj.get_op_type()
-            if tp != type(self) and tp not in node_fact.operators:
+            if tp != type(self):
                 if not issubclass(tp, type(self)):
                     return False
-            if obj.is_operator():
+            if obj.is_operator_type:
                 os = obj.get_op_objects()
                 for o in os:
-                    if o.typename()!='Node' and o.typename()!=self.typename():
+                    if o.typename()!='Node' and o.typename()!=typename:
                         return False
                     if check_level and not compatible_clevel(self.constraint_level, o.constraint_level):
                         return False
 
-        if self.typename() == 'Node' and len(self.inputs) == 0:  # Any() matches any node. TODO: constraint_level
+        if typename == 'Node' and len(self.inputs) == 0:  # Any() matches any node. TODO: constraint_level
             return True
 
         # at this point, both object and constraint point to the right nodes - no need to refer to .result for either
@@ -1077,7 +1161,7 @@ class Node:
             if i.startswith('max_'):
                 s = i[4:]
                 if s not in self.counters:
-                    self.counters[s] = 0
+                    self.own_counters()[s] = 0
 
     def count_ok(self, nm):
         if nm in self.counters:
@@ -1087,13 +1171,14 @@ class Node:
         return True
 
     def inc_count(self, nm, inc=1):
-        if nm in self.counters:
-            self.counters[nm] += inc
+        counters = self.own_counters()
+        if nm in counters:
+            counters[nm] += inc
         else:
-            self.counters[nm] = inc
+            counters[nm] = inc
 
     def reset_count(self, nm, val=0):
-        self.counters[nm] = val
+        self.own_counters()[nm] = val
 
     # validate input
     # execute function (if applicable) set result pointer (possibly create result node(s))
@@ -1129,6 +1214,7 @@ class Node:
         # 5. if result not set by now (i.e. not a function) then set it to self
         if self.result is None:  # TODO: in case of a function constraint...
             self.result = self
+            self.links_changed()
 
         # set assigned result nodes
         d_context = self.context
@@ -1157,16 +1243,7 @@ class Node:
 
     # get nodes for which self is (transitively) a result - create a dict {node, dist} by BFS
     def parent_res(self):
-        q = [self]
-        depths = {}
-        while q:
-            n = q.pop()
-            d = depths[n] if depths else 0
-            for o in n.res_out:
-                if o not in depths:
-                    depths[o] = d + 1
-                    q.insert(0, o)
-        return depths
+        return traversal.result_ancestors(self)
 
     def get_key_index(self, k):
         i = self.signature.get_key_index(k)
@@ -1180,28 +1257,7 @@ class Node:
     # return set of all nodes connected transitively by output edges - create a dict {node, dist} by BFS
     # TODO: should also include result? no (?)
     def parent_nodes(self, res=False):
-        q = [self]
-        depths = {self: 0}
-        orig = {}  # for each node - from where did we get to ("edge origin") (the first origin) - not used!
-        while q:
-            n = q.pop()
-            d = depths[n]
-            if res:
-                rdep = n.parent_res()
-                for r in rdep:
-                    if r not in depths:
-                        depths[r] = d + 0.01 * rdep[r]
-                        q.insert(0, r)
-                        if r not in orig:
-                            orig[r] = ('RES', n)
-            for m, o in n.outputs:
-                if o not in depths:
-                    depths[o] = d + 1 + 0.0001 * o.get_key_index(
-                        m)  # last element - make score depend on order of inputs
-                    if o not in orig:
-                        orig[o] = (m, n)
-                    q.insert(0, o)
-        return depths, orig
+        return traversal.ancestors(self, res=res)
 
     # after calling parent_nodes, use the calculated 'orig' for more efficiently finding path from self to target node
     # (returns just one path)
@@ -1265,7 +1321,7 @@ class Node:
                           res_only=False):
         """
         Creates a list of all nodes in the "tree" rooted at current node. Nodes appear AFTER all their inputs,
-        aggregates, results.
+        aggregates, results. The walk itself is done (non-recursively) by `traversal.topological_order`.
 
         It is possible to incrementally create a list for multiple graphs, but then order matters! Newer graphs may
         depend on older ones, so start with the older ones!
@@ -1278,27 +1334,14 @@ class Node:
         :param res_only: follow only results
         :type res_only: bool
         """
-        nodes = nodes if nodes else []
-        parents = parents if parents else []
-        parents.append(self)
-        for n in self.follow_nodes(parents, follow_res, summarize=summarize, follow_detached=follow_detached,
-                                   follow_view=follow_view, res_only=res_only):  # TODO: follow_re_trans - not used?
-            if n not in nodes and (not exclude_neg or n.typename() not in ['NEQ', 'NOT', 'NONE']):
-                nodes = n.topological_order(nodes, parents, follow_res, exclude_neg, follow_res_trans,
-                                            summarize, follow_detached, follow_view, res_only)
-        if self not in nodes:
-            nodes.append(self)
-        return nodes
+        return traversal.topological_order([self], nodes, parents, follow_res, exclude_neg, summarize,
+                                           follow_detached, follow_view, res_only)
 
     @staticmethod
     def collect_nodes(goals, follow_res=True, exclude_neg=False, follow_res_trans=False,
                       summarize=None, follow_detached=False, follow_view=False):
-        nodes = []
-        goals = to_list(goals)
-        for gl in goals:
-            nodes = gl.topological_order(nodes, None, follow_res, exclude_neg, follow_res_trans, summarize,
-                                         follow_detached, follow_view)
-        return nodes
+        return traversal.topological_order(to_list(goals), None, None, follow_res, exclude_neg, summarize,
+                                           follow_detached, follow_view)
 
     @staticmethod
     def get_nodes_of_typ(nds, typ):
@@ -1399,7 +1442,7 @@ class Node:
             n = new_subgraph[ig]
             for nm in o.inputs:
                 o_in = o.inputs[nm]  # old input node
-                if o_in in old_subgraph:  # always true!  input within subgraph (new_beg will not be changed)
+                if o_in in old_idx:  # always true!  input within subgraph (new_beg will not be changed)
                     n_in = new_subgraph[old_idx[o_in]]  # new input node
                     n.inputs[nm] = n_in  # replace by corresponding new node
                     n_in.add_output(nm, n)
@@ -1463,7 +1506,8 @@ class Node:
             if typs:
                 typs = to_list(typs)
                 dp = [i for i in dp if i.typename() in typs]
-            return [(i, depths[i]) for i in dp if i in subgraph] if with_dist else [i for i in dp if i in subgraph]
+            in_sub = set(subgraph)
+            return [(i, depths[i]) for i in dp if i in in_sub] if with_dist else [i for i in dp if i in in_sub]
         return subgraph
 
     # called by duplicate_subgraph, when mode starts with 'auto'
@@ -1495,11 +1539,13 @@ class Node:
             for i in self.inputs:
                 if (i, self) not in self.inputs[i].outputs:
                     self.inputs[i].outputs.append((i, self))
+                    self.inputs[i].search_keys_changed()
         for i in other.view_mode:
             self.view_mode[i] = other.view_mode[i]
         for i in other.tags:
             if force_tags or TAG_NO_COPY not in i:  # tags with TAG_NO_COPY are not copied
                 self.tags[i] = other.tags[i]
+        self.search_keys_changed()
         self.data = other.data
         self.constraint_level = other.constraint_level
         self.out_type = other.out_type
@@ -1514,7 +1560,7 @@ class Node:
         self.stop_eval_on_exception = other.stop_eval_on_exception
         self.inited = other.inited
         # not copying created_turn - leave as is
-        self.counters = {i: other.counters[i] for i in other.counters}
+        self.counters = other.counters if isinstance(other.counters, ReadOnlyDict) else dict(other.counters)
 
     def typename(self):
         return type(self).__name__
@@ -1571,7 +1617,7 @@ class Node:
     # typically returns self, but could return create another node instead (or None)
     #           if not self - then needs to make sure that all plumbing is correct!
     def on_duplicate(self, dup_tree=False):
-        self.counters['dup'] += 1
+        self.own_counters()['dup'] += 1
         return self
 
     def print_tree(self, parent, ind=None, seen=None, with_id=True, with_pos=True, trim_leaf=True,
@@ -1878,9 +1924,9 @@ class Node:
         """
         objs = [] if objs is None else objs
         typs = to_list(typs) if typs else None
-        if self.not_operator():
+        if not self.is_operator_type:
             return objs if self in objs or (typs and self.typename() not in typs) else objs + [self]
-        if exclude_neg and self.typename() in ['NOT', 'NEQ', 'NONE', 'negate']:
+        if exclude_neg and self.typename() in NEGATIVE_OPERATORS:
             return objs
         for i in self.inputs:
             n = self.inputs[i] if view==VIEW.INT else self.inputs[i].res if view==VIEW.EXT else self.input_view(i)
@@ -2259,6 +2305,7 @@ class Node:
         self.add_linked_input(nm, d, iv)
         if self.typename() == 'TEE':
             self.result = d  # TODO: use set_result()
+            self.links_changed()
         if do_eval:
             e = d.call_eval(add_goal=False)
             if e:
@@ -2831,6 +2878,7 @@ class Node:
         for i in pos:
             inps[i] = self.inputs[i]
         self.inputs = inps
+        self.links_changed()
         # sanity check
         for i in ii:
             if i not in self.inputs:
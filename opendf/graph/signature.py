@@ -15,6 +15,25 @@ items = 'items'
 _RaiseKeyError = object()  # singleton for no-default behavior
 
 
+class ReadOnlyDict(dict):
+    """
+    Dictionary which can not be modified. Used for empty / default values which are shared between many objects
+    (e.g. nodes) - an object which needs to modify the value replaces it by its own (regular) dict.
+    """
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('ReadOnlyDict can not be modified')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _read_only
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+NO_ALIASES = ReadOnlyDict()
+
+
 class AliasODict(OrderedDict):
     """
     Ordered dictionary with alias.
@@ -22,7 +41,7 @@ class AliasODict(OrderedDict):
     An entry in the dict has a "formal" name, but may be referred to using an alias
     e.g. if we define that 'y' is an alias for 'x', then dict['x'] and dict['y'] refer to the same cell.
     """
-    __slots__ = ()
+    __slots__ = ('aliases',)
 
     @staticmethod
     def _process_args(mapping=(), **kwargs):
@@ -40,7 +59,8 @@ class AliasODict(OrderedDict):
 
     def __init__(self, mapping=(), **kwargs):
         super(AliasODict, self).__init__(self._process_args(mapping, **kwargs))
-        self.aliases = {}  # we actually copy the aliases from the signature (in node_factory, after creating the node)
+        self.aliases = NO_ALIASES  # we actually use the aliases of the signature (set in node_factory, after creating
+        #                            the node)
 
     def __getitem__(self, k):
         return super(AliasODict, self).__getitem__(self.real_name(k))
@@ -105,8 +125,7 @@ class AliasODict(OrderedDict):
         else:
             for i in self:
                 d[i] = self[i]
-        for i in self.aliases:
-            d.aliases[i] = self.aliases[i]
+        d.aliases = self.aliases  # aliases are not modified - they are shared with the signature
         return d
 
 
@@ -176,10 +195,12 @@ class InputParam:
 
 
 # TODO: changing this to be AliasODict may make it a bit cleaner
-# TODO: do we need to duplicate the signature in copy_info?
+# the signature is static per node type - all the nodes of a type share one signature (see `Node.__init__`).
+#   Once it is frozen, calls to `add_sig` / `set_multi_res` (done by the __init__ of each new node) are ignored.
 class Signature(OrderedDict):
     def __init__(self):
         super().__init__()
+        self.frozen = False
         self.aliases = {}  # { alias : real_name }
         self.key_index = {}
         self.multi_res = False  # can the result of this node be multiple objects?
@@ -203,6 +224,8 @@ class Signature(OrderedDict):
                 # for now - only for property 'get' - not for property 'set'. (may need additional flag for 'set')
                 alias=None,  # alias for positional argument
                 custom=None):  # parameter needs custom match function
+        if self.frozen:
+            return
         ptags = ptags if ptags else []
         if alias:
             if not is_pos(name):  # allow alias only for positional parameters
@@ -289,5 +312,6 @@ class Signature(OrderedDict):
         return -1
 
     def set_multi_res(self, val):
-        self.multi_res = val
+        if not self.frozen:
+            self.multi_res = val
 
@@ -0,0 +1,125 @@
+"""
+Non-recursive graph traversals - topological order, ancestors and descendants.
+"""
+from collections import deque
+
+# Intentionally does not formally depend on Node - these functions only use the node's links and `follow_nodes`
+
+NEG_TYPES = {'NEQ', 'NOT', 'NONE'}
+
+
+def topological_order(roots, nodes=None, parents=None, follow_res=True, exclude_neg=False, summarize=None,
+                      follow_detached=False, follow_view=False, res_only=False, done=None):
+    """
+    Creates a list of all nodes in the graphs rooted at `roots`. Nodes appear AFTER all their inputs, aggregates,
+    results.
+
+    The walk uses an explicit stack, so it is not limited by the Python recursion depth, and membership is tested
+    against sets, so the cost is linear in the size of the graph. The order is the same as the one of the (former)
+    recursive `Node.topological_order`: each root is walked with a fresh set of visited nodes (used to avoid result
+    loops), while the output list is shared between the roots.
+
+    :param roots: the root node, or a list of root nodes (older graphs first)
+    :param nodes: if given (and not empty), new nodes are appended to this list (in place)
+    :param parents: nodes which are considered as already visited when following result links
+    :param exclude_neg: if `True`, then don't follow nodes with "negative" constraint_op
+    :param summarize: list of node type names for which we don't follow inputs
+    :param res_only: follow only results
+    :param done: if given, the set of nodes which are already in the output (typically - the nodes collected from
+        previous roots). New nodes are added to it (in place)
+    :return: the list of nodes, in topological order
+    :rtype: List[Node]
+    """
+    nodes = nodes if nodes else []
+    done = done if done is not None else set(nodes)
+    roots = roots if isinstance(roots, (list, tuple)) else [roots]
+    for root in roots:
+        # `visited` holds all the nodes entered during the walk of this root - a result link is not followed into a
+        #   node which was already visited (this avoids result loops)
+        visited = set(parents) if parents else set()
+        visited.add(root)
+        stack = [(root, iter(root.follow_nodes(visited, follow_res, summarize=summarize,
+                                               follow_detached=follow_detached, follow_view=follow_view,
+                                               res_only=res_only)))]
+        while stack:
+            node, children = stack[-1]
+            for n in children:
+                if n not in done and (not exclude_neg or n.typename() not in NEG_TYPES):
+                    visited.add(n)
+                    stack.append((n, iter(n.follow_nodes(visited, follow_res, summarize=summarize,
+                                                         follow_detached=follow_detached, follow_view=follow_view,
+                                                         res_only=res_only))))
+                    break
+            else:
+                stack.pop()
+                if node not in done:
+                    done.add(node)
+                    nodes.append(node)
+    return nodes
+
+
+def result_ancestors(node):
+    """
+    Gets the nodes for which `node` is (transitively) a result - a dict {node : dist}, created by BFS.
+    """
+    q = deque([node])
+    depths = {}
+    while q:
+        n = q.popleft()
+        d = depths.get(n, 0)
+        for o in n.res_out:
+            if o not in depths:
+                depths[o] = d + 1
+                q.append(o)
+    return depths
+
+
+def ancestors(node, res=False):
+    """
+    Gets all the nodes connected transitively to `node` by output edges (and optionally by result edges), by BFS.
+
+    :return: a dict {node : dist}, and a dict {node : (input name, node)} with the first edge origin for each node
+        (which is used for efficiently finding a path back to `node`)
+    :rtype: Tuple[Dict[Node, float], Dict[Node, Tuple[str, Node]]]
+    """
+    q = deque([node])
+    depths = {node: 0}
+    orig = {}
+    while q:
+        n = q.popleft()
+        d = depths[n]
+        if res:
+            rdep = result_ancestors(n)
+            for r in rdep:
+                if r not in depths:
+                    depths[r] = d + 0.01 * rdep[r]
+                    q.append(r)
+                    if r not in orig:
+                        orig[r] = ('RES', n)
+        for m, o in n.outputs:
+            if o not in depths:
+                depths[o] = d + 1 + 0.0001 * o.get_key_index(m)  # make score depend on order of inputs
+                if o not in orig:
+                    orig[o] = (m, n)
+                q.append(o)
+    return depths, orig
+
+
+def descendants(node, follow_res=True):
+    """
+    Gets the set of all nodes (transitively) under `node` - through inputs, and optionally through result links.
+    `node` itself is not included.
+    """
+    seen = set()
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        nxt = list(n.inputs.values())
+        if follow_res and n.result is not None and n.result is not n:
+            nxt.append(n.result)
+        for c in nxt:
+            if c not in seen:
+                seen.add(c)
+                stack.append(c)
+    seen.discard(node)
+    return seen
@@ -3,6 +3,7 @@ The main entry point to run the dataflow graphs.
 """
 import argparse
 import time
+from contextlib import nullcontext
 import yaml
 import importlib.machinery
 
@@ -103,7 +104,7 @@ def print_dialog(dialog_id, dialogs):
             logger.info(d)
 
 
-def dialog(dialog_id, dialogs, d_context, draw_graph=True, p_expressions=None):
+def dialog(dialog_id, dialogs, d_context, draw_graph=True, p_expressions=None, turn_scope=None):
     """
     This main function gets P-exps as input, and executes them one by one.
     The input is taken from `dialogs` in `examples_file`.
@@ -117,6 +118,9 @@ def dialog(dialog_id, dialogs, d_context, draw_graph=True, p_expressions=None):
     :type draw_graph: bool
     :param p_expressions: a list of P-Expressions to run, if given, it will override `dialog_id`
     :type p_expressions: Optional[List[str]]
+    :param turn_scope: if given, each turn runs inside the context manager returned by `turn_scope()`
+    (e.g. `EnvironmentClass.turn`)
+    :type turn_scope: Optional[Callable[[], ContextManager]]
     :return: Tuple[Node, Optional[Exception]]
     :rtype: the generated graph and the exception, if exists
     """
@@ -144,38 +148,40 @@ def dialog(dialog_id, dialogs, d_context, draw_graph=True, p_expressions=None):
         if environment_definitions.clear_msg_each_turn:
             d_context.reset_messages()
 
-        # 2. construct new graph - perform SOME syntax checks on input program.
-        #    if something went wrong (which means natural language method sent a wrong sexp) -
-        #       no goal was added to the dialog (it was discarded) - user can't help resolve this
-        #    if no exception, then a goal has been added to the dialog
-        psexp = isexp
-        igl, ex = construct_graph(isexp, d_context, constr_tag=OUTLINE_SIMP, no_post_check=True)
-
-        # apply implicit accept suggestion if needed. This is when prev turn gave suggestions, and one of them was
-        #   marked as implicit-accept (SUGG_IMPL_AGR) (i.e. apply it if the user moves to another topic without
-        #   accept or reject)
-        # do this BEFORE transform_graph - since transform_graph may look at context.goals  (e.g. for side_task)
-        if d_context.prev_sugg_act:
-            j = [s[2:] for s in d_context.prev_sugg_act if s.startswith(SUGG_IMPL_AGR)]
-            if j and not isexp.startswith('AcceptSuggestion') and not isexp.startswith('RejectSuggestion'):
-                sx, ms = j[0], None
-                if SUGG_MSG in sx:
-                    s = sx.split(SUGG_MSG)
-                    sx, ms = s[0], s[1]
-                gl0, ex0 = construct_graph(sx, d_context)
-                if ex0 is None:
-                    if not gl.contradicting_commands(gl0):
-                        evaluate_graph(gl0)
-                        if ms:
-                            d_context.add_message(gl0, ms)
-
-        gl, ex = do_transform_graph(igl)  # for drawing without yield
-
-        check_constr_graph(gl)
-
-        # 3. evaluate graph
-        if ex is None:
-            ex = evaluate_graph(gl)  # send in previous graphs (before curr_graph added)
+        # the database connection (and any other resource of the turn) is held until the turn is evaluated
+        with (turn_scope() if turn_scope else nullcontext()):
+            # 2. construct new graph - perform SOME syntax checks on input program.
+            #    if something went wrong (which means natural language method sent a wrong sexp) -
+            #       no goal was added to the dialog (it was discarded) - user can't help resolve this
+            #    if no exception, then a goal has been added to the dialog
+            psexp = isexp
+            igl, ex = construct_graph(isexp, d_context, constr_tag=OUTLINE_SIMP, no_post_check=True)
+
+            # apply implicit accept suggestion if needed. This is when prev turn gave suggestions, and one of them was
+            #   marked as implicit-accept (SUGG_IMPL_AGR) (i.e. apply it if the user moves to another topic without
+            #   accept or reject)
+            # do this BEFORE transform_graph - since transform_graph may look at context.goals  (e.g. for side_task)
+            if d_context.prev_sugg_act:
+                j = [s[2:] for s in d_context.prev_sugg_act if s.startswith(SUGG_IMPL_AGR)]
+                if j and not isexp.startswith('AcceptSuggestion') and not isexp.startswith('RejectSuggestion'):
+                    sx, ms = j[0], None
+                    if SUGG_MSG in sx:
+                        s = sx.split(SUGG_MSG)
+                        sx, ms = s[0], s[1]
+                    gl0, ex0 = construct_graph(sx, d_context)
+                    if ex0 is None:
+                        if not gl.contradicting_commands(gl0):
+                            evaluate_graph(gl0)
+                            if ms:
+                                d_context.add_message(gl0, ms)
+
+            gl, ex = do_transform_graph(igl)  # for drawing without yield
+
+            check_constr_graph(gl)
+
+            # 3. evaluate graph
+            if ex is None:
+                ex = evaluate_graph(gl)  # send in previous graphs (before curr_graph added)
 
         # unless a continuation turn, save last exception (agent's last message + hints)
         d_context.set_prev_agent_turn(ex)
@@ -209,8 +215,8 @@ def main(dialog_id, dialogs, environment_class: EnvironmentClass,
         d_context = environment_class.get_new_context()
         environment_class.d_context = d_context
         with environment_class:
-            gl, ex = dialog(dialog_id, dialogs, d_context,
-                            draw_graph=draw_graph, p_expressions=p_expressions)
+            gl, ex = dialog(dialog_id, dialogs, d_context, draw_graph=draw_graph, p_expressions=p_expressions,
+                            turn_scope=environment_class.turn)
 
             if output_path:
                 from os.path import splitext
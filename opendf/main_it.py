@@ -4,6 +4,7 @@ The main entry point to run the dataflow graphs in an interactive way.
 import logging
 import sys
 import traceback
+from contextlib import nullcontext
 
 from opendf.applications.smcalflow.database import populate_stub_database, Database
 from opendf.applications.smcalflow.domain import fill_graph_db
@@ -157,7 +158,8 @@ def main():
                 else:
                     raise Exception(f"Command not found: {command_name}")
             else:
-                gl, ex = run_turn(read, dialog_context)
+                with (Database.get_instance().turn() if use_database else nullcontext()):
+                    gl, ex = run_turn(read, dialog_context)
                 if ex:
                     print(ex[-1].args[0], file=sys.stderr)
                 elif dialog_context.messages:
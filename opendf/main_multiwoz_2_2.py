@@ -4,8 +4,11 @@ Main class to run MultiWOZ 2.2 experiments.
 import argparse
 import json
 import logging
+import multiprocessing
 import os.path
 import time
+from collections import namedtuple
+from functools import lru_cache
 
 import yaml
 
@@ -15,12 +18,15 @@ from opendf.applications.multiwoz_2_2.conversion import convert_dialogue, conver
 from opendf.applications.multiwoz_2_2.nodes.multiwoz import MwozConversation, collect_last_state
 from opendf.applications.multiwoz_2_2.utils import TIME_REGEX
 from opendf.defs import LOG_LEVELS, config_log, EnvironmentDefinition, CONT_TURN, OUTLINE_SIMP, SUGG_IMPL_AGR, SUGG_MSG
+from opendf.defs import use_database, database_connection
 from opendf.exceptions import parse_node_exception, re_raise_exc, DFException
 from opendf.graph.constr_graph import construct_graph, check_constr_graph
 from opendf.graph.draw_graph import draw_all_graphs
 from opendf.graph.eval import evaluate_graph, check_dangling_nodes
 from opendf.graph.transform_graph import do_transform_graph
 from opendf.utils.arg_utils import add_environment_option
+from opendf.utils.database_utils import is_memory_database
+from opendf.utils.io import JsonSource, read_json_item
 from opendf.utils.simplify_exp import indent_sexp
 from opendf.utils.utils import to_list, flatten_list
 from opendf.defs import is_pos
@@ -45,11 +51,8 @@ def create_index(data_directory, folders):
                        os.listdir(os.path.join(data_directory, folder)))
         for file in files:
             file_path = os.path.join(data_directory, folder, file)
-            with open(file_path) as input_file:
-                dialogues = json.load(input_file)
-                for i, dialogue in enumerate(dialogues):
-                    dialogue_id = dialogue["dialogue_id"]
-                    index[dialogue_id] = {"file": file_path, "index": i}
+            for i, (dialogue_id, _, offset, length) in enumerate(JsonSource(file_path, key="dialogue_id").entries()):
+                index[dialogue_id] = {"file": file_path, "index": i, "offset": offset, "length": length}
 
     return index
 
@@ -60,7 +63,8 @@ def get_dialogue_index(dialogue_id, data_directory):
     if os.path.isfile(index_filepath):
         with open(index_filepath) as index_file:
             index = json.load(index_file)
-    if not index:
+    # the index files created before the byte offsets were added are created again
+    if not index or "offset" not in next(iter(index.values())):
         index = create_index(data_directory, DATA_FOLDERS)
         with open(index_filepath, 'w') as index_file:
             json.dump(index, index_file, indent=4)
@@ -74,13 +78,12 @@ def get_single_dialogue(dialogue_id, data_directory):
     dialogue_index = get_dialogue_index(dialogue_id, data_directory)
 
     if dialogue_index:
-        with open(dialogue_index["file"]) as input_file:
-            dialogues = json.load(input_file)
-            dialogue = dialogues[dialogue_index["index"]]
-            if dialogue["dialogue_id"] == dialogue_id:
-                return dialogue
-            else:
-                logger.warning(f"Index id does not match requested id, is the index file corrupted")
+        # reads only the dialogue, from its offset in the file
+        dialogue = read_json_item(dialogue_index["file"], dialogue_index["offset"], dialogue_index["length"])
+        if dialogue["dialogue_id"] == dialogue_id:
+            return dialogue
+        else:
+            logger.warning(f"Index id does not match requested id, is the index file corrupted")
     else:
         logger.warning("Could not find MultiWOZ 2.2 dialogue %s in %s", dialogue_id, data_directory)
 
@@ -88,22 +91,20 @@ def get_single_dialogue(dialogue_id, data_directory):
 
 
 def find_dialogue(dialogue_id, data_directory):
-    results = []
+    """
+    Yields the dialogue of the id, or the dialogues of a data folder (e.g. `dev`), which are read one at a time.
+    """
     if dialogue_id in DATA_FOLDERS:
         folder = dialogue_id
         files = filter(lambda x: x.endswith('.json'),
                        os.listdir(os.path.join(data_directory, folder)))
         for file in files:
             file_path = os.path.join(data_directory, folder, file)
-            with open(file_path) as input_file:
-                dialogues = json.load(input_file)
-                results.extend(dialogues)
+            yield from JsonSource(file_path)
     else:
         single_dialogue = get_single_dialogue(dialogue_id, data_directory)
         if single_dialogue:
-            results.append(single_dialogue)
-
-    return results
+            yield single_dialogue
 
 
 def create_arguments_parser():
@@ -206,6 +207,12 @@ def create_arguments_parser():
         help=f"Stop execution on non-DF exceptions"
     )
 
+    parser.add_argument(
+        "--jobs", "-j", metavar="jobs", type=int, required=False, default=1,
+        help="number of processes to run the dialogues; the results are written in the same order as with a single "
+             "process. More than one process requires the in memory database"
+    )
+
     parser = add_environment_option(parser)
 
     return parser
@@ -513,24 +520,29 @@ def main(dialogue, environment_class: EnvironmentClass, draw_graph=True, load_se
         raise e
 
 
-def append_dialogue_act(dialogues, data_dir):
+@lru_cache(maxsize=None)
+def get_dialogue_acts(data_dir):
+    """
+    Gets the source of the dialog acts of the dialogues, which reads the dialog acts of a dialogue on demand.
+    """
     acts_filepath = os.path.join(data_dir, "dialog_acts.json")
     if not os.path.isfile(acts_filepath):
         raise FileNotFoundError(f"Could not find the dialog_acts.json in {data_dir}")
 
-    with open(acts_filepath) as acts_file:
-        dialog_acts = json.load(acts_file)
-        for dialogue in dialogues:
-            dialogue_id = dialogue["dialogue_id"]
-            dialog_act = dialog_acts.get(dialogue_id)
-            if not dialog_act:
-                continue
+    return JsonSource(acts_filepath)
+
+
+def append_dialogue_act(dialogues, data_dir):
+    dialog_acts = get_dialogue_acts(data_dir)
+    for dialogue in dialogues:
+        dialogue_id = dialogue["dialogue_id"]
+        dialog_act = dialog_acts.get(dialogue_id)
+        if dialog_act:
             for turn in dialogue["turns"]:
                 turn_act = dialog_act.get(turn["turn_id"])
                 if turn_act:
                     turn["dialog_act"] = turn_act
-
-    return dialogues
+        yield dialogue
 
 
 # annotation patch file - has lines of the format:
@@ -548,6 +560,217 @@ def load_patch(nm):
             patch[n+'_'+s[1]] = ' '.join(s[2:])
     return patch
 
+# the result of a dialogue, as written to the output files: `text` goes to the good (or bad) dialogue file, and
+#   `expressions` (if any) to the good (or bad) jsonl file. `error` is the exception which should stop the execution
+DialogueResult = namedtuple("DialogueResult",
+                            ["dialogue_id", "good", "text", "expressions", "state", "error", "turns"])
+
+
+def run_dialogue(dialogue, environment_class, draw_graph=False, load_services=None, use_dialog_act=False,
+                 patch=None, write_state=False, stop_on_exc=False):
+    """
+    Runs a dialogue and formats its result for the output files.
+
+    :param dialogue: the dialogue, in MultiWOZ 2.2 format
+    :type dialogue: Dict
+    :param environment_class: the environment
+    :type environment_class: EnvironmentClass
+    :param write_state: if `True`, keeps the DF state of the dialogue in the result
+    :type write_state: bool
+    :param stop_on_exc: if `True`, a non-DF exception is kept in the result, so the execution can be stopped
+    :type stop_on_exc: bool
+    :return: the result of the dialogue
+    :rtype: DialogueResult
+    """
+    dialogue_id = dialogue['dialogue_id']
+    d_id = dialogue_id.split('.')[0]
+    turns = len(dialogue['turns']) // 2
+    save_state = {} if write_state else None
+    try:
+        _, _, conversion_problems, execution_problems, expressions, answers = main(
+            dialogue, environment_class, draw_graph=draw_graph, load_services=load_services,
+            use_dialog_act=use_dialog_act, patch=patch, save_state=save_state)
+    except Exception as ex:
+        logger.warning("Error during execution of dialogue %s: %s", dialogue_id, ex)
+        text = f"Dialogue {dialogue_id}:\n\tError: {ex}\n"
+        error = ex if stop_on_exc and not isinstance(ex, DFException) else None
+        return DialogueResult(dialogue_id, False, text, None, save_state.get(dialogue_id) if write_state else None,
+                              error, turns)
+
+    good = not conversion_problems and not execution_problems
+    lines = [f"Dialogue {dialogue_id}: OK!\n" if good else f"Dialogue {dialogue_id}:\n"]
+    # todo - add user/text
+    lines.append(f"\tExpressions:\n")
+    for ie, expression in enumerate(expressions):
+        lines.append('\t\t%d. %s\n' % (ie * 2, dialogue['turns'][ie * 2]['utterance']))
+        lines.append('\t\t%s\n' % expression)
+        lines.append('\t\t   %s\n' % dialogue['turns'][ie * 2 + 1]['utterance'])
+        lines.append('\t\t     < %s >\n' % answers[ie])
+    if conversion_problems:
+        lines.append(f"\tConversion Problems:\n")
+        for conversion_problem in conversion_problems:
+            lines.append("\t\t%s\n" % conversion_problem)
+    if execution_problems:
+        lines.append(f"\tExecution Problems:\n")
+        for execution_problem in execution_problems:
+            lines.append("\t\t<PROB> %s  %s\n" % (d_id, execution_problem))
+    if not good:
+        lines.append("\n")
+
+    expressions = {"dialogue_id": dialogue_id, "expressions": expressions} if good or expressions else None
+    return DialogueResult(dialogue_id, good, "".join(lines), expressions,
+                          save_state.get(dialogue_id) if write_state else None, None, turns)
+
+
+def write_dialogue_result(result, good_file, bad_file, json_file, json_bad_file):
+    """
+    Writes the result of a dialogue to the output files.
+    """
+    if result.good:
+        good_file.write(result.text)
+    else:
+        bad_file.write(result.text)
+    if result.expressions is not None:
+        output_file = json_file if result.good else json_bad_file
+        json.dump(result.expressions, output_file)
+        output_file.write("\n")
+
+
+# the state of a worker process of the parallel runner: a warm environment, reused by all its dialogues
+_worker = {}
+
+
+def init_worker(config, log_level, environment_values, options):
+    """
+    Initializes a worker process of the parallel runner.
+
+    The worker loads the application and enters its environment once, and keeps the environment warm (see
+    `EnvironmentClass.keep_warm`) for all the dialogues the worker runs.
+
+    :param config: the path of the configuration file of the application
+    :type config: str
+    :param log_level: the level of the logging
+    :type log_level: str
+    :param environment_values: the values of the environment definitions, set by the main process
+    :type environment_values: Dict[str, Any]
+    :param options: the options of `run_dialogue`
+    :type options: Dict[str, Any]
+    """
+    config_log(level=log_level)
+    for key, value in environment_values.items():
+        setattr(environment_definitions, key, value)
+    application_config = yaml.load(open(config, 'r'), Loader=yaml.UnsafeLoader)
+    environment_class = application_config["environment_class"]
+    environment_class.keep_warm = True
+    environment_class.d_context = environment_class.get_new_context()
+    environment_class.domains = options.get("load_services") or set()
+    with environment_class:
+        pass
+    _worker["environment_class"] = environment_class
+    _worker["options"] = options
+
+
+def run_worker_dialogue(dialogue):
+    """
+    Runs a dialogue in a worker process of the parallel runner.
+    """
+    result = run_dialogue(dialogue, _worker["environment_class"], **_worker["options"])
+    if result.error is not None:
+        # the exception might not be picklable, the main process only needs its description
+        result = result._replace(error=RuntimeError(
+            f"Error during execution of dialogue {result.dialogue_id}: {result.error!r}"))
+    return result
+
+
+def run_dialogues(dialogues, jobs, config, environment_class, log_level, **options):
+    """
+    Runs the dialogues, in `jobs` processes.
+
+    The results are yielded in the order of the dialogues, regardless of the number of processes, so the output files
+    are the same. The environment of each process is kept warm between the dialogues.
+
+    Each process has its own database, so more than one process requires the in memory database: with a database file,
+    the processes would share it - each one would load the data again over the data of the others, and cleaning the
+    database would remove the data the others are still using.
+
+    :param dialogues: the dialogues
+    :type dialogues: Iterable[Dict]
+    :param jobs: the number of processes
+    :type jobs: int
+    :param config: the path of the configuration file of the application, used to load it in the worker processes
+    :type config: str
+    :param environment_class: the environment, used when `jobs` is 1
+    :type environment_class: EnvironmentClass
+    :param log_level: the level of the logging of the worker processes
+    :type log_level: str
+    :param options: the options of `run_dialogue`
+    :type options: Any
+    :return: the results of the dialogues
+    :rtype: Iterator[DialogueResult]
+    """
+    if jobs <= 1:
+        return run_dialogues_in_process(dialogues, environment_class, **options)
+    if use_database and not is_memory_database(database_connection):
+        raise ValueError(f"Running the dialogues in {jobs} processes requires the in memory database, "
+                         f"the database is {database_connection}")
+    return run_dialogues_in_pool(dialogues, jobs, config, log_level, **options)
+
+
+def run_dialogues_in_process(dialogues, environment_class, **options):
+    """
+    Runs the dialogues in the current process.
+    """
+    environment_class.keep_warm = True
+    try:
+        for dialogue in dialogues:
+            yield run_dialogue(dialogue, environment_class, **options)
+    finally:
+        environment_class.cool_down()
+
+
+def run_dialogues_in_pool(dialogues, jobs, config, log_level, **options):
+    """
+    Runs the dialogues in a pool of `jobs` worker processes.
+
+    The workers are started with "spawn", so they do not inherit the database connections of the current process.
+    """
+    environment_values = dict(vars(environment_definitions))
+    with multiprocessing.get_context("spawn").Pool(jobs, initializer=init_worker,
+                                                   initargs=(config, log_level, environment_values, options)) as pool:
+        yield from pool.imap(run_worker_dialogue, dialogues)
+
+
+def select_dialogues(id_arg, data_dir, services, service_and=False, service_exact=False, start_from=None,
+                     use_dialog_act=False):
+    """
+    Yields the dialogues to be run.
+    """
+    saw_start_from = False
+    for i in id_arg:
+        dialogues = find_dialogue(i, data_dir)
+        if use_dialog_act:
+            dialogues = append_dialogue_act(dialogues, data_dir)
+        for dialogue in dialogues:
+            d_id = dialogue['dialogue_id'].split('.')[0]
+            if start_from:
+                if d_id == start_from:
+                    saw_start_from = True
+                if not saw_start_from:
+                    continue
+            # some dialogues do not have the dialogue["service"] information,
+            # resulting in an empty dialogue["service"]. For now, we filter those out,
+            # but we might want to include then in the future
+            # if not dialogue["services"] or not services.issuperset(dialogue["services"]):
+            if service_and and not all([i in dialogue["services"] for i in services]):
+                continue
+            if service_exact and (len(services)!=len(dialogue["services"]) or \
+                    not all([i in dialogue["services"] for i in services])):
+                continue
+            if not services.issuperset(dialogue["services"]):
+                continue
+            yield dialogue
+
+
 if __name__ == '__main__':
     start = time.time()
     try:
@@ -577,7 +800,8 @@ if __name__ == '__main__':
         start_from = arguments.start_from
         stop_on_exc = arguments.stop_exc
         write_state = arguments.write_state
-        draw_graph = draw_graph and single_dialog  # disable draw unless single dialog
+        jobs = arguments.jobs
+        draw_graph = draw_graph and single_dialog and jobs <= 1  # disable draw unless single dialog
         patch = arguments.patch
         patch = load_patch(patch) if patch else None
         save_state = {} if write_state else None
@@ -597,89 +821,26 @@ if __name__ == '__main__':
         bad_dialogues = 0
         n_turns = 0
 
-        saw_start_from = False
         with open(good_output_path, "w") as good_file, open(bad_output_path, "w") as bad_file, open(
                 json_output_path, "w") as json_file, open(json_bad_output_path, "w") as json_file_bad:
-            for i in id_arg:
-                dialogues = find_dialogue(i, data_dir)
-                if use_dialog_act:
-                    dialogues = append_dialogue_act(dialogues, data_dir)
-                for dialogue in dialogues:
-                    d_id = dialogue['dialogue_id'].split('.')[0]
-                    if start_from:
-                        if d_id == start_from:
-                            saw_start_from = True
-                        if not saw_start_from:
-                            continue
-                    try:
-                        # some dialogues do not have the dialogue["service"] information,
-                        # resulting in an empty dialogue["service"]. For now, we filter those out,
-                        # but we might want to include then in the future
-                        # if not dialogue["services"] or not services.issuperset(dialogue["services"]):
-                        if service_and and not all([i in dialogue["services"] for i in services]):
-                            continue
-                        if service_exact and (len(services)!=len(dialogue["services"]) or \
-                                not all([i in dialogue["services"] for i in services])):
-                            continue
-                        if not services.issuperset(dialogue["services"]):
-                            continue
-                        n_turns += len(dialogue['turns'])//2
-                        _, _, conversion_problems, execution_problems, expressions, answers = main(
-                            dialogue, application_config["environment_class"], draw_graph=draw_graph,
-                            load_services=load_services, use_dialog_act=use_dialog_act, patch=patch,
-                            save_state=save_state)
-
-                        if not conversion_problems and not execution_problems:
-                            good_file.write(f"Dialogue {dialogue['dialogue_id']}: OK!\n")
-                            # todo - add user/text
-                            good_file.write(f"\tExpressions:\n")
-                            for ie, expression in enumerate(expressions):
-                                good_file.write('\t\t%d. %s\n' % (ie * 2, dialogue['turns'][ie * 2]['utterance']))
-                                good_file.write('\t\t%s\n' % expression)
-                                good_file.write('\t\t   %s\n' % dialogue['turns'][ie * 2 + 1]['utterance'])
-                                good_file.write('\t\t     < %s >\n' % answers[ie])
-
-                            json.dump({"dialogue_id": dialogue["dialogue_id"], "expressions": expressions}, json_file)
-                            json_file.write("\n")
-                            good_dialogues += 1
-                        else:
-                            if expressions:
-                                json.dump({"dialogue_id": dialogue["dialogue_id"], "expressions": expressions}, json_file_bad)
-                                json_file_bad.write("\n")
-                            bad_file.write(f"Dialogue {dialogue['dialogue_id']}:\n")
-                            # todo - add user/text
-                            bad_file.write(f"\tExpressions:\n")
-                            for ie, expression in enumerate(expressions):
-                                bad_file.write('\t\t%d. %s\n' % (ie * 2, dialogue['turns'][ie * 2]['utterance']))
-                                bad_file.write('\t\t%s\n' % expression)
-                                bad_file.write('\t\t   %s\n' % dialogue['turns'][ie * 2 + 1]['utterance'])
-                                bad_file.write('\t\t     < %s >\n' % answers[ie])
-                            if conversion_problems:
-                                bad_file.write(f"\tConversion Problems:\n")
-                                for conversion_problem in conversion_problems:
-                                    bad_file.write("\t\t")
-                                    bad_file.write(conversion_problem)
-                                    bad_file.write("\n")
-                            if execution_problems:
-                                bad_file.write(f"\tExecution Problems:\n")
-                                for execution_problem in execution_problems:
-                                    bad_file.write("\t\t<PROB> %s  " % d_id)
-                                    bad_file.write(execution_problem)
-                                    bad_file.write("\n")
-                            bad_file.write("\n")
-                            bad_dialogues += 1
-                    except Exception as ex:
-                        logger.warning("Error during execution of dialogue %s: %s",
-                                       dialogue['dialogue_id'], ex)
-                        bad_file.write(f"Dialogue {dialogue['dialogue_id']}:\n")
-                        bad_file.write(f"\tError: {ex}\n")
-                        # bad_file.write(f"\t\t")
-                        # bad_file.write(traceback.format_exc().replace("\n", "\n\t\t").strip())
-                        # bad_file.write("\n")
-                        # bad_file.write("\n")
-                        bad_dialogues += 1
-                        if stop_on_exc and not isinstance(ex, DFException):
-                            re_raise_exc(ex)
+            selected_dialogues = select_dialogues(
+                id_arg, data_dir, services, service_and=service_and, service_exact=service_exact,
+                start_from=start_from, use_dialog_act=use_dialog_act)
+            results = run_dialogues(
+                selected_dialogues, jobs, arguments.config, application_config["environment_class"],
+                arguments.log, draw_graph=draw_graph, load_services=load_services, use_dialog_act=use_dialog_act,
+                patch=patch, write_state=write_state is not None, stop_on_exc=stop_on_exc)
+            for result in results:
+                write_dialogue_result(result, good_file, bad_file, json_file, json_file_bad)
+                n_turns += result.turns
+                if save_state is not None and result.state is not None:
+                    save_state[result.dialogue_id] = result.state
+                if result.good:
+                    good_dialogues += 1
+                else:
+                    bad_dialogues += 1
+                if result.error is not None:
+                    re_raise_exc(result.error)
 
             good_file.write(f"\nTotal of good dialogues: {good_dialogues}\n")
             bad_file.write(f"\nTotal of bad dialogues: {bad_dialogues}\n")
@@ -0,0 +1,143 @@
+"""
+Compares the binary serialization of the dialog context (`DialogContext.dumps` / `loads`) with the P-expression one
+(`DialogContext.pack_context` / `unpack_context`) - size and time, for SMCalFlow (the example dialogues, also joined
+into one long dialogue) and for MultiWOZ 2.2 dialogues.
+"""
+import argparse
+import logging
+import pickle
+import time
+from copy import copy
+
+import yaml
+
+from opendf.defs import LOG_LEVELS, config_log
+from opendf.graph.dialog_context import DialogContext
+from opendf.misc.node_memory import smcalflow_contexts, multiwoz_contexts
+
+logger = logging.getLogger(__name__)
+
+
+def smcalflow_long_contexts(environment_class, repeat):
+    """
+    Runs the SMCalFlow example dialogues joined into one dialogue, `repeat` times, yields the context of the dialogue.
+    """
+    from opendf.examples.main_examples import dialogs
+    from opendf.main import dialog
+
+    turns = [turn for d in dialogs for turn in d] * repeat
+    d_context = environment_class.get_new_context()
+    environment_class.d_context = d_context
+    with environment_class:
+        dialog(0, [turns], d_context, draw_graph=False)
+    yield d_context
+
+
+def measure(d_context, repeat=5):
+    """
+    Measures both serializations of the context.
+
+    :return: the sizes (in bytes) and the times (in seconds, to save and restore the context) of the P-expression
+    and of the binary serializations
+    :rtype: Tuple[int, int, float, float]
+    """
+    # `pack_context` can not copy some of the exceptions, the comparison is on the graph only
+    d_context = copy(d_context)
+    d_context.exceptions = []
+    node = d_context.goals[0]  # `unpack_context` needs a node, to construct the graphs
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        packed = pickle.dumps(d_context.pack_context(DialogContext()), protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.loads(packed).unpack_context(node, DialogContext())
+    pack_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = d_context.dumps()
+        DialogContext.loads(data)
+    binary_time = (time.perf_counter() - start) / repeat
+
+    return len(packed), len(data), pack_time, binary_time
+
+
+def create_arguments_parser():
+    """
+    Creates the argument parser for the file.
+
+    :return: the argument parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description="Compares the binary and the P-expression serializations of the dialog context.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "--config", "-c", metavar="config", type=str, required=False, default="resources/smcalflow_config.yaml",
+        help="the configuration file for the application (SMCalFlow or MultiWOZ 2.2)"
+    )
+
+    parser.add_argument(
+        "--data_dir", "-i", metavar="data_dir", type=str, required=False, default="tmp/multiwoz_2_2",
+        help="MultiWOZ 2.2 data directory (for MultiWOZ only)"
+    )
+
+    parser.add_argument(
+        "--dialog_id", "-d", metavar="dialog_id", type=str, required=False, default=["dev"], nargs="+",
+        help="a list of dialogue ids, or the name of a dialogue folder (for MultiWOZ only)"
+    )
+
+    parser.add_argument(
+        "--repeat", "-r", metavar="repeat", type=int, required=False, default=3,
+        help="the number of times the SMCalFlow example dialogues are repeated in the long dialogue"
+    )
+
+    parser.add_argument(
+        "--log", "-log", metavar="log", type=str, required=False, default="WARNING",
+        choices=LOG_LEVELS.keys(),
+        help=f"The level of the logging, possible values are: {list(LOG_LEVELS.keys())}"
+    )
+
+    return parser
+
+
+def report(name, contexts):
+    n_dialogues, n_nodes = 0, 0
+    pack_size, binary_size, pack_time, binary_time = 0, 0, 0.0, 0.0
+    for d_context in contexts:
+        if not d_context.goals:
+            continue
+        n_dialogues += 1
+        n_nodes += len(d_context.idx_to_node)
+        measures = measure(d_context)
+        pack_size += measures[0]
+        binary_size += measures[1]
+        pack_time += measures[2]
+        binary_time += measures[3]
+    print(f"{name}: dialogues: {n_dialogues}, nodes: {n_nodes}")
+    print(f"\tpack_context: {pack_size} bytes, {pack_time * 1000:.1f} ms")
+    print(f"\tbinary: {binary_size} bytes, {binary_time * 1000:.1f} ms")
+
+
+def main(environment_class, data_dir=None, dialog_ids=None, repeat=3):
+    from opendf.applications import MultiWOZEnvironment_2_2
+
+    if isinstance(environment_class, MultiWOZEnvironment_2_2):
+        report("MultiWOZ 2.2", multiwoz_contexts(environment_class, data_dir, dialog_ids))
+    else:
+        report("SMCalFlow examples", smcalflow_contexts(environment_class))
+        report(f"SMCalFlow examples, joined {repeat} times", smcalflow_long_contexts(environment_class, repeat))
+
+
+if __name__ == "__main__":
+    try:
+        parser = create_arguments_parser()
+        arguments = parser.parse_args()
+        config_log(arguments.log)
+        application_config = yaml.load(open(arguments.config, 'r'), Loader=yaml.UnsafeLoader)
+        main(application_config["environment_class"], arguments.data_dir, arguments.dialog_id, arguments.repeat)
+    except Exception as e:
+        raise e
+    finally:
+        logging.shutdown()
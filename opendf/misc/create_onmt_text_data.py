@@ -16,6 +16,8 @@ from tqdm import tqdm
 from dataflow.core.constants import SpecialStrings
 from dataflow.core.dialogue import Dialogue, Turn, TurnId
 
+from opendf.utils.io import JsonlSource
+
 
 simplify=True
 
@@ -246,9 +248,9 @@ def main(
 ) -> None:
     fps = OnmtTextDatum.create_output_files(onmt_text_data_outbase)
 
-    for line in tqdm(open(dataflow_dialogues_jsonl), unit=" dialogues"):
+    for item in tqdm(JsonlSource(dataflow_dialogues_jsonl), unit=" dialogues"):
         dialogue: Dialogue
-        dialogue = jsons.loads(line.strip(), Dialogue)
+        dialogue = jsons.load(item, Dialogue)
 
         for onmt_text_datum in create_onmt_text_data_for_dialogue(
             dialogue=dialogue,
@@ -0,0 +1,113 @@
+"""
+Stress test of the node registration and id allocation of the dialog context (`DialogContext.register_node`).
+
+The nodes are only given ids, so plain objects are registered instead of graph nodes (creating graph nodes would take
+most of the time).
+"""
+import argparse
+import time
+
+from opendf.graph.dialog_context import DialogContext
+
+
+class IdHolder:
+    """
+    The fields of a node which are used by `DialogContext.register_node`.
+    """
+    __slots__ = ("id", "context")
+
+    def __init__(self):
+        self.id = None
+        self.context = None
+
+
+def register_and_discard(n_nodes, turn_size):
+    """
+    Registers `n_nodes` nodes, discarding the nodes (clearing the context) every `turn_size` nodes.
+    """
+    d_context = DialogContext()
+    for i in range(n_nodes):
+        if i % turn_size == 0:
+            d_context.clear()
+        d_context.register_node(IdHolder())
+
+
+def register_after_hidden_nodes(n_nodes, n_hidden):
+    """
+    Hides `n_hidden` nodes at high ids (as `fill_graph_db` does for the nodes of the database), then registers
+    `n_nodes` nodes, from id 0 - past the hidden ones.
+    """
+    d_context = DialogContext()
+    d_context.set_next_node_id(n_nodes // 2)
+    for _ in range(n_hidden):
+        d_context.register_node(IdHolder())
+    d_context.set_next_node_id(0)
+    for _ in range(n_nodes):
+        d_context.register_node(IdHolder())
+
+
+def register_with_renumbering(n_nodes, query_every):
+    """
+    Registers `n_nodes` nodes, each one renumbered to a higher id (leaving a hole), and asks for the highest id every
+    `query_every` nodes.
+    """
+    d_context = DialogContext()
+    for i in range(n_nodes):
+        node = IdHolder()
+        d_context.register_node(node)
+        d_context.register_node(node, renumber=n_nodes + 2 * i)
+        if i % query_every == 0:
+            d_context.get_highest_node_id()
+
+
+def create_arguments_parser():
+    """
+    Creates the argument parser for the file.
+
+    :return: the argument parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description="Stress test of the node registration and id allocation of the dialog context.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "--nodes", "-n", metavar="nodes", type=int, required=False, default=1000000,
+        help="the number of nodes registered by each scenario"
+    )
+
+    parser.add_argument(
+        "--turn_size", "-t", metavar="turn_size", type=int, required=False, default=10000,
+        help="the number of nodes registered before the context is cleared"
+    )
+
+    parser.add_argument(
+        "--hidden", "-d", metavar="hidden", type=int, required=False, default=1000,
+        help="the number of hidden nodes (e.g. database nodes), at high ids"
+    )
+
+    parser.add_argument(
+        "--query_every", "-q", metavar="query_every", type=int, required=False, default=1000,
+        help="the number of renumbered nodes between the queries of the highest id"
+    )
+
+    return parser
+
+
+def main(n_nodes, turn_size, n_hidden, query_every):
+    scenarios = [
+        (f"register and discard every {turn_size}", register_and_discard, turn_size),
+        (f"register past {n_hidden} hidden nodes", register_after_hidden_nodes, n_hidden),
+        (f"renumber, highest id every {query_every}", register_with_renumbering, query_every),
+    ]
+    for name, function, argument in scenarios:
+        start = time.perf_counter()
+        function(n_nodes, argument)
+        duration = time.perf_counter() - start
+        print(f"{name}: {n_nodes} nodes, {duration:.2f} s ({duration / n_nodes * 1e9:.0f} ns per node)")
+
+
+if __name__ == "__main__":
+    arguments = create_arguments_parser().parse_args()
+    main(arguments.nodes, arguments.turn_size, arguments.hidden, arguments.query_every)
@@ -0,0 +1,149 @@
+"""
+Measures the memory used by the nodes of dialogues - reports bytes per node for SMCalFlow (the example dialogues)
+and for MultiWOZ 2.2 dialogues.
+"""
+import argparse
+import gc
+import logging
+import sys
+from enum import Enum
+from types import ModuleType, FunctionType, MethodType, BuiltinFunctionType
+
+import yaml
+
+from opendf.defs import LOG_LEVELS, config_log
+from opendf.graph.dialog_context import DialogContext
+from opendf.graph.nodes.node import Node
+
+logger = logging.getLogger(__name__)
+
+# objects which are not owned by a node - not counted
+NOT_OWNED = (Node, DialogContext, type, ModuleType, FunctionType, MethodType, BuiltinFunctionType, Enum)
+
+
+def node_memory(nodes):
+    """
+    Estimates the memory held by `nodes` - the size of the node objects, and of all the objects they (transitively)
+    refer to, excluding other nodes, the dialog context, types, functions and modules.
+    Objects which are shared between nodes (e.g. signatures) are counted once.
+
+    :param nodes: the nodes
+    :type nodes: List[Node]
+    :return: the total size, in bytes
+    :rtype: int
+    """
+    seen = {id(n) for n in nodes}
+    total = 0
+    stack = []
+    for n in nodes:
+        getattr(n, '__dict__', None)  # the attributes dict may be kept inline - make it a real dict, so it is counted
+        total += sys.getsizeof(n)
+        stack.extend(gc.get_referents(n))
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, NOT_OWNED):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        stack.extend(gc.get_referents(o))
+    return total
+
+
+def smcalflow_contexts(environment_class):
+    """
+    Runs the SMCalFlow example dialogues, yields the context of each dialogue.
+    """
+    from opendf.examples.main_examples import dialogs
+    from opendf.main import dialog
+
+    environment_class.keep_warm = True
+    for i in range(len(dialogs)):
+        d_context = environment_class.get_new_context()
+        environment_class.d_context = d_context
+        with environment_class:
+            dialog(i, dialogs, d_context, draw_graph=False)
+        yield d_context
+
+
+def multiwoz_contexts(environment_class, data_dir, dialog_ids):
+    """
+    Runs the MultiWOZ 2.2 dialogues, yields the context of each dialogue.
+    """
+    from opendf.main_multiwoz_2_2 import find_dialogue, dialog
+
+    environment_class.keep_warm = True
+    for i in dialog_ids:
+        for dialogue in find_dialogue(i, data_dir):
+            d_context = environment_class.get_new_context()
+            environment_class.d_context = d_context
+            environment_class.domains = dialogue["services"]
+            with environment_class:
+                dialog(dialogue, d_context, draw_graph=False)
+            yield d_context
+
+
+def create_arguments_parser():
+    """
+    Creates the argument parser for the file.
+
+    :return: the argument parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description="Reports the memory used by the nodes of dialogues (bytes per node).",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "--config", "-c", metavar="config", type=str, required=False, default="resources/smcalflow_config.yaml",
+        help="the configuration file for the application (SMCalFlow or MultiWOZ 2.2)"
+    )
+
+    parser.add_argument(
+        "--data_dir", "-i", metavar="data_dir", type=str, required=False, default="tmp/multiwoz_2_2",
+        help="MultiWOZ 2.2 data directory (for MultiWOZ only)"
+    )
+
+    parser.add_argument(
+        "--dialog_id", "-d", metavar="dialog_id", type=str, required=False, default=["dev"], nargs="+",
+        help="a list of dialogue ids, or the name of a dialogue folder (for MultiWOZ only)"
+    )
+
+    parser.add_argument(
+        "--log", "-log", metavar="log", type=str, required=False, default="WARNING",
+        choices=LOG_LEVELS.keys(),
+        help=f"The level of the logging, possible values are: {list(LOG_LEVELS.keys())}"
+    )
+
+    return parser
+
+
+def main(environment_class, data_dir=None, dialog_ids=None):
+    from opendf.applications import MultiWOZEnvironment_2_2
+
+    if isinstance(environment_class, MultiWOZEnvironment_2_2):
+        contexts = multiwoz_contexts(environment_class, data_dir, dialog_ids)
+    else:
+        contexts = smcalflow_contexts(environment_class)
+
+    n_dialogues, n_nodes, n_bytes = 0, 0, 0
+    for d_context in contexts:
+        nodes = list(d_context.idx_to_node.values())
+        n_dialogues += 1
+        n_nodes += len(nodes)
+        n_bytes += node_memory(nodes)
+    print(f"dialogues: {n_dialogues}, nodes: {n_nodes}, bytes: {n_bytes}, "
+          f"bytes per node: {n_bytes / n_nodes if n_nodes else 0:.1f}")
+
+
+if __name__ == "__main__":
+    try:
+        parser = create_arguments_parser()
+        arguments = parser.parse_args()
+        config_log(arguments.log)
+        application_config = yaml.load(open(arguments.config, 'r'), Loader=yaml.UnsafeLoader)
+        main(application_config["environment_class"], arguments.data_dir, arguments.dialog_id)
+    except Exception as e:
+        raise e
+    finally:
+        logging.shutdown()
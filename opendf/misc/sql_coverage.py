@@ -0,0 +1,67 @@
+"""
+Reports which node types of an application implement `generate_sql_where`.
+
+A constraint which contains a node without `generate_sql_where` can not be translated into SQL, and the search falls
+back to scan the whole table (see `opendf.utils.database_utils.SQLFallbackRecorder`).
+"""
+import argparse
+import logging
+
+import yaml
+
+from opendf.graph.node_factory import NodeFactory
+from opendf.utils.database_utils import sql_coverage_report
+
+logger = logging.getLogger(__name__)
+
+
+def create_arguments_parser():
+    """
+    Creates the argument parser for the file.
+
+    :return: the argument parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description="Reports which node types of an application implement `generate_sql_where`.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "--config", "-c", metavar="config", type=str, required=False, default="resources/smcalflow_config.yaml",
+        help="the configuration file for the application"
+    )
+
+    parser.add_argument(
+        "--covered", action="store_true",
+        help="also list the types which implement `generate_sql_where`"
+    )
+
+    return parser
+
+
+def main(config, show_covered=False):
+    application_config = yaml.load(open(config, 'r'), Loader=yaml.UnsafeLoader)
+    environment_class = application_config["environment_class"]
+    environment_class.load_node_factory()
+    covered, missing = sql_coverage_report(NodeFactory.get_instance().node_types)
+
+    total = len(covered) + len(missing)
+    print(f"{len(covered)} of {total} node types implement generate_sql_where")
+    if show_covered:
+        print("\nwith generate_sql_where:")
+        for name in covered:
+            print(f"\t{name}")
+    print("\nwithout generate_sql_where:")
+    for name in missing:
+        print(f"\t{name}")
+
+
+if __name__ == "__main__":
+    try:
+        arguments = create_arguments_parser().parse_args()
+        main(arguments.config, arguments.covered)
+    except Exception as e:
+        raise e
+    finally:
+        logging.shutdown()
@@ -0,0 +1,96 @@
+"""
+Reports the time of the fixed startup costs of an application (imports, parser and node factory setup, environment
+setup) - the costs which dominate short runs (e.g. `main.py -e ...`).
+
+Should be run in a new process, since modules which were already imported are not measured.
+"""
+import argparse
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+FIRST_EXPRESSION = "Yield(Event(subject=meeting, attendees=SET(Attendee(id=1), Attendee(id=2)), ^tag=1))"
+SECOND_EXPRESSION = "refer(Recipient?(name=LIKE(PersonName(John))))"
+
+
+class StartupTimer:
+    """
+    Measures the time of consecutive startup steps.
+    """
+
+    def __init__(self):
+        self.steps = []  # list of (step name, time in seconds)
+        self.last = time.perf_counter()
+
+    def step(self, name):
+        """
+        Ends the current step - its time is the time since the end of the previous step.
+        """
+        now = time.perf_counter()
+        self.steps.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        total = sum(t for _, t in self.steps)
+        lines = [f"{name:<40} {1000 * t:10.1f} ms" for name, t in self.steps]
+        lines.append(f"{'total':<40} {1000 * total:10.1f} ms")
+        return "\n".join(lines)
+
+
+def create_arguments_parser():
+    """
+    Creates the argument parser for the file.
+
+    :return: the argument parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description="Reports the time of the startup steps of an application.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "--config", "-c", metavar="config", type=str, required=False, default="resources/smcalflow_config.yaml",
+        help="the configuration file for the application"
+    )
+
+    return parser
+
+
+def main(config):
+    timer = StartupTimer()
+    from opendf.parser import pexp_parser
+    timer.step("import parser")
+    pexp_parser.parse_p_expressions(FIRST_EXPRESSION, use_cache=False)
+    timer.step("first parse (creates the parser)")
+    pexp_parser.parse_p_expressions(SECOND_EXPRESSION, use_cache=False)
+    timer.step("second parse")
+
+    import yaml
+    import opendf.main
+    timer.step("import application modules")
+    application_config = yaml.load(open(config, 'r'), Loader=yaml.UnsafeLoader)
+    environment_class = application_config["environment_class"]
+    timer.step("load configuration")
+    environment_class.load_node_factory()
+    timer.step("load node factory")
+    d_context = environment_class.get_new_context()
+    environment_class.d_context = d_context
+    with environment_class:
+        timer.step("environment setup (reloads the node factory)")
+    timer.step("environment teardown")
+
+    print(timer.report())
+    if not pexp_parser.tables_up_to_date():
+        print("the parser tables are out of date - regenerate them with: python -m opendf.parser.pexp_parser")
+
+
+if __name__ == "__main__":
+    try:
+        arguments = create_arguments_parser().parse_args()
+        main(arguments.config)
+    except Exception as e:
+        raise e
+    finally:
+        logging.shutdown()
@@ -0,0 +1,99 @@
+"""
+Runs the dialogues of an examples file in a row, with a cold environment (the node factory and the data are loaded for
+each dialogue) and with a warm one (see `EnvironmentClass.keep_warm`), and reports the times.
+
+The dialogues should give the same results in both runs; the results are compared, and the dialogues which differ are
+reported.
+"""
+import argparse
+import importlib.machinery
+import logging
+import time
+
+import yaml
+
+from opendf.defs import config_log
+from opendf.main import dialog
+
+
+def run_dialogues(environment_class, dialogs):
+    """
+    Runs the dialogues in a row, each one with a new context.
+
+    :param environment_class: the environment
+    :type environment_class: EnvironmentClass
+    :param dialogs: the dialogues
+    :type dialogs: List[List[str]]
+    :return: the result of each dialogue: the type of the final graph and the number of exceptions, or the error
+    :rtype: List[Any]
+    """
+    results = []
+    for dialog_id in range(len(dialogs)):
+        d_context = environment_class.get_new_context()
+        environment_class.d_context = d_context
+        with environment_class:
+            try:
+                graph, ex = dialog(dialog_id, dialogs, d_context, draw_graph=False, turn_scope=environment_class.turn)
+                results.append((graph.typename() if graph else None, len(ex or [])))
+            except Exception as e:
+                results.append(repr(e))
+    environment_class.cool_down()
+    return results
+
+
+def create_arguments_parser():
+    """
+    Creates the argument parser for the file.
+
+    :return: the argument parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description="Compares the time of running the dialogues of an examples file with a cold and a warm "
+                    "environment.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "--config", "-c", metavar="config", type=str, required=False, default="resources/smcalflow_config.yaml",
+        help="the configuration file for the application"
+    )
+
+    parser.add_argument(
+        "--examples_file", "-ef", metavar="examples_file", type=str, required=False,
+        default="opendf/examples/main_examples.py",
+        help="the examples files to use"
+    )
+
+    return parser
+
+
+def main(config, examples_file):
+    config_log('ERROR')
+    loader = importlib.machinery.SourceFileLoader("dialogs", examples_file)
+    dialogs = loader.load_module().dialogs
+
+    results = {}
+    for keep_warm in (False, True):
+        environment_class = yaml.load(open(config, 'r'), Loader=yaml.UnsafeLoader)["environment_class"]
+        environment_class.keep_warm = keep_warm
+        start = time.perf_counter()
+        results[keep_warm] = run_dialogues(environment_class, dialogs)
+        duration = time.perf_counter() - start
+        print(f"{'warm' if keep_warm else 'cold'} environment: {len(dialogs)} dialogues, {duration:.2f} s")
+
+    differences = [i for i, (cold, warm) in enumerate(zip(results[False], results[True])) if cold != warm]
+    if differences:
+        print(f"the results of the dialogues {differences} differ")
+    else:
+        print("same results")
+
+
+if __name__ == "__main__":
+    try:
+        arguments = create_arguments_parser().parse_args()
+        main(arguments.config, arguments.examples_file)
+    except Exception as e:
+        raise e
+    finally:
+        logging.shutdown()
@@ -0,0 +1,10 @@
+# pexp_lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('ASSIGN_NAME', 'ASSIGN_NODE', 'ASSIGN_NODE_NUMBER', 'CLOSE_ARGUMENTS', 'DECLARE_ASSIGN_NAME', 'IDENTIFIER', 'ITEM_SEPARATOR', 'NAME_VALUE_SEPARATOR', 'OPEN_ARGUMENTS', 'QUOTED_STRING', 'SPECIAL_FEATURE', 'TAG_CHAR'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_DECLARE_ASSIGN_NAME>\\{[a-zA-Z_-][a-zA-Z0-9\\~_-]+\\})|(?P<t_ASSIGN_NAME>\\$[ \\t\\n]*[a-zA-Z_-][a-zA-Z0-9_-]+)|(?P<t_ASSIGN_NODE_NUMBER>\\$\\#-?[0-9]+)|(?P<t_COMMENT>//[^\\r\\n]*)|(?P<t_BLOCK_COMMENT>/\\*([^\\*]|\\*[^/])*\\*/)|(?P<t_QUOTED_STRING>(\\"(\\\\.|[^\\"])*\\"|\\\'(\\\\.|[^\\\'])*\\\'))|(?P<t_IDENTIFIER>[;:a-zA-Z0-9_\\-\\+\\#][^\\=,\\(\\)]*)|(?P<t_SPECIAL_FEATURE>\\<[^\\<\\>]+\\>)|(?P<t_ASSIGN_NODE>\\$)|(?P<t_CLOSE_ARGUMENTS>\\))|(?P<t_OPEN_ARGUMENTS>\\()|(?P<t_TAG_CHAR>\\^)|(?P<t_ITEM_SEPARATOR>,)|(?P<t_NAME_VALUE_SEPARATOR>=)', [None, ('t_DECLARE_ASSIGN_NAME', 'DECLARE_ASSIGN_NAME'), ('t_ASSIGN_NAME', 'ASSIGN_NAME'), ('t_ASSIGN_NODE_NUMBER', 'ASSIGN_NODE_NUMBER'), ('t_COMMENT', 'COMMENT'), ('t_BLOCK_COMMENT', 'BLOCK_COMMENT'), None, (None, 'QUOTED_STRING'), None, None, None, (None, 'IDENTIFIER'), (None, 'SPECIAL_FEATURE'), (None, 'ASSIGN_NODE'), (None, 'CLOSE_ARGUMENTS'), (None, 'OPEN_ARGUMENTS'), (None, 'TAG_CHAR'), (None, 'ITEM_SEPARATOR'), (None, 'NAME_VALUE_SEPARATOR')])]}
+_lexstateignore = {'INITIAL': ' \t\n'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
@@ -1,7 +1,12 @@
 """
 Parser for P-expressions.
 """
+import importlib
+import os
 import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
 # noinspection PyUnresolvedReferences
 from typing import List, Optional, Any, Tuple, Dict
@@ -26,6 +31,12 @@ SPACES_REGEX = re.compile("\\s+")
 
 TAG_CHAR = "^"
 
+PARSE_CACHE_SIZE = 4096  # maximal number of expression strings kept in the parse cache
+
+# the lexer and parser tables are generated ahead of time (see `write_tables()`), and shipped with the code
+LEXER_TABLE_MODULE = "opendf.parser.pexp_lextab"
+PARSER_TABLE_MODULE = "opendf.parser.pexp_parsetab"
+
 
 def sort_key_name(key):
     name, _ = key
@@ -194,6 +205,18 @@ class ASTNode:
 
         return message
 
+    def copy(self):
+        """
+        Creates a (deep) copy of the tree rooted at this node. The copy of the root has no parent.
+
+        :return: the copy
+        :rtype: ASTNode
+        """
+        inputs = [(i_name, i_value.copy()) for i_name, i_value in self.inputs]
+        return ASTNode(self.name, inputs=inputs, tags=self.tags, role=self.role, set_assign=self.set_assign,
+                       special_features=self.special_features, is_terminal=self.is_terminal,
+                       is_assign=self.is_assign)
+
     def __eq__(self, other):
         if not isinstance(other, ASTNode):
             return False
@@ -255,6 +278,36 @@ class ASTNode:
         return True
 
 
+def terminal_ast(value):
+    """
+    Creates the terminal AST node of `value` - the same node the parser creates when parsing
+    `escape_string(str(value))`, without building and parsing the string.
+
+    :param value: the value
+    :type value: Any
+    :return: the terminal node
+    :rtype: ASTNode
+    """
+    string = str(value)
+    match = IDENTIFIER_REGEX.match(string)
+    if match is not None and match.group() == string:
+        return ASTNode(SPACES_REGEX.sub(" ", string.strip()), is_terminal=True)
+
+    match = QUOTED_STRING_REGEX.match(string)
+    if match is not None and match.group() == string:
+        return ASTNode(string[1:-1], is_terminal=True)
+
+    # the parser does not un-escape quoted strings
+    return ASTNode(escape_string(string)[1:-1], is_terminal=True)
+
+
+def reference_ast(node_id):
+    """
+    Creates the AST node which refers to the existing node number `node_id` (same as parsing `$#<node_id>`).
+    """
+    return ASTNode(str(node_id), is_assign=True)
+
+
 # noinspection PyMissingOrEmptyDocstring,PyPep8Naming,PySingleQuotedDocstring,PyMethodMayBeStatic
 class PExpLexer:
     """
@@ -501,21 +554,183 @@ class PExpParser:
         # TODO: add an exception for unbalanced parentheses
 
 
-lexer = PExpLexer()
-parser = PExpParser(lexer)
+class ParseCache:
+    """
+    Bounded (least recently used) cache of parsed P-expressions - { expression string : parsed trees }.
+
+    The same expressions are parsed again and again (e.g. graphs created from templates), and lexing + parsing is
+    relatively slow. The graph construction modifies the trees it gets, so the cache keeps its own copy of the trees,
+    and returns a fresh copy on each hit.
+    The cache is shared by all the threads.
+    """
+
+    def __init__(self, max_size=PARSE_CACHE_SIZE):
+        self.lock = threading.Lock()
+        self.max_size = max_size
+        self.trees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, expressions):
+        """
+        Gets a copy of the parsed trees of `expressions`, or `None` if they are not in the cache.
+        """
+        with self.lock:
+            trees = self.trees.get(expressions)
+            if trees is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.trees.move_to_end(expressions)
+        # the cached trees are never modified, so they can be copied outside the lock
+        return [t.copy() for t in trees]
+
+    def put(self, expressions, trees):
+        if self.max_size <= 0:
+            return
+        trees = [t.copy() for t in trees]
+        with self.lock:
+            self.trees[expressions] = trees
+            self.trees.move_to_end(expressions)
+            while len(self.trees) > self.max_size:
+                self.trees.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Gets the cache statistics.
+
+        :return: dict with the size, max size, and the number of hits, misses and evictions
+        :rtype: Dict[str, int]
+        """
+        with self.lock:
+            return {'size': len(self.trees), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
 
+class ParserPool:
+    """
+    Pool of parser instances.
 
-def tokenize_p_expressions(expressions, with_lexer=lexer):
+    A parser instance (and its lexer) keeps the state of the parse it is running, so it can not be used by two parses
+    at the same time. The pool gives each parse its own instance - so threads can parse concurrently (and a parse can
+    be started while another one is running in the same thread). Instances are created on demand, and reused.
+    """
+
+    def __init__(self, parsers=()):
+        self.lock = threading.Lock()
+        self.free = list(parsers)  # the instances which are not in use
+        self.created = len(self.free)
+
+    def acquire(self):
+        """
+        Takes a parser instance from the pool - a new instance is created if all the instances are in use. The
+        instance should be given back with `release()`.
+
+        :return: the parser
+        :rtype: PExpParser
+        """
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+            self.created += 1
+        return create_parser()
+
+    def release(self, instance):
+        with self.lock:
+            self.free.append(instance)
+
+    @contextmanager
+    def parser(self):
+        """
+        Context manager which takes a parser instance from the pool, and gives it back at exit.
+        """
+        instance = self.acquire()
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+
+def create_parser():
+    """
+    Creates a parser instance (with its own lexer), from the pre-generated tables.
+
+    If the tables are missing or out of date (the grammar was changed), the parser tables are generated in memory,
+    which is slower - the shipped tables should then be regenerated with `write_tables()`.
+
+    :return: the parser
+    :rtype: PExpParser
+    """
+    return PExpParser(PExpLexer(optimize=True, lextab=LEXER_TABLE_MODULE),
+                      tabmodule=PARSER_TABLE_MODULE, write_tables=False, debug=False)
+
+
+def write_tables(output_dir=None):
+    """
+    (Re)generates the lexer and parser table modules. Should be called after changing the grammar.
+
+    :param output_dir: the directory to write the tables to, if `None`, the tables are written next to this file
+    :type output_dir: str or None
+    """
+    output_dir = output_dir if output_dir else os.path.dirname(os.path.abspath(__file__))
+    lexer = PExpLexer()  # built from the rules - not from the existing tables
+    lexer.lexer.writetab(LEXER_TABLE_MODULE.split(".")[-1], output_dir)
+    # the parser tables are written only if the existing ones do not match the grammar
+    PExpParser(lexer, tabmodule=PARSER_TABLE_MODULE, outputdir=output_dir, debug=False)
+
+
+def tables_up_to_date():
+    """
+    Checks that the shipped lexer and parser tables match the current rules and grammar.
+
+    :return: `True` if the tables are up to date
+    :rtype: bool
+    """
+    try:
+        lextab = importlib.import_module(LEXER_TABLE_MODULE)
+        parsetab = importlib.import_module(PARSER_TABLE_MODULE)
+    except ImportError:
+        return False
+
+    lexer = PExpLexer().lexer
+    if [regex for regex, _ in lextab._lexstatere["INITIAL"]] != lexer.lexstateretext["INITIAL"] or \
+            lextab._lextokens != lexer.lextokens:
+        return False
+
+    instance = create_parser()
+    grammar = yacc.ParserReflect({k: getattr(instance, k) for k in dir(instance)})
+    grammar.get_all()
+    return grammar.signature() == parsetab._lr_signature
+
+
+# parser instances are created lazily, on the first parse
+parser_pool = ParserPool()
+parse_cache = ParseCache()
+
+
+def tokenize_p_expressions(expressions, with_lexer=None):
     """
     Tokenizes the P-expression in `expressions`.
 
     :param expressions: the P-expressions
     :type expressions: str
-    :param with_lexer: the lexer object to use
+    :param with_lexer: the lexer object to use, if `None`, the lexer of a parser from `parser_pool` is used
     :type with_lexer: PExpLexer
     :return: the list of tokens
     :rtype: List[Token]
     """
+    if with_lexer is None:
+        with parser_pool.parser() as instance:
+            return tokenize_p_expressions(expressions, instance.lexer)
 
     with_lexer.input(expressions)
     tokens = []
@@ -527,14 +742,27 @@ def tokenize_p_expressions(expressions, with_lexer=lexer):
     return tokens
 
 
-def parse_p_expressions(expressions):
+def parse_p_expressions(expressions, use_cache=True):
     """
     Parses the P-expression in `expressions`.
 
     :param expressions: the P-expressions
     :type expressions: str
+    :param use_cache: if `True`, use the parse cache (`parse_cache`) - the returned trees are still new objects,
+        which the caller may modify
+    :type use_cache: bool
     :return: the parsed expressions
     :rtype: List[ASTNode]
     """
+    trees = parse_cache.get(expressions) if use_cache else None
+    if trees is None:
+        with parser_pool.parser() as instance:
+            trees = instance.parse(expressions)
+        if use_cache:
+            parse_cache.put(expressions, trees)
+
+    return trees
+
 
-    return parser.parse(expressions)
+if __name__ == "__main__":
+    write_tables()
@@ -29,7 +29,7 @@ from opendf.graph.node_factory import NodeFactory
 from opendf.defs import *
 from opendf.graph.dialog_context import DialogContext
 from opendf.utils.arg_utils import add_environment_option
-from opendf.utils.io import load_jsonl_file
+from opendf.utils.io import JsonlSource
 from opendf.utils.utils import to_list
 from opendf.graph.transform_graph import do_transform_graph
 from opendf.graph.draw_graph import draw_all_graphs
@@ -376,7 +376,12 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
     conv_dir = os.path.join(working_dir, 'conv')
     in_file = os.path.join(working_dir, "conv", f"conv.{inp_name}.jsonl")
 
-    dialogs = load_jsonl_file(in_file, unit=" dialogues")
+    # the index of the dialogues is kept next to the file, to find the requested dialogue without reading the others
+    source = JsonlSource(in_file, key="dialogue_id", index_file=in_file + ".index")
+    dialogs, first_dialog = source, 0
+    if dialog_id:
+        first_dialog, first_key = source.find_suffix(dialog_id)
+        dialogs = source.iterate_from(first_key)
 
     # these are log files for debugging / stats
     fout = open(os.path.join(conv_dir, f"db.{inp_name}"), 'w')
@@ -398,7 +403,7 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
     stop = False
     n_dia, n_ok = 0,0
     n_turns, n_parse_ok = 0, 0
-    for idia, dia in enumerate(dialogs):
+    for idia, dia in enumerate(dialogs, first_dialog):
         d_id = dia['dialogue_id']
         if dialog_id:
             if d_id[-len(dialog_id):]==dialog_id:  # dialog_id suffix
@@ -468,7 +473,7 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
                     user_txt = dia['turns'][it]['user_utterance']['original_text']
                     agent_txt = dia['turns'][it]['agent_utterance']['original_text']
                     ok = exec_turn(pexp, d_context, user_txt, agent_txt, fout)
-                    turn_contexts.append(d_context.make_copy_with_pack())  # save d_context after each turn
+                    turn_contexts.append(d_context.snapshot())  # save d_context after each turn (copied when compared)
                     # turn_evs.append(get_all_db_events())  # save all events in db after each turn
 
             if ok:
@@ -502,7 +507,7 @@ def dialog(working_dir, inp_name, data_file, dialog_id=None, draw_graph=True, fr
                         exec_turn(pexp, d_context, user_txt, agent_txt)
 
                         # compare context and saved turn contexts
-                        ok = compare_graph_exec(d_context, turn_contexts[it])  # added decoys, so don't compare dbevs
+                        ok = compare_graph_exec(d_context, turn_contexts[it].make_copy())  # added decoys, so don't compare dbevs
                         if not ok:
                             cmp = False
 
@@ -1,14 +1,21 @@
 """
 Useful function to deal with the database.
 """
+import logging
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
 from enum import Enum
 from typing import Dict
 
 import sqlalchemy
-from sqlalchemy import func, cast, Integer, String, Interval, Time, Date, DateTime
+from sqlalchemy import func, cast, Integer, String, Interval, Time, Date, DateTime, event
+from sqlalchemy.pool import QueuePool
 
-from opendf.defs import database_connection
+from opendf.defs import database_connection, database_pool_size, database_max_overflow, entity_cache_size
+
+logger = logging.getLogger(__name__)
 
 
 class DatabaseSystem(Enum):
@@ -323,3 +330,302 @@ def get_database_handler():
         handler = database_handlers[DatabaseSystem.SQLITE]
 
     return handler
+
+
+def is_memory_database(connection_string):
+    """
+    Checks if the connection string refers to an in memory SQLite database.
+
+    :param connection_string: the connection string
+    :type connection_string: str
+    :return: `True`, if it is an in memory database; otherwise, `False`
+    :rtype: bool
+    """
+    if not connection_string.startswith(DatabaseSystem.SQLITE.value):
+        return False
+    path = connection_string.split("://", maxsplit=1)[-1]
+    return path in ("", "/", "/:memory:") or "mode=memory" in path
+
+
+def get_engine_pool_options(connection_string):
+    """
+    Gets the pool options for `create_engine`, based on the connection string.
+
+    The in memory SQLite database keeps the default pool (a single connection per thread, otherwise each connection
+    would see a different database). A SQLite file would not be pooled by default (each `connect()` opens the file
+    again), so we pool it, as the other databases.
+
+    :param connection_string: the connection string
+    :type connection_string: str
+    :return: the keyword arguments for `create_engine`
+    :rtype: Dict[str, Any]
+    """
+    if is_memory_database(connection_string):
+        return {}
+    options = {"pool_size": database_pool_size, "max_overflow": database_max_overflow}
+    if connection_string.startswith(DatabaseSystem.SQLITE.value):
+        options["poolclass"] = QueuePool
+        # the pooled connections may be used by different threads, but never at the same time
+        options["connect_args"] = {"check_same_thread": False}
+
+    return options
+
+
+class DatabaseStatistics:
+    """
+    Counts the use of an engine: the connections opened by the pool, the connections checked out from the pool and the
+    executed queries. The queries are also counted per turn: `start_turn` starts the count of a new turn, and
+    `turn_queries` holds the queries of the current (or last) turn.
+    """
+
+    def __init__(self, engine=None):
+        self.connections = 0  # new connections to the database
+        self.checkouts = 0  # connections taken from the pool
+        self.queries = 0
+        self.turns = 0
+        self.turn_queries = 0  # the queries of the current (or last) turn
+        self.engine = None
+        if engine is not None:
+            self.attach(engine)
+
+    def attach(self, engine):
+        """
+        Starts counting the use of `engine`.
+
+        :param engine: the engine
+        :type engine: sqlalchemy.engine.base.Engine
+        """
+        self.engine = engine
+        event.listen(engine.pool, "connect", self._on_connect)
+        event.listen(engine.pool, "checkout", self._on_checkout)
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_connect(self, *args):
+        self.connections += 1
+
+    def _on_checkout(self, *args):
+        self.checkouts += 1
+
+    def _on_execute(self, *args):
+        self.queries += 1
+        self.turn_queries += 1
+
+    def start_turn(self):
+        self.turns += 1
+        self.turn_queries = 0
+
+    def reset(self):
+        self.connections = 0
+        self.checkouts = 0
+        self.queries = 0
+        self.turns = 0
+        self.turn_queries = 0
+
+    def as_dict(self):
+        values = {
+            "connections": self.connections, "checkouts": self.checkouts, "queries": self.queries,
+            "turns": self.turns, "turn_queries": self.turn_queries,
+        }
+        if self.engine is not None:
+            values["pool"] = self.engine.pool.status()
+        return values
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.as_dict()})"
+
+
+class EntityCache:
+    """
+    Bounded (least recently used) cache of the graphs of the database entities - { key : graph }.
+
+    The storage must invalidate the entries whose rows it changes (see `pop` and `invalidate`), otherwise the cache
+    would keep serving the graphs of the old rows.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = entity_cache_size if max_size is None else max_size
+        self.graphs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        graph = self.graphs.get(key)
+        if graph is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.graphs.move_to_end(key)
+        return graph
+
+    def __setitem__(self, key, graph):
+        if self.max_size <= 0:
+            return
+        self.graphs[key] = graph
+        self.graphs.move_to_end(key)
+        while len(self.graphs) > self.max_size:
+            self.graphs.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.graphs
+
+    def __len__(self):
+        return len(self.graphs)
+
+    def pop(self, key, default=None):
+        """
+        Invalidates the entry of `key`.
+
+        :return: the removed graph, if any; otherwise, `default`
+        :rtype: Any
+        """
+        if key in self.graphs:
+            self.invalidations += 1
+        return self.graphs.pop(key, default)
+
+    def invalidate(self, predicate):
+        """
+        Invalidates all the entries whose key complies with `predicate`.
+
+        :param predicate: function from key to bool
+        :type predicate: Callable[[Any], bool]
+        """
+        for key in [k for k in self.graphs if predicate(k)]:
+            del self.graphs[key]
+            self.invalidations += 1
+
+    def clear(self):
+        self.graphs.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def stats(self):
+        """
+        Gets the cache statistics.
+
+        :return: dict with the size, max size, and the number of hits, misses, evictions and invalidations
+        :rtype: Dict[str, int]
+        """
+        return {'size': len(self.graphs), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'invalidations': self.invalidations}
+
+
+def has_sql_where(node_type):
+    """
+    Checks if the node type implements `generate_sql_where` (i.e. it overrides the default of `Node`).
+
+    :param node_type: the node type
+    :type node_type: type
+    :return: `True`, if the type can be translated into SQL; otherwise, `False`
+    :rtype: bool
+    """
+    method = getattr(node_type, "generate_sql_where", None)
+    return method is not None and method.__qualname__ != "Node.generate_sql_where"
+
+
+def get_types_without_sql(operator):
+    """
+    Gets the types of the nodes, in the constraint tree of `operator`, which do not implement `generate_sql_where` -
+    the likely cause of a failure to translate the constraint into SQL.
+
+    :param operator: the constraint
+    :type operator: Node
+    :return: the names of the types
+    :rtype: List[str]
+    """
+    if operator is None:
+        return []
+    names = {n.typename() for n in operator.topological_order(follow_res=False) if not has_sql_where(type(n))}
+    return sorted(names)
+
+
+def sql_coverage_report(node_types):
+    """
+    Reports which node types implement `generate_sql_where`.
+
+    :param node_types: the node types, by name (e.g. `NodeFactory.node_types`)
+    :type node_types: Dict[str, type]
+    :return: the names of the types with and without `generate_sql_where`
+    :rtype: Tuple[List[str], List[str]]
+    """
+    covered, missing = [], []
+    for name, node_type in sorted(node_types.items()):
+        (covered if has_sql_where(node_type) else missing).append(name)
+    return covered, missing
+
+
+class SQLFallbackRecorder:
+    """
+    Records the searches which could not be translated into SQL, and fell back to scan the whole table (building a
+    graph for each row and matching it against the constraint).
+
+    The fallbacks are aggregated by (search, constraint type); each entry keeps the number of fallbacks, the scanned
+    rows, the time spent, the types in the constraints which do not implement `generate_sql_where`, and the last
+    reason (the exception raised while generating the SQL, if any).
+    The first fallback of each entry is logged as a warning, the next ones in debug.
+    """
+
+    def __init__(self):
+        self.fallbacks = {}
+
+    @contextmanager
+    def fallback(self, search, operator, reason=None):
+        """
+        Measures a fallback scan. The scan must add its scanned rows to `rows` of the yielded entry.
+
+        :param search: the name of the search (e.g. the method name)
+        :type search: str
+        :param operator: the constraint which could not be translated, if `None`, nothing is recorded
+        :type operator: Optional[Node]
+        :param reason: the exception raised while generating the SQL, if any
+        :type reason: Optional[Exception]
+        """
+        if operator is None:
+            # not a fallback - there is no constraint to translate
+            yield {"rows": 0}
+            return
+        typename = operator.typename()
+        key = (search, typename)
+        entry = self.fallbacks.get(key)
+        if entry is None:
+            entry = {"count": 0, "rows": 0, "seconds": 0.0, "missing": set(), "reason": None}
+            self.fallbacks[key] = entry
+        missing = get_types_without_sql(operator)
+        entry["count"] += 1
+        entry["missing"].update(missing)
+        if reason is not None:
+            entry["reason"] = f"{type(reason).__name__}: {reason}"
+        rows = entry["rows"]
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            seconds = time.perf_counter() - start
+            entry["seconds"] += seconds
+            level = logging.WARNING if entry["count"] == 1 else logging.DEBUG
+            logger.log(level, "SQL fallback in %s for %s: scanned %d rows in %.3fs (types without SQL: %s, reason: %s)",
+                       search, typename, entry["rows"] - rows, seconds, missing, reason)
+
+    def clear(self):
+        self.fallbacks.clear()
+
+    def report(self):
+        """
+        Gets the recorded fallbacks, sorted by the time spent.
+
+        :return: the fallbacks, as strings
+        :rtype: List[str]
+        """
+        lines = []
+        for (search, typename), entry in sorted(self.fallbacks.items(), key=lambda x: -x[1]["seconds"]):
+            lines.append(f"{search} {typename}: {entry['count']} fallbacks, {entry['rows']} rows, "
+                         f"{entry['seconds']:.3f}s, types without SQL: {sorted(entry['missing'])}, "
+                         f"last reason: {entry['reason']}")
+        return lines
+
+
+sql_fallbacks = SQLFallbackRecorder()
@@ -1,9 +1,16 @@
 #  Copyright (c) Microsoft Corporation.
 #  Licensed under the MIT license.
 
+import abc
+import json
+import os
+
 import jsons
 from tqdm import tqdm
 
+_DECODER = json.JSONDecoder()
+_WHITESPACE = json.decoder.WHITESPACE
+
 
 def load_jsonl_file(data_jsonl, cls=None, unit=" items", verbose=False):
     """
@@ -16,3 +23,286 @@ def load_jsonl_file(data_jsonl, cls=None, unit=" items", verbose=False):
     with open(data_jsonl) as fp:
         for line in tqdm(fp, desc=desc, unit=unit, dynamic_ncols=True, disable=not verbose):
             yield jsons.loads(line.strip(), cls=cls)
+
+
+def read_json_item(path, offset, length):
+    """
+    Reads the json value at the byte offset of the file.
+
+    :param path: the path of the file
+    :type path: str
+    :param offset: the byte offset of the value
+    :type offset: int
+    :param length: the length of the value, in bytes
+    :type length: int
+    :return: the value
+    :rtype: Any
+    """
+    with open(path, "rb") as input_file:
+        input_file.seek(offset)
+        return json.loads(input_file.read(length))
+
+
+class JsonStreamReader:
+    """
+    Reads the json values of a file, one at a time, keeping the byte offset of each value.
+    """
+
+    def __init__(self, input_file, chunk_size=1 << 16):
+        """
+        Creates the reader.
+
+        :param input_file: the file, opened in text mode with `encoding="utf-8"` and `newline=""` (so the byte offsets
+        can be computed from the text)
+        :type input_file: TextIO
+        :param chunk_size: the number of characters read at a time
+        :type chunk_size: int
+        """
+        self.input_file = input_file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0  # the position of the reader in the buffer
+        self.offset = 0  # the byte offset of the position in the file
+        self.eof = False
+
+    def _read(self):
+        if self.eof:
+            return False
+        # reads at least the size of the buffer, so a large value is not decoded again for each chunk
+        data = self.input_file.read(max(self.chunk_size, len(self.buffer) - self.position))
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + data
+        self.position = 0
+        return True
+
+    def _advance(self, end):
+        self.offset += len(self.buffer[self.position:end].encode("utf-8"))
+        self.position = end
+
+    def peek(self):
+        """
+        Skips the whitespaces and gets the next character, without consuming it.
+
+        :return: the next character, or an empty string at the end of the file
+        :rtype: str
+        """
+        while True:
+            self._advance(_WHITESPACE.match(self.buffer, self.position).end())
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                return ""
+
+    def expect(self, characters):
+        """
+        Consumes the next character, which must be one of `characters`.
+
+        :param characters: the expected characters
+        :type characters: str
+        :return: the character
+        :rtype: str
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at byte {self.offset} of {self.input_file.name}, "
+                             f"found {character!r}")
+        self._advance(self.position + 1)
+        return character
+
+    def decode(self):
+        """
+        Consumes the next json value.
+
+        :return: the value, its byte offset and its length in bytes
+        :rtype: Tuple[Any, int, int]
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.position)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    break
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read()
+        offset = self.offset
+        self._advance(end)
+        return value, offset, self.offset - offset
+
+
+class DialogueSource(abc.ABC):
+    """
+    A corpus file of dialogues (or of other json values), which can be iterated lazily, or accessed at random by the
+    key of the items.
+
+    The items are never loaded all at once: the iteration reads one item at a time, and the random access reads only
+    the requested item, from its byte offset. The index of the byte offsets is built by the first random access, with
+    a pass over the file, and it can be saved to `index_file`, to be reused while the file is not changed.
+    """
+
+    def __init__(self, path, key=None, index_file=None):
+        """
+        Creates the source.
+
+        :param path: the path of the file
+        :type path: str
+        :param key: the field of the items which is their key (e.g. "dialogue_id"); if `None`, the key is the position
+        of the item (or its name, in a json object)
+        :type key: Optional[str]
+        :param index_file: the file to save the index, if any
+        :type index_file: Optional[str]
+        """
+        self.path = path
+        self.key = key
+        self.index_file = index_file
+        self._index = None
+
+    @abc.abstractmethod
+    def _items(self):
+        """
+        Yields the (key, value, offset, length) of the items of the file, in order, where the key is the one of the
+        file (position or name).
+        """
+        pass
+
+    def entries(self):
+        """
+        Yields the (key, value, byte offset, length) of the items, in the order of the file.
+
+        :return: the entries
+        :rtype: Iterator[Tuple[Any, Any, int, int]]
+        """
+        for key, value, offset, length in self._items():
+            if self.key is not None:
+                key = value[self.key]
+            yield key, value, offset, length
+
+    def __iter__(self):
+        for _, value, _, _ in self._items():
+            yield value
+
+    def get_index(self):
+        """
+        Gets the index of the file, building it if needed.
+
+        :return: the (byte offset, length) of the items, by key, in the order of the file
+        :rtype: Dict[Any, Tuple[int, int]]
+        """
+        if self._index is None:
+            self._index = self._load_index()
+        if self._index is None:
+            self._index = {key: (offset, length) for key, _, offset, length in self.entries()}
+            self._save_index()
+        return self._index
+
+    def _load_index(self):
+        if not self.index_file or not os.path.isfile(self.index_file) or \
+                os.path.getmtime(self.index_file) < os.path.getmtime(self.path):
+            return None
+        with open(self.index_file) as index_file:
+            return {key: tuple(value) for key, value in json.load(index_file)}
+
+    def _save_index(self):
+        if self.index_file:
+            with open(self.index_file, "w") as index_file:
+                json.dump(list(self._index.items()), index_file)
+
+    def __contains__(self, key):
+        return key in self.get_index()
+
+    def get(self, key, default=None):
+        """
+        Gets the item of the key, reading only this item from the file.
+
+        :param key: the key
+        :type key: Any
+        :param default: the value to return if there is no such item
+        :type default: Any
+        :return: the item
+        :rtype: Any
+        """
+        entry = self.get_index().get(key)
+        if entry is None:
+            return default
+        return read_json_item(self.path, *entry)
+
+
+class JsonSource(DialogueSource):
+    """
+    The source of the items of the top-level array (or object) of a json file, e.g. a MultiWOZ dialogue file.
+    """
+
+    def __init__(self, path, key=None, index_file=None, chunk_size=1 << 16):
+        super(JsonSource, self).__init__(path, key=key, index_file=index_file)
+        self.chunk_size = chunk_size
+
+    def _items(self):
+        with open(self.path, encoding="utf-8", newline="") as input_file:
+            reader = JsonStreamReader(input_file, chunk_size=self.chunk_size)
+            opening = reader.expect("[{")
+            closing = "]" if opening == "[" else "}"
+            if reader.peek() == closing:
+                return
+            position = 0
+            while True:
+                if opening == "{":
+                    name, _, _ = reader.decode()
+                    reader.expect(":")
+                else:
+                    name = position
+                value, offset, length = reader.decode()
+                yield name, value, offset, length
+                position += 1
+                if reader.expect("," + closing) == closing:
+                    return
+
+
+class JsonlSource(DialogueSource):
+    """
+    The source of the items of a jsonl file (one json value per line), e.g. a SMCalFlow dialogue file.
+    """
+
+    def _items(self):
+        return self._items_from(0, 0)
+
+    def _items_from(self, offset, position):
+        with open(self.path, "rb") as input_file:
+            input_file.seek(offset)
+            for line in input_file:
+                if line.strip():
+                    yield position, json.loads(line), offset, len(line)
+                    position += 1
+                offset += len(line)
+
+    def find_suffix(self, suffix):
+        """
+        Finds the first item whose key ends with `suffix`.
+
+        :param suffix: the suffix
+        :type suffix: str
+        :return: the position and the key of the item, or (0, `None`) if there is no such item
+        :rtype: Tuple[int, Any]
+        """
+        for position, key in enumerate(self.get_index()):
+            if key.endswith(suffix):
+                return position, key
+        return 0, None
+
+    def iterate_from(self, key):
+        """
+        Yields the items from the item of the key to the end of the file, without reading the items before it.
+
+        :param key: the key of the first item
+        :type key: Any
+        :return: the items
+        :rtype: Iterator[Any]
+        """
+        offsets = self.get_index()
+        if key not in offsets:
+            return
+        for _, value, _, _ in self._items_from(offsets[key][0], 0):
+            yield value
@@ -0,0 +1,62 @@
+"""
+Tests the database of SMCalFlow.
+"""
+import unittest
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from opendf.applications.smcalflow.database import Database, populate_stub_database
+from opendf.defs import use_database
+
+
+@unittest.skipUnless(use_database, "requires the database")
+class TestDatabase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        populate_stub_database("opendf/applications/smcalflow/data_stub.json")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        Database.get_instance().clear_database()
+
+    def test_event_entries_queries(self):
+        database = Database.get_instance()
+        statistics = database.statistics
+        queries = statistics.queries
+        events = database._get_event_entries('all')
+        self.assertGreater(len(events), 1)
+        self.assertEqual(queries + 2, statistics.queries)  # the events, and the attendees of all of them
+        self.assertTrue(all(event.attendees for event in events))
+
+    def test_busy_intervals_window(self):
+        database = Database.get_instance()
+        day = datetime(2022, 1, 6)
+        start, end = day.replace(hour=9, minute=45), day.replace(hour=12)
+        # the events which end at the start of the window, or start at its end, are kept
+        self.assertEqual({(1001, day.replace(hour=9), day.replace(hour=10)),
+                          (1001, day.replace(hour=9, minute=30), start),
+                          (1006, day.replace(hour=9), day.replace(hour=10)),
+                          (1006, day.replace(hour=9, minute=30), start),
+                          (1006, end, day.replace(hour=14))},
+                         set(database.get_attendees_busy_intervals([1001, 1006], start, end)))
+
+        snapshot = database.snapshot()
+        try:
+            with database.connection() as connection:
+                for identifier, location_id, hour in ((1000, 11, 9), (1001, 12, 10), (1002, 11, 13)):
+                    connection.execute(insert(database.EVENT_TABLE), {
+                        "id": identifier, "subject": "window", "location_id": location_id,
+                        "organizer_id": database.get_current_recipient_id(),
+                        "starts_at": day.replace(hour=hour), "ends_at": day.replace(hour=hour + 1)})
+                connection.commit()
+            # the event in `home` is not among the locations, the last one is outside the window
+            self.assertEqual({(11, day.replace(hour=9), day.replace(hour=10))},
+                             set(database.get_locations_busy_intervals([3, 11], start, end)))
+        finally:
+            database.restore(snapshot)
+
+
+if __name__ == '__main__':
+    unittest.main()
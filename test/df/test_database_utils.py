@@ -0,0 +1,33 @@
+"""
+Tests the utilities of the database.
+"""
+import unittest
+
+from opendf.applications.smcalflow.nodes.functions import DeleteCommitEventWrapper
+from opendf.applications.smcalflow.nodes.objects import Event
+from opendf.utils.database_utils import EntityCache, sql_coverage_report
+
+
+class TestDatabaseUtils(unittest.TestCase):
+
+    def test_entity_cache(self):
+        cache = EntityCache(max_size=2)
+        cache[(1, 10)] = "a"
+        cache[(1, 11)] = "b"
+        self.assertEqual("a", cache.get((1, 10)))  # (1, 11) is now the least recently used
+        cache[(2, 10)] = "c"
+        self.assertNotIn((1, 11), cache)
+        cache.invalidate(lambda key: key[1] == 10)
+        self.assertEqual(0, len(cache))
+        self.assertEqual({'size': 0, 'max_size': 2, 'hits': 1, 'misses': 0, 'evictions': 1, 'invalidations': 2},
+                         cache.stats())
+
+    def test_sql_coverage(self):
+        node_types = {t.__name__: t for t in (Event, DeleteCommitEventWrapper)}
+        covered, missing = sql_coverage_report(node_types)
+        self.assertEqual([Event.__name__], covered)
+        self.assertEqual([DeleteCommitEventWrapper.__name__], missing)
+
+
+if __name__ == '__main__':
+    unittest.main()
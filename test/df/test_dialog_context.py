@@ -0,0 +1,170 @@
+"""
+Tests the dialog context.
+"""
+import os
+import pickle
+import unittest
+
+from opendf.applications import SMCalFlowEnvironment
+from opendf.applications.multiwoz_2_2.domain import MultiWOZContext
+from opendf.defs import config_log
+from opendf.examples.main_examples import dialogs
+from opendf.exceptions.df_exception import DFException
+from opendf.graph import traversal
+from opendf.graph.constr_graph import construct_graph
+from opendf.graph.dialog_context import DialogContext
+from opendf.graph.eval import evaluate_graph
+from opendf.graph.nodes.node import Node
+from opendf.main import dialog, environment_definitions
+
+
+class TestDialogContext(unittest.TestCase):
+
+    def test_node_ids(self):
+        d_context = DialogContext()
+        d_context.set_next_node_id(3)
+        hidden = [Node() for _ in range(3)]
+        for node in hidden:
+            d_context.register_node(node)
+        d_context.set_next_node_id(0)
+        nodes = [Node() for _ in range(6)]
+        for node in nodes:
+            d_context.register_node(node)
+        # the new nodes skip the ids of the hidden ones
+        self.assertEqual([0, 1, 2, 6, 7, 8], [n.id for n in nodes])
+        self.assertEqual(8, d_context.get_highest_node_id())
+
+        d_context.register_node(nodes[-1], renumber=20)
+        self.assertEqual(20, d_context.get_highest_node_id())
+        d_context.register_node(nodes[-1], renumber=8)
+        self.assertEqual(8, d_context.get_highest_node_id())
+        self.assertEqual(9, d_context.get_next_node_id())
+
+    def test_exception_and_message_index(self):
+        d_context = DialogContext()
+        first, second = Node(), Node()
+        d_context.register_node(first)
+        d_context.register_node(second)
+        ex1, ex2 = DFException("first", first), DFException("second", second)
+        for ex in (ex1, ex2, ex1):
+            d_context.add_exception(ex)
+        self.assertEqual([ex1, ex2], d_context.exceptions)
+        self.assertEqual([first, second], d_context.exception_nodes)
+        self.assertEqual([ex1], d_context.get_node_exceptions(first))
+        # the exception nodes are a copy, changing them does not change the index
+        d_context.exception_nodes.append(first)
+        self.assertTrue(d_context.exception_index.is_valid_for(d_context.exceptions))
+        self.assertEqual([ex1], d_context.get_node_exceptions(first))
+        d_context.exception_nodes.pop()
+
+        # the exception nodes are kept until a new exception is added
+        d_context.clear_exceptions()
+        self.assertEqual([], d_context.get_node_exceptions(first))
+        self.assertEqual([first, second], d_context.exception_nodes)
+        d_context.add_exception(ex2)
+        d_context.set_exception_node(ex2, first)
+        self.assertEqual([ex2], d_context.get_node_exceptions(first))
+        self.assertEqual([second], d_context.exception_nodes)
+
+        d_context.add_message(first, "a")
+        d_context.add_message(second, "b")
+        d_context.add_message(first, "c")
+        self.assertEqual(["a", "c"], [m.text for m in d_context.get_node_messages(first)])
+        d_context.move_messages(first, second)
+        self.assertEqual([], d_context.get_node_messages(first))
+        self.assertEqual(["a", "b", "c"], [m.text for m in d_context.get_node_messages(second)])
+
+    def test_loads_refuses_other_globals(self):
+        class Call:
+            def __reduce__(self):
+                return os.getcwd, ()
+
+        data = pickle.dumps({"version": 1, "nodes": [Call()]}, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.assertRaises(pickle.UnpicklingError):
+            DialogContext.loads(data)
+
+    def test_multiwoz_context_copy(self):
+        d_context = MultiWOZContext()
+        d_context.update_services("hotel")
+        d_context.add_frame_to_last_turn({"service": "hotel", "state": {"slot_values": {"hotel-area": "north"}}})
+        d_context.agent_text = "Which price range?"
+        d_context.agent_dialog_acts = {"Hotel-Request": [["price", "?"]]}
+        d_context.agent_turn = {"turn_id": "1", "speaker": "SYSTEM"}
+        d_context.completed_tasks.append("find_hotel")
+        d_context.inc_turn_num()
+
+        snapshot = d_context.snapshot()
+        copy = snapshot.make_copy()
+        self.assertIs(MultiWOZContext, type(copy))
+        for name in ("agent_text", "agent_dialog_acts", "agent_turn", "dialog_state", "completed_tasks", "turn_num"):
+            self.assertEqual(getattr(d_context, name), getattr(copy, name))
+        self.assertIs(MultiWOZContext, type(DialogContext.loads(d_context.dumps())))
+
+        # the copies do not share the state with the context, nor with each other
+        copy.update_services("taxi")
+        copy.completed_tasks.append("find_taxi")
+        self.assertEqual(["hotel"], d_context.dialog_state["services"])
+        self.assertEqual(["hotel"], snapshot.make_copy().dialog_state["services"])
+        self.assertEqual(["find_hotel"], snapshot.make_copy().completed_tasks)
+
+
+class TestDialogContextSerialization(unittest.TestCase):
+    """
+    Tests the serialization and the copies of the context of a dialog of the examples.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        config_log('INFO')
+        environment_definitions.event_fallback_force_curr_user = False
+
+    def setUp(self) -> None:
+        self.d_context = DialogContext()
+        environment = SMCalFlowEnvironment(self.d_context)
+        environment.__enter__()
+        self.addCleanup(environment.__exit__, None, None, None)
+
+    def test_context_serialization(self):
+        dialog(2, dialogs, self.d_context, draw_graph=False)
+        nodes = traversal.topological_order(self.d_context.get_packed_goals() + self.d_context.other_goals)
+        reachable = set(nodes)
+
+        loaded = DialogContext.loads(self.d_context.dumps())
+        self.assertEqual([g.id for g in self.d_context.goals], [g.id for g in loaded.goals])
+        self.assertEqual(len(nodes), len(loaded.idx_to_node))
+        for node in nodes:
+            other = loaded.get_node(node.id)
+            self.assertIs(loaded, other.context)
+            self.assertEqual((node.typename(), node.data, node.evaluated, node.tags, node.result.id),
+                             (other.typename(), other.data, other.evaluated, other.tags, other.result.id))
+            self.assertEqual([(name, n.id) for name, n in node.inputs.items()],
+                             [(name, n.id) for name, n in other.inputs.items()])
+            self.assertEqual([(name, n.id) for name, n in node.outputs if n in reachable],
+                             [(name, n.id) for name, n in other.outputs])
+        self.assertEqual([(str(e), e.node.id, e.suggestions) for e in self.d_context.exceptions],
+                         [(str(e), e.node.id, e.suggestions) for e in loaded.exceptions])
+        self.assertEqual(self.d_context.get_next_node_id(), loaded.get_next_node_id())
+
+    def test_context_copy(self):
+        dialog(2, dialogs, self.d_context, draw_graph=False)
+        snapshot = self.d_context.snapshot()
+        first, second = snapshot.make_copy(), snapshot.make_copy()
+        n_nodes, next_id = len(first.idx_to_node), first.get_next_node_id()
+        self.assertEqual(self.d_context.get_next_node_id(), next_id)
+        self.assertTrue(all(first.get_node(i) is not second.get_node(i) for i in first.idx_to_node))
+
+        # changes to a copy, or to the context, do not affect the other copies
+        for d_context in (first, self.d_context):
+            graph, ex = construct_graph("Today()", d_context)
+            self.assertIsNone(ex)
+            evaluate_graph(graph)
+            d_context.add_goal(graph)
+        self.assertEqual(next_id, graph.id)
+        self.assertGreater(len(first.idx_to_node), n_nodes)
+        self.assertEqual(n_nodes, len(second.idx_to_node))
+        self.assertEqual(n_nodes, len(snapshot.make_copy().idx_to_node))
+        self.assertEqual([g.id for g in second.goals], [g.id for g in first.goals[:-1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests the life cycle of the application environments.
+"""
+import unittest
+from datetime import datetime
+
+from sqlalchemy import insert, select, func
+
+from opendf.applications import SMCalFlowEnvironment
+from opendf.applications.smcalflow.database import Database
+from opendf.defs import use_database
+from opendf.graph.node_factory import NodeFactory
+
+
+@unittest.skipUnless(use_database, "requires the database")
+class TestEnvironment(unittest.TestCase):
+
+    def count_events(self):
+        with Database.get_instance().connection() as connection:
+            return connection.execute(select(func.count()).select_from(Database.EVENT_TABLE)).scalar()
+
+    def test_keep_warm(self):
+        environment = SMCalFlowEnvironment()
+        environment.keep_warm = True
+        try:
+            with environment:
+                events = self.count_events()
+                node_types = NodeFactory.get_instance().node_types
+            self.assertTrue(environment.is_warm())
+
+            # an event created between the uses of the environment
+            database = Database.get_instance()
+            with database.connection() as connection:
+                connection.execute(insert(database.EVENT_TABLE), {
+                    "id": 1000, "subject": "warm", "organizer_id": database.get_current_recipient_id(),
+                    "starts_at": datetime(2022, 1, 3, 10), "ends_at": datetime(2022, 1, 3, 11)})
+                connection.commit()
+            self.assertIsNotNone(database.get_event_entry(1000))
+
+            with environment:
+                self.assertIsNone(database.get_event_entry(1000))
+                self.assertEqual(events, self.count_events())
+                self.assertIs(node_types, NodeFactory.get_instance().node_types)  # not loaded again
+
+            # the node types are replaced, e.g. by another environment
+            replaced = dict(node_types)
+            NodeFactory.get_instance().set_node_types(replaced)
+            with environment:
+                self.assertIsNot(replaced, NodeFactory.get_instance().node_types)  # loaded again
+                self.assertEqual(set(node_types), set(NodeFactory.get_instance().node_types))
+        finally:
+            environment.cool_down()
+        self.assertFalse(environment.is_warm())
+        self.assertEqual(0, self.count_events())
+
+    def test_database_snapshot(self):
+        with SMCalFlowEnvironment():
+            database = Database.get_instance()
+            recipient_id = database.get_current_recipient_id()
+            snapshot = database.snapshot()
+            with database.connection() as connection:
+                connection.execute(insert(database.EVENT_TABLE), {
+                    "id": 1000, "subject": "snapshot", "organizer_id": recipient_id,
+                    "starts_at": datetime(2022, 1, 3, 10), "ends_at": datetime(2022, 1, 3, 11)})
+                connection.commit()
+                possible_times = connection.execute(
+                    select(func.count()).select_from(database.POSSIBLE_TIME_TABLE)).scalar()
+            self.assertIsNotNone(database.get_event_entry(1000))
+
+            database.restore(snapshot)
+            self.assertIsNone(database.get_event_entry(1000))
+            self.assertEqual(recipient_id, database.get_current_recipient_id())
+            with database.connection() as connection:
+                # the reference data is not part of the snapshot
+                self.assertEqual(
+                    possible_times,
+                    connection.execute(select(func.count()).select_from(database.POSSIBLE_TIME_TABLE)).scalar())
+
+
+if __name__ == '__main__':
+    unittest.main()
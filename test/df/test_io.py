@@ -0,0 +1,58 @@
+"""
+Tests the dialogue sources.
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from opendf.utils.io import JsonSource, JsonlSource, read_json_item
+
+DIALOGUES = [
+    {"dialogue_id": "D0.json", "turns": [{"utterance": "café at 10", "values": [1.5, 12345678, True, None]}]},
+    {"dialogue_id": "D1.json", "turns": []},
+    {"dialogue_id": "D2.json", "turns": [{"utterance": "“quoted”, {not: json}"}]},
+]
+
+
+class TestIO(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as output_file:
+            output_file.write(text)
+        return path
+
+    def test_json_source(self):
+        for indent in (None, 4):
+            path = self.write("dialogues.json", json.dumps(DIALOGUES, indent=indent, ensure_ascii=False))
+            # a small chunk size, so the values span several chunks
+            source = JsonSource(path, key="dialogue_id", chunk_size=7)
+            self.assertEqual(DIALOGUES, list(source))
+            for dialogue_id, value, offset, length in source.entries():
+                self.assertEqual(value, read_json_item(path, offset, length))
+            self.assertEqual(DIALOGUES[2], source.get("D2.json"))
+            self.assertIsNone(source.get("D3.json"))
+
+        path = self.write("acts.json", json.dumps({"D0.json": {"0": ["a"]}, "D1.json": 2}))
+        self.assertEqual(2, JsonSource(path, chunk_size=4).get("D1.json"))
+        self.assertEqual([], list(JsonSource(self.write("empty.json", " [ ] "))))
+
+    def test_jsonl_source(self):
+        path = self.write("dialogues.jsonl", "\n".join(json.dumps(d, ensure_ascii=False) for d in DIALOGUES) + "\n")
+        index_path = path + ".index"
+        source = JsonlSource(path, key="dialogue_id", index_file=index_path)
+        self.assertEqual(DIALOGUES, list(source))
+        self.assertEqual((1, "D1.json"), source.find_suffix("1.json"))
+        self.assertEqual(DIALOGUES[1:], list(source.iterate_from("D1.json")))
+
+        # the saved index is used by a new source
+        self.assertTrue(os.path.isfile(index_path))
+        source = JsonlSource(path, key="dialogue_id", index_file=index_path)
+        self.assertEqual(DIALOGUES[0], source.get("D0.json"))
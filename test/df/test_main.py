@@ -13,8 +13,10 @@ from opendf.applications.smcalflow.nodes.modifiers import with_attendee, starts_
 from opendf.applications.smcalflow.nodes.objects import Event
 from opendf.defs import use_database, config_log
 from opendf.applications.smcalflow.exceptions.df_exception import BadEventConstraintException, \
-    NoEventSuggestionException
+    NoEventSuggestionException, MultipleEventSuggestionsException, EventConfirmationException
 from opendf.examples.main_examples import dialogs
+from opendf.graph.constr_graph import construct_graph
+from opendf.graph.eval import evaluate_graph
 from opendf.graph.node_factory import NodeFactory
 from opendf.graph.nodes.framework_functions import revise
 from opendf.graph.nodes.framework_objects import Bool
@@ -22,6 +24,7 @@ from opendf.graph.nodes.framework_operators import GTf
 from opendf.graph.nodes.node import Node
 from opendf.main import dialog, environment_definitions
 from opendf.graph.dialog_context import DialogContext
+from opendf.utils.database_utils import sql_fallbacks, sql_coverage_report
 from opendf.utils.utils import get_subclasses
 
 
@@ -230,3 +233,77 @@ class TestMain(unittest.TestCase):
         expected = BadEventConstraintException
         self.assertTrue(isinstance(ex[-1], expected),
                         f"Expected an exception of type {expected}, found {type(ex[-1])}")
+
+    def test_type_categories(self):
+        node_factory = NodeFactory.get_instance()
+        self.assertIn('GT', node_factory.operators)
+        self.assertTrue(node_factory.node_types['GT']().is_operator())
+        self.assertFalse(Event().is_operator())
+        self.assertEqual({t for t in node_factory.node_types if node_factory.node_types[t].is_aggregator_type},
+                         {t for t in node_factory.node_types if t in node_factory.aggregators})
+
+    @unittest.skipUnless(use_database, "requires the database")
+    def test_database_turn(self):
+        database = Database.get_instance()
+        statistics = database.statistics
+        checkouts = statistics.checkouts
+        with database.turn():
+            dialog(6, dialogs, self.d_context, draw_graph=False)
+            self.assertEqual(checkouts + 1, statistics.checkouts)  # all queries used the connection of the turn
+        self.assertGreater(statistics.turn_queries, 0)
+        self.assertEqual(checkouts + 1, statistics.checkouts)
+
+    @unittest.skipUnless(use_database, "requires the database")
+    def test_sql_fallback(self):
+        sql_fallbacks.clear()
+        graph, ex = construct_graph("FindEvents(has_id(4))", self.d_context)
+        self.assertIsNone(ex)
+        evaluate_graph(graph)
+        self.assertEqual({}, sql_fallbacks.fallbacks)
+
+        # `SET` does not implement `generate_sql_where`, so the search scans the event table
+        _, missing = sql_coverage_report(NodeFactory.get_instance().node_types)
+        self.assertIn("SET", missing)
+        graph, ex = construct_graph(
+            "FindEvents(SET(Event(subject=LIKE(lunch)), Event(subject=LIKE(planning))))", self.d_context)
+        self.assertIsNone(ex)
+        evaluate_graph(graph)
+        entry = sql_fallbacks.fallbacks.get(("find_events_that_match", "SET"))
+        self.assertIsNotNone(entry)
+        self.assertEqual(1, entry["count"])
+        self.assertGreater(entry["rows"], 0)
+        self.assertEqual({"SET"}, entry["missing"])
+        self.assertIsNone(entry["reason"])  # the SQL generation gave no query, it did not fail
+        sql_fallbacks.clear()
+
+    @unittest.skipUnless(use_database, "requires the database")
+    def test_slot_search(self):
+        expression = "CreateEvent(AND(starts_at(NextDOW(WEDNESDAY)), with_attendee(John), at_location(room1)))"
+        suggestions = []
+        for by_intervals in (False, True):
+            environment_definitions.slot_search_by_intervals = by_intervals
+            try:
+                graph, ex = dialog(0, [], self.d_context, draw_graph=False, p_expressions=[expression])
+            finally:
+                environment_definitions.slot_search_by_intervals = True
+            self.assertTrue(isinstance(ex[-1], MultipleEventSuggestionsException))
+            suggestions.append((ex[-1].args[0], ex[-1].suggestions[1:]))  # the first is the rerun of the graph
+        self.assertEqual(suggestions[0], suggestions[1])
+
+    def test_iterator_event_factory(self):
+        event_factory_name = environment_definitions.event_factory_name
+        environment_definitions.event_factory_name = "IteratorEventFactory"
+        try:
+            # the bounds of the constraint restrict the search to a single candidate
+            graph, ex = dialog(0, [], self.d_context, draw_graph=False,
+                               p_expressions=["CreateEvent(AND(starts_at(Tomorrow()), starts_at(NumberPM(3))))"])
+            self.assertTrue(isinstance(ex[-1], EventConfirmationException))
+            self.assertIn("tomorrow at 15:00", ex[-1].args[0])
+
+            graph, ex = dialog(0, [], self.d_context, draw_graph=False,
+                               p_expressions=["CreateEvent(starts_at(Morning()))"])
+            self.assertTrue(isinstance(ex[-1], MultipleEventSuggestionsException))
+            self.assertIn("starts_at(DateTime(date=Date(year=2022, month=1, day=3), time=Time(hour=8, minute=0)))",
+                          ex[-1].suggestions[1])  # the first is the rerun of the graph
+        finally:
+            environment_definitions.event_factory_name = event_factory_name
@@ -0,0 +1,48 @@
+"""
+Tests the indexes of the MultiWOZ database.
+"""
+import unittest
+
+from sqlalchemy import text
+
+from opendf.applications import MultiWOZEnvironment_2_2
+from opendf.applications.multiwoz_2_2.domain import MultiWOZContext
+from opendf.applications.multiwoz_2_2.multiwoz_db import MultiWozSqlDB
+from opendf.defs import config_log, use_database
+from opendf.graph.node_factory import NodeFactory
+from opendf.graph.nodes.node import Node
+
+
+@unittest.skipUnless(use_database, "requires the database")
+class TestMultiWozDB(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        config_log('INFO')
+        MultiWOZEnvironment_2_2().load_node_factory()
+        cls.d_context = MultiWOZContext()
+        cls.database = MultiWozSqlDB.get_instance()
+        with cls.database.engine.connect() as connection:
+            cls.database.create_indexes(connection, NodeFactory.get_instance())
+            connection.commit()
+
+    def query_plan(self, expression):
+        graph, _ = Node.call_construct(expression, self.d_context)
+        selection = graph.generate_sql()
+        with self.database.engine.connect() as connection:
+            statement = selection.compile(connection, compile_kwargs={"literal_binds": True})
+            rows = connection.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+        return " ".join(row[-1] for row in rows)
+
+    def test_indexes(self):
+        names = {index.name for index in MultiWozSqlDB.get_indexes(NodeFactory.get_instance())}
+        self.assertIn("ix_hotel_area", names)
+        self.assertIn("ix_train_departure_destination_day", names)
+        self.assertNotIn("ix_hotel_phone", names)
+
+    def test_query_plan(self):
+        plan = self.query_plan("Hotel?(area=north, stars=4)")
+        self.assertIn("USING INDEX", plan)
+
+        plan = self.query_plan("Train?(departure=cambridge, destination=london, day=monday)")
+        self.assertIn("USING INDEX ix_train_departure_destination_day", plan)
@@ -0,0 +1,133 @@
+"""
+Tests the runner of the MultiWOZ 2.2 dialogues, with one and more processes, on a small synthetic corpus.
+"""
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from opendf import main_multiwoz_2_2
+from opendf.defs import config_log, use_database
+from opendf.main_multiwoz_2_2 import select_dialogues, run_dialogues, write_dialogue_result
+
+AREAS = ["north", "south", "east", "west", "centre"]
+PRICES = ["cheap", "moderate", "expensive"]
+
+CONFIG = """environment_class: !!python/object:opendf.applications.MultiWOZEnvironment_2_2
+  d_context: null
+  data_path: "{data_path}"
+  domains: null
+  clean_database: true
+"""
+
+
+def create_hotels(n_hotels):
+    return [{"id": i, "address": f"{i} road", "area": AREAS[i % len(AREAS)], "internet": "yes" if i % 2 else "no",
+             "parking": "yes" if i % 3 else "no", "location": [52.2, 0.1], "name": f"hotel {i}", "phone": f"0122{i}",
+             "postcode": f"cb{i}", "pricerange": PRICES[i % len(PRICES)], "stars": str(i % 5),
+             "type": "hotel" if i % 4 else "guesthouse"} for i in range(n_hotels)]
+
+
+def create_turn(turn_id, speaker, utterance, slot_values=None):
+    frame = {"service": "hotel", "slots": [], "actions": []}
+    if slot_values is not None:
+        frame["state"] = {"active_intent": "find_hotel", "requested_slots": [],
+                          "slot_values": {f"hotel-{k}": [v] for k, v in slot_values.items()}}
+    return {"turn_id": str(turn_id), "speaker": speaker, "utterance": utterance, "frames": [frame]}
+
+
+def create_dialogue(i):
+    """
+    Creates a dialogue asking for a hotel; every third dialogue has a wrong state, so its result is bad.
+    """
+    area, price = AREAS[i % len(AREAS)], PRICES[i % len(PRICES)]
+    state = {"area": area, "pricerange": price} if i % 3 else {"area": "nowhere", "pricerange": price, "stars": "4"}
+    turns = [create_turn(0, "USER", f"I need a hotel in the {area}.", {"area": area}),
+             create_turn(1, "SYSTEM", "What price range?"),
+             create_turn(2, "USER", f"{price} please.", state),
+             create_turn(3, "SYSTEM", "Ok.")]
+    acts = {"0": {"Hotel-Inform": [["area", area]]}, "1": {"Hotel-Request": [["price", "?"]]},
+            "2": {"Hotel-Inform": [["area", area], ["pricerange", price]]}, "3": {"Hotel-Request": [["price", "?"]]}}
+    return ({"dialogue_id": f"PMUL{i:04d}.json", "services": ["hotel"], "turns": turns},
+            {turn: {"dialog_act": act, "span_info": []} for turn, act in acts.items()})
+
+
+def create_corpus(data_path, n_files, dialogues_per_file):
+    with open(os.path.join(data_path, "hotel_db.json"), "w") as output_file:
+        json.dump(create_hotels(20), output_file)
+    dialog_acts = {}
+    os.makedirs(os.path.join(data_path, "dev"))
+    for n in range(n_files):
+        dialogues = []
+        for i in range(n * dialogues_per_file, (n + 1) * dialogues_per_file):
+            dialogue, acts = create_dialogue(i)
+            dialogues.append(dialogue)
+            dialog_acts[dialogue["dialogue_id"]] = acts
+        with open(os.path.join(data_path, "dev", f"dialogues_{n + 1:03d}.json"), "w") as output_file:
+            json.dump(dialogues, output_file)
+    with open(os.path.join(data_path, "dialog_acts.json"), "w") as output_file:
+        json.dump(dialog_acts, output_file)
+
+
+class TestMultiWozRunner(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        config_log('WARNING')
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.data_path = cls.directory.name
+        create_corpus(cls.data_path, 2, 4)
+        cls.config = os.path.join(cls.data_path, "config.yaml")
+        with open(cls.config, "w") as config_file:
+            config_file.write(CONFIG.format(data_path=cls.data_path))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    def run_corpus(self, jobs):
+        """
+        Runs the corpus, as `main_multiwoz_2_2` does.
+
+        :return: the ids of the dialogues, in the order of their results; the contents of the output files; and the
+        states of the dialogues
+        :rtype: Tuple[List[str], List[str], Dict[str, Any]]
+        """
+        environment_class = yaml.load(open(self.config, 'r'), Loader=yaml.UnsafeLoader)["environment_class"]
+        dialogues = select_dialogues(["dev"], self.data_path, {"hotel"}, use_dialog_act=True)
+        output_files = [io.StringIO() for _ in range(4)]
+        ids, states = [], {}
+        for result in run_dialogues(dialogues, jobs, self.config, environment_class, 'WARNING', load_services={"hotel"},
+                                    use_dialog_act=True, write_state=True):
+            write_dialogue_result(result, *output_files)
+            ids.append(result.dialogue_id)
+            states[result.dialogue_id] = result.state
+        return ids, [f.getvalue() for f in output_files], states
+
+    def test_jobs(self):
+        expected_ids = [d["dialogue_id"] for d in select_dialogues(["dev"], self.data_path, {"hotel"})]
+        ids, outputs, states = self.run_corpus(1)
+        self.assertEqual(expected_ids, ids)
+        self.assertTrue(outputs[0] and outputs[1])  # there are good and bad dialogues
+
+        parallel_ids, parallel_outputs, parallel_states = self.run_corpus(2)
+        self.assertEqual(ids, parallel_ids)
+        self.assertEqual(outputs, parallel_outputs)
+        self.assertEqual(json.dumps(states), json.dumps(parallel_states))
+
+    @unittest.skipUnless(use_database, "requires the database")
+    def test_jobs_with_database_file(self):
+        # the processes would share the database file
+        database_path = "sqlite+pysqlite:///" + os.path.join(self.data_path, "multiwoz.db")
+        with mock.patch.object(main_multiwoz_2_2, "database_connection", database_path):
+            with self.assertRaises(ValueError):
+                run_dialogues([], 2, self.config, None, 'WARNING')
+        self.assertFalse(os.path.exists(os.path.join(self.data_path, "multiwoz.db")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+Tests the node factory.
+"""
+import os
+import tempfile
+import unittest
+
+from opendf.applications.fill_type_info import fill_type_info
+from opendf.graph.node_factory import NodeFactory
+from opendf.graph.nodes.node import Node
+from opendf.utils.utils import get_subclasses
+
+
+class TestNodeFactory(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        NodeFactory.__instance = None
+        node_factory = NodeFactory.get_instance()
+        nodes = list(filter(lambda x: 'opendf.applications.simplification' not in x.__module__, get_subclasses(Node)))
+        fill_type_info(node_factory, nodes)
+
+    def test_type_info_cache(self):
+        node_factory = NodeFactory.get_instance()
+        node_types = dict(node_factory.node_types)
+        expected = (node_factory.leaf_types, node_factory.leaf_in_type, node_factory.operators,
+                    node_factory.aggregators)
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "type_info.json")
+            node_factory.set_node_types(node_types, cache_path=cache_path)  # computes, and writes the cache
+            self.assertTrue(os.path.exists(cache_path))
+            self.assertTrue(node_factory.load_type_info(cache_path, node_factory.type_info_key()))
+            node_factory.set_node_types(node_types, cache_path=cache_path)  # reads the cache
+            self.assertEqual(0, len(node_factory.sample_nodes.nodes))  # no sample node was needed
+            self.assertEqual(expected, (node_factory.leaf_types, node_factory.leaf_in_type, node_factory.operators,
+                                        node_factory.aggregators))
+
+
+if __name__ == '__main__':
+    unittest.main()
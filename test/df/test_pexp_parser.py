@@ -3,8 +3,10 @@ Test cases for the P-expression parser.
 """
 import json
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
-from opendf.parser.pexp_parser import parse_p_expressions, ASTNode
+from opendf.parser.pexp_parser import parse_p_expressions, ASTNode, ParseCache, escape_string, terminal_ast, \
+    reference_ast, ParserPool, tables_up_to_date
 
 
 class TestPExpParser(unittest.TestCase):
@@ -187,3 +189,44 @@ class TestPExpParser(unittest.TestCase):
         expression = "{other_date}<-?'>Date(year=Int(2022), month=12, 25, ^holiday=\"* Christmas *\", ^is_holiday)"
         trees = parse_p_expressions(expression)
         self.assertEqual(expression.strip(), str(trees[0]))
+
+    def test_parse_cache(self):
+        expression = "Event(subject=meeting, start=Tomorrow(), ^busy)"
+        cache = ParseCache(max_size=1)
+        self.assertIsNone(cache.get(expression))
+        cache.put(expression, parse_p_expressions(expression, use_cache=False))
+
+        trees = cache.get(expression)
+        self.assertEqual(parse_p_expressions(expression, use_cache=False), trees)
+        trees[0].inputs[0][1].name = "changed"  # the caller may modify the trees - the cached copy is not affected
+        self.assertEqual(parse_p_expressions(expression, use_cache=False), cache.get(expression))
+
+        cache.put("Int(1)", parse_p_expressions("Int(1)", use_cache=False))
+        self.assertIsNone(cache.get(expression))
+        self.assertEqual({'size': 1, 'max_size': 1, 'hits': 2, 'misses': 2, 'evictions': 1}, cache.stats())
+
+    def test_terminal_ast(self):
+        # the ASTs built directly should be the same as the parsed ones
+        for value in ["abc", " a  b ", "'quoted'", "it's", 'say "hi"', "a, b", "c:\\", 12, -3.5, True]:
+            expression = f"Node(x={escape_string(str(value))}, y=$#3)"
+            expected = ASTNode("Node", inputs=[("x", terminal_ast(value)), ("y", reference_ast(3))])
+            self.assertEqual(parse_p_expressions(expression, use_cache=False), [expected])
+
+    def test_concurrent_parse(self):
+        expressions = [f"Event(subject=s{i}, attendees=SET(Attendee(id={i}), Attendee(id={i + 1})), ^t{i})"
+                       for i in range(200)]
+        expected = [parse_p_expressions(e, use_cache=False) for e in expressions]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            trees = list(executor.map(lambda e: parse_p_expressions(e, use_cache=False), expressions))
+        self.assertEqual(expected, trees)
+
+        pool = ParserPool()
+        with pool.parser() as first:
+            with pool.parser() as second:  # nested parses use different instances
+                self.assertIsNot(first, second)
+                self.assertEqual(expected[0], second.parse(expressions[0]))
+        self.assertEqual(2, pool.created)
+
+    def test_tables_up_to_date(self):
+        # if this fails, regenerate the tables with: python -m opendf.parser.pexp_parser
+        self.assertTrue(tables_up_to_date())
@@ -0,0 +1,24 @@
+"""
+Tests the search of the free time slots of the attendees and locations.
+"""
+import unittest
+from datetime import datetime
+
+from opendf.applications.smcalflow.slot_search import BusyIntervals
+
+
+class TestSlotSearch(unittest.TestCase):
+
+    def test_busy_intervals(self):
+        day = datetime(2022, 1, 5)
+        busy = BusyIntervals([(day.replace(hour=9), day.replace(hour=10)), (day.replace(hour=10), day.replace(hour=11)),
+                              (day.replace(hour=14), day.replace(hour=14))])
+        self.assertEqual(2, len(busy))  # the touching intervals were merged
+        self.assertTrue(busy.is_busy(day.replace(hour=10, minute=30), day.replace(hour=12)))
+        self.assertFalse(busy.is_busy(day.replace(hour=11), day.replace(hour=12)))
+        self.assertFalse(busy.is_busy(day.replace(hour=8), day.replace(hour=9)))
+        self.assertTrue(busy.is_busy(day.replace(hour=13), day.replace(hour=14)))  # the event without duration
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Tests the date time iterators.
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from opendf.applications.smcalflow.time_utils import DateTimeBounds, DateTimeIterator
+
+
+class TestDateTimeIterator(unittest.TestCase):
+
+    def test_iterator(self):
+        earliest = datetime(2022, 1, 31, 23, 58, 30)
+        values = list(DateTimeIterator(earliest=earliest, latest=earliest + timedelta(minutes=3)))
+        self.assertEqual([datetime(2022, 1, 31, 23, 58), datetime(2022, 1, 31, 23, 59), datetime(2022, 2, 1, 0, 0),
+                          datetime(2022, 2, 1, 0, 1)], values)
+
+    def test_bounds(self):
+        # mondays and wednesdays, from 9:00 to 10:30, every 30 minutes
+        bounds = DateTimeBounds(days_of_the_week=[0, 2], hour=[9, 10], minute=[0, 30])
+        earliest = datetime(2022, 1, 3, 9, 10)  # a monday
+        values = list(DateTimeIterator(earliest=earliest, latest=datetime(2022, 1, 10, 9, 0), bounds=bounds))
+        self.assertEqual([datetime(2022, 1, 3, 9, 30), datetime(2022, 1, 3, 10, 0), datetime(2022, 1, 3, 10, 30),
+                          datetime(2022, 1, 5, 9, 0), datetime(2022, 1, 5, 9, 30), datetime(2022, 1, 5, 10, 0),
+                          datetime(2022, 1, 5, 10, 30), datetime(2022, 1, 10, 9, 0)], values)
+
+    def test_bounds_operations(self):
+        morning = DateTimeBounds(hour=range(8, 12))
+        afternoon = DateTimeBounds(hour=range(12, 18))
+        self.assertTrue(morning.intersection(afternoon).is_empty)
+        self.assertEqual((8, 17, 1), morning.union(afternoon).field_range("hour", 0, 23))
+        # the union is only bounded on the fields bounded on both sides
+        self.assertNotIn("minute", morning.union(DateTimeBounds(minute=[0])).fields)
+        bounds = DateTimeBounds(earliest=datetime(2022, 1, 4)).intersection(DateTimeBounds(latest=datetime(2022, 1, 3)))
+        self.assertEqual([], list(DateTimeIterator(earliest=datetime(2022, 1, 1), bounds=bounds)))
+
+    def test_bounds_window(self):
+        # the 29th of february is not in the window
+        bounds = DateTimeBounds(month=[2], day=[29])
+        iterator = DateTimeIterator(earliest=datetime(2022, 1, 1), latest=datetime(2023, 1, 1), bounds=bounds)
+        self.assertEqual([], list(iterator))
+
+        iterator = DateTimeIterator(earliest=datetime(2022, 1, 1), latest=datetime(2024, 3, 1), bounds=bounds)
+        self.assertEqual(datetime(2024, 2, 29, 0, 0), next(iterator))
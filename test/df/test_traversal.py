@@ -0,0 +1,89 @@
+"""
+Tests the non-recursive graph traversals, and the views / indexes the dialog context keeps over the graph.
+"""
+import unittest
+
+from opendf.graph import traversal
+from opendf.graph.dialog_context import DialogContext
+from opendf.graph.nodes.node import Node
+
+
+def chain(length):
+    nodes = [Node() for _ in range(length)]
+    for i in range(length - 1):
+        nodes[i].add_linked_input('inp', nodes[i + 1])
+    return nodes
+
+
+class TestTraversal(unittest.TestCase):
+
+    def test_topological_order_diamond_with_result(self):
+        top, left, right, bottom, res = Node(), Node(), Node(), Node(), Node()
+        top.add_linked_input('a', left)
+        top.add_linked_input('b', right)
+        left.add_linked_input('c', bottom)
+        right.add_linked_input('c', bottom)
+        left.set_result(res)
+
+        self.assertEqual([bottom, res, left, right, top], top.topological_order())
+        self.assertEqual([bottom, left, right, top], top.topological_order(follow_res=False))
+        self.assertEqual([bottom, res, left], Node.collect_nodes([left, left]))
+
+    def test_result_loop(self):
+        a, b = Node(), Node()
+        a.add_linked_input('x', b)
+        b.result = a  # a result loop - should not be followed
+        self.assertEqual([b, a], a.topological_order())
+
+    def test_deep_graph(self):
+        nodes = chain(20000)  # much deeper than the default recursion limit
+        order = nodes[0].topological_order()
+        self.assertEqual(list(reversed(nodes)), order)
+
+        depths, orig = nodes[-1].parent_nodes()
+        self.assertEqual(len(nodes), len(depths))
+        self.assertEqual(list(reversed(nodes)), nodes[-1].get_path(nodes[0], orig))
+        self.assertEqual(set(nodes[1:]), traversal.descendants(nodes[0]))
+
+    def test_reachable_view(self):
+        d_context = DialogContext()
+        first, second = chain(3), chain(3)
+        for n in first + second:
+            d_context.register_node(n)
+        second[-1].add_linked_input('shared', first[1])
+        d_context.add_goal(first[0])
+        d_context.add_goal(second[0])
+        self.assertEqual(Node.collect_nodes(d_context.goals), d_context.reachable_nodes())
+
+        view = d_context.reachable_nodes()
+        extra = Node()
+        d_context.register_node(extra)
+        first[-1].add_linked_input('extra', extra)  # changes the walk of the first goal
+        self.assertEqual(Node.collect_nodes(d_context.goals), d_context.reachable_nodes())
+        self.assertNotIn(extra, view)  # returned lists are not modified
+
+        d_context.remove_goal(first[0])
+        self.assertEqual(Node.collect_nodes(d_context.goals), d_context.reachable_nodes())
+
+    def test_candidate_index(self):
+        d_context = DialogContext()
+        nodes = chain(3)
+        for n in nodes:
+            d_context.register_node(n)
+        d_context.add_goal(nodes[0])
+        index = d_context.candidate_index()
+        self.assertEqual(set(nodes), set(index.node_keys))
+
+        outside = Node()  # not indexed - always kept
+        self.assertEqual([nodes[1], nodes[2], outside], index.select(nodes + [outside], [('role', 'inp')]))
+        self.assertEqual([outside], index.select(nodes + [outside], [('tag', 'x')]))
+        self.assertEqual(nodes, index.select_types(nodes, lambda c: c is Node))
+
+        nodes[1].add_tags(['x'])  # changes of indexed nodes are added to the index
+        self.assertEqual([nodes[1]], index.select(nodes, [('tag', 'x')]))
+        d_context.remove_goal(nodes[0])
+        self.assertEqual(0, len(d_context.candidate_index()))
+
+
+if __name__ == '__main__':
+    unittest.main()